@@ -3,43 +3,79 @@ ULTIMATE SIMPLE APP - No fancy components, guaranteed to work
 """
 
 import gradio as gr
+import os
 import sys
 sys.path.append('src')
 
 from rag_universal import UniversalRAG
+from api_server import start_in_thread
+from metrics import configure_logging, get_logger
+from query_batcher import QueryBatcher, QueueFullError
+
+# Query-path logging (RAG_LOG_LEVEL, default WARNING; INFO shows per-question timings)
+configure_logging()
+log = get_logger('app')
 
 print("=" * 70)
 print("ULTIMATE SIMPLE WORKING APP")
 print("=" * 70)
 
-# Initialize RAG
-rag = UniversalRAG()
-print("✅ RAG system ready!")
+# Initialize RAG: model and store load in the background while the UI comes up
+rag = UniversalRAG(background=True)
+print("⏳ RAG system loading in the background...")
+
+# Concurrent questions are coalesced into batched encodes/searches; answers are
+# built per question so evidence can be streamed before them
+# (RAG_BATCH_WINDOW_MS, RAG_MAX_BATCH_SIZE, RAG_MAX_QUEUE_DEPTH, RAG_BATCH_WORKERS)
+batcher = QueryBatcher(rag, method='retrieve_queries')
+
+# Optional headless JSON API sharing this RAG instance and batcher (set RAG_API_PORT)
+if os.environ.get('RAG_API_PORT'):
+    start_in_thread(rag, batcher)
+
+LOADING_MESSAGE = "⏳ The complaint database is still loading - please try again in a few seconds."
+BUSY_MESSAGE = "⏳ Too many questions in flight right now - please try again in a moment."
+ANSWER_PENDING = "_⏳ Summarizing the evidence below..._"
+
+def render_response(answer, chunks):
+    """Markdown for what has arrived so far"""
+    response = f"## 🔍 Analysis Results\n\n"
+    response += f"{answer}\n\n"
+    
+    if chunks:
+        response += f"## 📋 Evidence ({len(chunks)} sources)\n\n"
+        for i, chunk in enumerate(chunks[:3]):
+            response += f"{i+1}. {chunk[:100]}...\n\n"
+    
+    return response
 
 def analyze_question(question):
-    """Simple function that always works"""
+    """Streams the evidence as soon as retrieval returns, then the answer section by section"""
     if not question.strip():
-        return "Please enter a question."
+        yield "Please enter a question."
+        return
+    if not rag.is_ready():
+        yield LOADING_MESSAGE
+        return
     
-    print(f"Processing: {question}")
+    log.info("Processing: %s", question)
     
     try:
-        # Get RAG response
-        answer, chunks, metadata = rag.process_query(question)
-        
-        # Build simple response
-        response = f"## 🔍 Analysis Results\n\n"
-        response += f"{answer}\n\n"
-        
-        if chunks:
-            response += f"## 📋 Evidence ({len(chunks)} sources)\n\n"
-            for i, chunk in enumerate(chunks[:3]):
-                response += f"{i+1}. {chunk[:100]}...\n\n"
-        
-        return response
+        answer, chunks = "", []
+        for event in rag.stream_query(question, retrieve=batcher.process_query):
+            if event['type'] == 'evidence':
+                chunks.append(event['chunk'])
+            elif event['type'] == 'answer':
+                answer += event['text']
+            else:
+                log.info("first content %.1f ms, total %.1f ms", event['first_content_ms'], event['total_ms'])
+                continue
+            yield render_response(answer or ANSWER_PENDING, chunks)
         
+    except QueueFullError:
+        yield BUSY_MESSAGE
     except Exception as e:
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
 
 # SIMPLEST POSSIBLE INTERFACE
 with gr.Blocks() as demo:
@@ -75,4 +111,7 @@ print("🚀 SIMPLEST APP RUNNING")
 print("Open: http://127.0.0.1:7860")
 print("=" * 70)
 
+# Let handlers run concurrently so the batcher has something to coalesce
+# (the queue is also what lets generator handlers stream)
+demo.queue(default_concurrency_limit=batcher.max_batch_size)
 demo.launch(server_port=7860, inbrowser=True)
\ No newline at end of file
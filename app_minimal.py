@@ -3,24 +3,53 @@ GUARANTEED WORKING APP - Minimal, always works
 """
 
 import gradio as gr
+import os
 import sys
 sys.path.append('src')
 
 from rag_universal import UniversalRAG
+from api_server import start_in_thread
+from metrics import configure_logging
+from query_batcher import QueryBatcher, QueueFullError
 
-rag = UniversalRAG()
+configure_logging()
+
+# Model and store load in the background; the UI is up right away
+rag = UniversalRAG(background=True)
+batcher = QueryBatcher(rag, method='retrieve_queries')
+
+# Optional headless JSON API sharing this RAG instance and batcher (set RAG_API_PORT)
+if os.environ.get('RAG_API_PORT'):
+    start_in_thread(rag, batcher)
+
+BUSY_MESSAGE = "Too many questions in flight right now - please try again in a moment."
 
 # SIMPLEST POSSIBLE FUNCTION
 def chat(message, history):
-    answer, chunks, meta = rag.process_query(message)
-    
-    # Simple format
-    response = f"Analysis: {answer}\n\nSources:\n"
-    for i, chunk in enumerate(chunks[:2]):
-        response += f"{i+1}. {chunk[:80]}...\n"
+    if not rag.is_ready():
+        yield [(message, "Still loading the complaint database - please try again in a few seconds.")]
+        return
     
-    # This format ALWAYS works
-    return [(message, response)]
+    # Sources appear as soon as retrieval returns, the analysis as it is written
+    answer, chunks = "", []
+    try:
+        for event in rag.stream_query(message, retrieve=batcher.process_query):
+            if event['type'] == 'evidence':
+                chunks.append(event['chunk'])
+            elif event['type'] == 'answer':
+                answer += event['text']
+            else:
+                continue
+            
+            # Simple format
+            response = f"Analysis: {answer or '...'}\n\nSources:\n"
+            for i, chunk in enumerate(chunks[:2]):
+                response += f"{i+1}. {chunk[:80]}...\n"
+            
+            # This format ALWAYS works
+            yield [(message, response)]
+    except QueueFullError:
+        yield [(message, BUSY_MESSAGE)]
 
 # Minimal interface
 with gr.Blocks() as demo:
@@ -31,4 +60,5 @@ with gr.Blocks() as demo:
     
     textbox.submit(chat, [textbox, chatbot], [chatbot])
 
+demo.queue(default_concurrency_limit=batcher.max_batch_size)
 demo.launch(inbrowser=True)
\ No newline at end of file
@@ -0,0 +1,521 @@
+"""
+Headless JSON query API
+Small asyncio HTTP/1.1 server (stdlib only) exposing the RAG system to
+other services and load generators without the Gradio UI:
+
+    POST /query        {"query": "...", "k": 3, "filters": {...}, "collapse": false, "neighbors": 0}
+    POST /query_batch  {"queries": ["...", ...], ...same options}
+    POST /query_stream same body as /query; newline-delimited JSON events
+                       (evidence chunks first, then answer sections, then timings)
+    GET  /health       liveness + rag.status()
+    GET  /ready        200 once the model and store are loaded, else 503
+    GET  /metrics      request counts/latencies, pipeline stage histograms, batcher,
+                       cache and over-fetch stats (JSON)
+    GET  /metrics/prometheus  the same counters and histograms in Prometheus text format
+
+Connections are kept alive between requests. Encode + search run in a
+bounded thread pool (or through a shared QueryBatcher), so the event loop
+only parses and writes.
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from metrics import METRICS
+from query_batcher import QueueFullError
+
+API_HOST = os.environ.get('RAG_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('RAG_API_PORT', 8000))
+API_WORKERS = int(os.environ.get('RAG_API_WORKERS', 2))
+API_STREAM_WORKERS = int(os.environ.get('RAG_API_STREAM_WORKERS', 16))
+API_MAX_PENDING = int(os.environ.get('RAG_API_MAX_PENDING', 256))
+REQUEST_TIMEOUT = float(os.environ.get('RAG_API_REQUEST_TIMEOUT', 30))
+KEEPALIVE_TIMEOUT = float(os.environ.get('RAG_API_KEEPALIVE_TIMEOUT', 15))
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_QUERIES = 256
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+QUERY_OPTIONS = ('k', 'filters', 'collapse', 'neighbors')
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            408: 'Request Timeout', 413: 'Payload Too Large', 500: 'Internal Server Error',
+            503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _jsonable(value):
+    """Metadata from the stores may hold numpy scalars and NaN; JSON needs plain values"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _parse_body(body):
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError as e:
+        raise HttpError(400, f"invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise HttpError(400, "body must be a JSON object")
+    return data
+
+
+def _result(output):
+    answer, chunks, metadata = output
+    return {'answer': answer, 'chunks': list(chunks), 'metadata': _jsonable(list(metadata))}
+
+
+class ApiServer:
+    """
+    JSON API over a RAG object (anything with process_query/process_queries).
+
+    Pass the UI's batcher to share one QueryBatcher (and so one set of
+    batches) between the UI and the API; without one, /query runs
+    rag.process_query in the worker pool. A batcher with
+    method='retrieve_queries' batches only encode + search, and each
+    request builds its own answer (which is what lets /query_stream send
+    evidence before the answer). At most max_pending queries are
+    queued or running; beyond that requests get 503 instead of waiting.
+    Each request must finish within request_timeout seconds (504), and
+    idle keep-alive connections are closed after keepalive_timeout.
+    """
+
+    def __init__(self, rag, batcher=None, workers=API_WORKERS, max_pending=API_MAX_PENDING,
+                 request_timeout=REQUEST_TIMEOUT, keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 stream_workers=API_STREAM_WORKERS):
+        self.rag = rag
+        self.batcher = batcher
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-worker')
+        # Streams over a retrieval batcher mostly wait on it, so they get their own (larger) pool
+        self.stream_executor = ThreadPoolExecutor(max_workers=stream_workers, thread_name_prefix='api-stream')
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.started = time.time()
+        self.pending = 0
+        self.connections = 0
+        self.counts = {}
+        self.latencies = {}
+        self._server = None
+
+    # ---- HTTP plumbing ----
+
+    async def _read_request(self, reader):
+        """(method, path, keep_alive, body), or None when the client closed the connection"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        keep_alive = (headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1'
+                      else headers.get('connection', '').lower() == 'keep-alive')
+        return method.upper(), target.split('?', 1)[0], keep_alive, body
+
+    def _write_response(self, writer, status, payload, keep_alive, content_type='text/plain; charset=utf-8'):
+        """JSON for dicts, content_type (plain text by default) for str payloads"""
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if keep_alive:
+            head += f"Keep-Alive: timeout={int(self.keepalive_timeout)}\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    self._write_response(writer, e.status, {'error': str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                if method == 'POST' and path == '/query_stream':
+                    keep_alive = await self._stream(writer, body, keep_alive)
+                else:
+                    status, payload = await self._dispatch(method, path, body)
+                    if path == '/metrics/prometheus':
+                        self._write_response(writer, status, payload, keep_alive, PROMETHEUS_CONTENT_TYPE)
+                    else:
+                        self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        routes = {'/query': ('POST', self._query), '/query_batch': ('POST', self._query_batch),
+                  '/health': ('GET', self._health), '/ready': ('GET', self._ready),
+                  '/metrics': ('GET', self._metrics), '/metrics/prometheus': ('GET', self._prometheus),
+                  '/query_stream': ('POST', None)}
+        start = time.perf_counter()
+        if path not in routes:
+            status, payload = 404, {'error': f"no route {path}"}
+        elif method != routes[path][0]:
+            status, payload = 405, {'error': f"{path} expects {routes[path][0]}"}
+        else:
+            try:
+                data = _parse_body(body)
+                status, payload = 200, await asyncio.wait_for(routes[path][1](data), self.request_timeout)
+            except HttpError as e:
+                status, payload = e.status, {'error': str(e)}
+            except asyncio.TimeoutError:
+                status, payload = 504, {'error': f"no result within {self.request_timeout:g}s"}
+            except QueueFullError as e:
+                status, payload = 503, {'error': f"busy: {e}"}
+            except Exception as e:
+                status, payload = 500, {'error': str(e)}
+        self._record(path if path in routes else 'other', status, time.perf_counter() - start)
+        return status, payload
+
+    def _record(self, route, status, seconds):
+        key = (route, status)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        window = self.latencies.setdefault(route, [])
+        window.append(seconds)
+        if len(window) > 10_000:
+            del window[:5_000]
+
+    async def _stream(self, writer, body, keep_alive):
+        """
+        /query_stream: rag.stream_query events as chunked NDJSON, each line
+        written as soon as the event is produced. Returns whether the
+        connection can be kept alive.
+        """
+        start = time.perf_counter()
+        try:
+            if not hasattr(self.rag, 'stream_query'):
+                raise HttpError(404, "this RAG system does not stream")
+            query, options = self._query_args(_parse_body(body))
+            self._check_ready()
+            if self.pending >= self.max_pending:
+                raise HttpError(503, f"busy: {self.max_pending} queries pending")
+            # Queue retrieval before the 200 goes out, so a full batcher is still a 503
+            retrieved = self.batcher.submit(query, **options) if self._batches_retrieval() else None
+        except (HttpError, QueueFullError) as e:
+            status = e.status if isinstance(e, HttpError) else 503
+            message = str(e) if isinstance(e, HttpError) else f"busy: {e}"
+            self._record('/query_stream', status, time.perf_counter() - start)
+            self._write_response(writer, status, {'error': message}, keep_alive)
+            return keep_alive
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        retrieve = (lambda q, **kwargs: retrieved.result()) if retrieved is not None else None
+
+        def produce():
+            try:
+                for event in self.rag.stream_query(query, retrieve=retrieve, **options):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, {'type': 'error', 'error': str(e)})
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                      f"Transfer-Encoding: chunked\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1'))
+        self.pending += 1
+        if retrieve is not None:
+            # Encode + search run in the batcher; this thread mostly waits for it
+            self.stream_executor.submit(produce)
+        else:
+            loop.run_in_executor(self.executor, produce)
+        deadline = loop.time() + self.request_timeout
+        status = 200
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    event, status = {'type': 'error', 'error': f"no result within {self.request_timeout:g}s"}, 504
+                    if retrieved is not None:
+                        retrieved.cancel()
+                if event is None:
+                    break
+                line = json.dumps(_jsonable(event)).encode('utf-8') + b"\n"
+                writer.write(f"{len(line):x}\r\n".encode('latin-1') + line + b"\r\n")
+                await writer.drain()
+                if status != 200:
+                    keep_alive = False
+                    break
+        finally:
+            self.pending -= 1
+        writer.write(b"0\r\n\r\n")
+        self._record('/query_stream', status, time.perf_counter() - start)
+        return keep_alive
+
+    # ---- routes ----
+
+    def _options(self, data):
+        options = {name: data[name] for name in QUERY_OPTIONS if name in data}
+        if 'k' in options and (not isinstance(options['k'], int) or options['k'] < 1):
+            raise HttpError(400, "k must be a positive integer")
+        return options
+
+    def _query_args(self, data):
+        query = data.get('query')
+        if not isinstance(query, str) or not query.strip():
+            raise HttpError(400, "'query' must be a non-empty string")
+        return query, self._options(data)
+
+    def _batches_retrieval(self):
+        return self.batcher is not None and self.batcher.method == 'retrieve_queries'
+
+    def _check_ready(self):
+        if hasattr(self.rag, 'is_ready') and not self.rag.is_ready():
+            raise HttpError(503, "still loading")
+
+    def _acquire(self):
+        """Count one more pending query, refusing work beyond max_pending"""
+        if self.pending >= self.max_pending:
+            raise HttpError(503, f"busy: {self.max_pending} queries pending")
+        self.pending += 1
+
+    async def _run(self, fn, *args, **kwargs):
+        """fn in the worker pool, refusing work beyond max_pending"""
+        self._acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    async def _query(self, data):
+        query, options = self._query_args(data)
+        self._check_ready()
+        start = time.perf_counter()
+        if self.batcher is None:
+            output = await self._run(self.rag.process_query, query, **options)
+        else:
+            self._acquire()
+            try:
+                output = await asyncio.wrap_future(self.batcher.submit(query, **options))
+                if self._batches_retrieval():
+                    # Answer synthesis is CPU work; keep it off the event loop
+                    chunks, metadata = output
+                    output = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self.rag.answer, query, chunks, metadata)
+            finally:
+                self.pending -= 1
+        return dict(_result(output), ms=round((time.perf_counter() - start) * 1000, 2))
+
+    async def _query_batch(self, data):
+        queries = data.get('queries')
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+            raise HttpError(400, "'queries' must be a non-empty list of non-empty strings")
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise HttpError(413, f"at most {MAX_BATCH_QUERIES} queries per batch")
+        options = self._options(data)
+        self._check_ready()
+        start = time.perf_counter()
+        outputs = await self._run(self.rag.process_queries, queries, **options)
+        return {'results': [_result(o) for o in outputs], 'ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    async def _health(self, data):
+        status = self.rag.status() if hasattr(self.rag, 'status') else {}
+        return dict(_jsonable(status), status='ok', uptime_seconds=round(time.time() - self.started, 1))
+
+    async def _ready(self, data):
+        self._check_ready()
+        return {'ready': True}
+
+    async def _metrics(self, data):
+        routes = {}
+        for (route, status), count in sorted(self.counts.items()):
+            routes.setdefault(route, {'requests': {}})['requests'][str(status)] = count
+        for route, window in self.latencies.items():
+            ms = np.array(window) * 1000
+            routes.setdefault(route, {'requests': {}}).update(
+                p50_ms=round(float(np.percentile(ms, 50)), 2), p99_ms=round(float(np.percentile(ms, 99)), 2))
+        metrics = {'routes': routes, 'open_connections': self.connections, 'pending': self.pending,
+                   'pipeline': METRICS.snapshot()}
+        if self.batcher is not None:
+            metrics['batcher'] = self.batcher.stats()
+        for name in ('cache_stats', 'overfetch_stats', 'stream_stats'):
+            if hasattr(self.rag, name):
+                try:
+                    metrics[name[:-len('_stats')]] = getattr(self.rag, name)()
+                except Exception:
+                    pass
+        return _jsonable(metrics)
+
+    async def _prometheus(self, data):
+        lines = [METRICS.prometheus().rstrip('\n'), "# TYPE rag_api_requests_total counter"]
+        for (route, status), count in sorted(self.counts.items()):
+            lines.append(f'rag_api_requests_total{{route="{route}",status="{status}"}} {count}')
+        lines.append(f"# TYPE rag_api_open_connections gauge\nrag_api_open_connections {self.connections}")
+        return "\n".join(lines) + "\n"
+
+    # ---- lifecycle ----
+
+    async def start(self, host=API_HOST, port=API_PORT):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self, host=API_HOST, port=API_PORT):
+        host, port = await self.start(host, port)
+        print(f"✓ JSON API listening on http://{host}:{port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self.executor.shutdown(wait=False)
+        self.stream_executor.shutdown(wait=False)
+
+
+def start_in_thread(rag, batcher=None, host=API_HOST, port=API_PORT, **options):
+    """
+    Run an ApiServer on its own event loop in a daemon thread, so a Gradio
+    app can serve the API from the same process and RAG instance. Returns
+    the server once it is listening.
+    """
+    server = ApiServer(rag, batcher, **options)
+    started = threading.Event()
+    failure = []
+
+    def run():
+        loop = asyncio.new_event_loop()
+        try:
+            server.address = loop.run_until_complete(server.start(host, port))
+        except Exception as e:
+            failure.append(e)
+            started.set()
+            return
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name='api-server', daemon=True).start()
+    started.wait()
+    if failure:
+        raise failure[0]
+    print(f"✓ JSON API listening on http://{server.address[0]}:{server.address[1]}")
+    return server
+
+
+def load_test(host, port, path='/query', clients=8, seconds=5.0, queries=None, **options):
+    """Closed-loop load over keep-alive connections; (requests/s, p50 ms, p99 ms, errors)"""
+    import http.client
+    from warmup import synthetic_queries
+
+    queries = queries or synthetic_queries(1000)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client(i):
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        local = []
+        j = i
+        while time.perf_counter() < stop_at:
+            body = json.dumps(dict(options, query=queries[j % len(queries)]))
+            start = time.perf_counter()
+            try:
+                connection.request('POST', path, body, {'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+            j += clients
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    if not len(ms):
+        return 0.0, float('nan'), float('nan'), errors[0]
+    return len(ms) / elapsed, float(np.percentile(ms, 50)), float(np.percentile(ms, 99)), errors[0]
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python api_server.py [port] [host]           serve UniversalRAG (batched)
+    # python api_server.py load [port] [clients...] load-test a running server
+    if len(sys.argv) > 1 and sys.argv[1] == 'load':
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else API_PORT
+        print(f"Load test against http://{API_HOST}:{port}/query, 5s per point")
+        print(f"  {'clients':>7} {'requests/s':>11} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for clients in [int(c) for c in sys.argv[3:]] or [1, 8, 32]:
+            rps, p50, p99, errors = load_test(API_HOST, port, clients=clients)
+            print(f"  {clients:>7} {rps:11.1f} {p50:9.2f} {p99:9.2f} {errors:>7}")
+        sys.exit(0)
+
+    from query_batcher import QueryBatcher
+    from rag_universal import UniversalRAG
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else API_PORT
+    host = sys.argv[2] if len(sys.argv) > 2 else API_HOST
+    rag = UniversalRAG(background=True)
+    batcher = QueryBatcher(rag, method='retrieve_queries')
+    server = ApiServer(rag, batcher)
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        batcher.close()
+        server.close()
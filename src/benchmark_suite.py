@@ -0,0 +1,405 @@
+"""
+Retrieval benchmark suite
+For each corpus size (synthetic complaints, see synthetic_corpus.py):
+ingestion throughput (chunk, embed, store build), on-disk and resident
+memory per backend, and query p50/p99, QPS and recall@k per backend and
+k. Results are written as JSON to data/benchmarks/ (untracked) so runs
+can be compared (python benchmark_suite.py compare old.json new.json);
+data/benchmarks/baseline.json is the tracked reference run that
+compare new.json checks against.
+"""
+
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from chunking import find_narrative_column
+from compact_store import directory_bytes
+from synthetic_corpus import CorpusProfile, generate, generate_batches
+from vector_backends import FaissVectorStore, NumpyVectorStore, normalize_rows, open_vector_store
+
+BENCH_SCALES = [int(s) for s in os.environ.get('RAG_BENCH_SCALES', '10000,100000').split(',')]
+BENCH_BACKENDS = os.environ.get('RAG_BENCH_BACKENDS',
+                                'numpy,faiss_flat,faiss_hnsw,faiss_ivf_flat,faiss_ivf_pq,chroma').split(',')
+BENCH_KS = [int(k) for k in os.environ.get('RAG_BENCH_KS', '1,5,10').split(',')]
+BENCH_ENCODER = os.environ.get('RAG_BENCH_ENCODER', 'auto')
+BENCH_QUERIES = int(os.environ.get('RAG_BENCH_QUERIES', 200))
+RESULTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'benchmarks'))
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Resident memory of one opened store, measured in a fresh interpreter
+_FOOTPRINT_SCRIPT = """
+import sys
+sys.path.insert(0, {src!r})
+import numpy as np
+from benchmark_suite import current_rss_mb
+from vector_backends import open_vector_store
+before = current_rss_mb()
+store = open_vector_store({path!r}, {backend!r})
+store.pretouch()
+store.query(np.ones((1, {dim}), dtype=np.float32), n_results=5)
+print('RESULT', current_rss_mb() - before)
+"""
+
+
+class HashingEncoder:
+    """
+    Bag-of-words feature hashing into dim buckets: no model download and
+    ~100x faster than MiniLM on CPU, so million-chunk corpora can be built.
+    Similar texts share buckets, which keeps ANN recall meaningful, but
+    absolute encode times are not MiniLM's (see 'encoder' in the results).
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._buckets = {}
+
+    def _bucket(self, word):
+        bucket = self._buckets.get(word)
+        if bucket is None:
+            bucket = self._buckets[word] = zlib.crc32(word.encode('utf-8')) % self.dim
+        return bucket
+
+    def encode(self, texts, batch_size=4096, show_progress_bar=False, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            words = [text.lower().split() for text in batch]
+            rows = np.repeat(np.arange(len(batch)), [len(w) for w in words])
+            cols = np.fromiter((self._bucket(w) for ws in words for w in ws), dtype=np.int64, count=len(rows))
+            counts = np.bincount(rows * self.dim + cols, minlength=len(batch) * self.dim)
+            out[start:start + len(batch)] = counts.reshape(len(batch), self.dim)
+        return out
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+def load_encoder(name=BENCH_ENCODER):
+    """'hashing', 'minilm', or 'auto' (MiniLM when sentence_transformers is installed)"""
+    if name in ('minilm', 'auto'):
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer('all-MiniLM-L6-v2')
+            model.name = 'all-MiniLM-L6-v2'
+            return model
+        except Exception as e:
+            if name == 'minilm':
+                raise
+            print(f"⚠️  MiniLM unavailable ({e.__class__.__name__}), using the hashing encoder")
+    return HashingEncoder()
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (nan where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError, AttributeError):
+        return float('nan')
+
+
+def exact_top_ids(embeddings, queries, ids, k, batch=16):
+    """
+    Exact cosine top-k ids per query (ground truth for recall) against
+    unit-length embeddings, batched to bound memory. Rows tied with the
+    k-th score are included, so duplicate chunks don't count as misses.
+    """
+    queries = normalize_rows(queries)
+    truth = []
+    for start in range(0, len(queries), batch):
+        scores = queries[start:start + batch] @ embeddings.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        kth = np.take_along_axis(scores, top, axis=1).min(axis=1)
+        truth.extend([{ids[r] for r in np.flatnonzero(row >= bound - 1e-6)} for row, bound in zip(scores, kth)])
+    return truth
+
+
+def ingest_corpus(profile, n_chunks, encoder, path, seed=0, batch_size=10_000):
+    """
+    Generate, chunk and embed ~n_chunks chunks one generator batch at a time.
+    Each batch's embeddings are normalized in place and appended to a raw
+    float32 file at path, so only one batch of vectors is in memory; the
+    matrix comes back memory-mapped. Returns (ids, documents, metadatas,
+    embeddings, complaints, seconds per stage).
+    """
+    from create_proper_vector_store import chunk_rows
+
+    ids, documents, metadatas = [], [], []
+    seconds = {'generate': 0.0, 'chunk': 0.0, 'embed': 0.0}
+    complaints = 0
+    dim = None
+    batches = generate_batches(profile, n_chunks, batch_size, seed)
+    with open(path, 'wb') as f:
+        while True:
+            step = time.perf_counter()
+            df = next(batches, None)
+            seconds['generate'] += time.perf_counter() - step
+            if df is None:
+                break
+            complaints += len(df)
+
+            step = time.perf_counter()
+            batch_ids, batch_docs, batch_meta = chunk_rows(df, find_narrative_column(df.columns))
+            seconds['chunk'] += time.perf_counter() - step
+            del df
+
+            step = time.perf_counter()
+            vectors = np.asarray(encoder.encode(batch_docs, batch_size=256, show_progress_bar=False), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+            f.write(vectors.tobytes())
+            seconds['embed'] += time.perf_counter() - step
+            dim = vectors.shape[1]
+
+            ids.extend(batch_ids)
+            documents.extend(batch_docs)
+            metadatas.extend(batch_meta)
+
+    embeddings = np.memmap(path, dtype=np.float32, mode='r', shape=(len(ids), dim or 0))
+    return ids, documents, metadatas, embeddings, complaints, seconds
+
+
+def build_store(backend, path, ids, embeddings, documents, metadatas):
+    """Build backend's store at path; returns the backend name open_vector_store expects"""
+    if backend == 'numpy':
+        NumpyVectorStore.build(path, ids, embeddings, documents, metadatas)
+        return 'numpy'
+    if backend.startswith('faiss_'):
+        FaissVectorStore.build(path, ids, embeddings, documents, metadatas, index_type=backend[len('faiss_'):],
+                               evaluate=False)
+        return 'faiss'
+    if backend == 'chroma':
+        from create_proper_vector_store import chroma_embeddings, open_collection
+        collection = open_collection(path)
+        batch = 5000
+        for start in range(0, len(ids), batch):
+            collection.add(ids=ids[start:start + batch],
+                           embeddings=chroma_embeddings(embeddings[start:start + batch]),
+                           documents=documents[start:start + batch],
+                           metadatas=metadatas[start:start + batch])
+        return 'chroma'
+    raise ValueError(f"Unknown benchmark backend: {backend}")
+
+
+def footprint_mb(backend, path, dim):
+    """RSS growth from opening, pre-touching and querying the store in a fresh process"""
+    script = _FOOTPRINT_SCRIPT.format(src=SRC_DIR, path=path, backend=backend, dim=dim)
+    result = subprocess.run([sys.executable, '-c', script], cwd=SRC_DIR, capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith('RESULT'):
+            return round(float(line.split()[1]), 1)
+    return None
+
+
+def measure_queries(store, query_embeddings, k, truth=None, batch_size=32):
+    """Single-query p50/p99 and QPS, batched QPS and recall@k through store.query (documents + metadata)"""
+    include = ['documents', 'metadatas']
+    latencies = []
+    found = []
+    for query in query_embeddings:
+        start = time.perf_counter()
+        result = store.query(query[None, :], n_results=k, include=include)
+        latencies.append(time.perf_counter() - start)
+        found.append(result['ids'][0])
+
+    start = time.perf_counter()
+    for i in range(0, len(query_embeddings), batch_size):
+        store.query(query_embeddings[i:i + batch_size], n_results=k, include=include)
+    batched = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    report = {
+        'k': k,
+        'queries': len(query_embeddings),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'qps': round(len(ms) / (ms.sum() / 1000), 1),
+        f'qps_batch_{batch_size}': round(len(query_embeddings) / batched, 1)
+    }
+    if truth is not None:
+        hits = sum(len(set(f) & t) for f, t in zip(found, truth))
+        report['recall'] = round(hits / sum(min(k, len(t)) for t in truth), 4)
+    return report
+
+
+def run_scale(n_chunks, backends=BENCH_BACKENDS, ks=BENCH_KS, encoder=None, n_queries=BENCH_QUERIES,
+              seed=0, profile=None, work_dir=None):
+    """Generate ~n_chunks chunks, ingest them into every backend and benchmark queries"""
+    encoder = encoder or load_encoder()
+    profile = profile or CorpusProfile.from_csv()
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='rag_bench_')
+    result = {'target_chunks': n_chunks, 'backends': {}}
+    try:
+        ids, documents, metadatas, embeddings, complaints, seconds = ingest_corpus(
+            profile, n_chunks, encoder, os.path.join(work_dir, 'embeddings.f32'), seed)
+        generate_s, chunk_s, embed_s = seconds['generate'], seconds['chunk'], seconds['embed']
+        dim = int(embeddings.shape[1])
+
+        result['ingestion'] = {
+            'complaints': complaints,
+            'chunks': len(ids),
+            'generate_seconds': round(generate_s, 3),
+            'chunk_seconds': round(chunk_s, 3),
+            'embed_seconds': round(embed_s, 3),
+            'chunks_per_second_chunking': round(len(ids) / chunk_s, 1) if chunk_s else None,
+            'chunks_per_second_embedding': round(len(ids) / embed_s, 1) if embed_s else None
+        }
+        print(f"\n[{len(ids):,} chunks from {complaints:,} complaints] generate {generate_s:.1f}s, "
+              f"chunk {chunk_s:.1f}s, embed {embed_s:.1f}s ({encoder.name})")
+
+        # Held-out complaints (different seed) as queries, like a user pasting the start of a complaint
+        query_df = generate(profile, n_queries, seed=seed + 1, start_id=0)
+        queries = [str(t)[:200] for t in query_df[find_narrative_column(query_df.columns)]]
+        query_embeddings = np.asarray(encoder.encode(queries, show_progress_bar=False), dtype=np.float32)
+        truth = {k: exact_top_ids(embeddings, query_embeddings, ids, k) for k in ks}
+
+        for backend in backends:
+            path = os.path.join(work_dir, backend)
+            try:
+                step = time.perf_counter()
+                kind = build_store(backend, path, ids, embeddings, documents, metadatas)
+                build_s = time.perf_counter() - step
+            except ImportError as e:
+                result['backends'][backend] = {'skipped': f"{e.__class__.__name__}: {e}"}
+                print(f"  {backend:<15} skipped ({e})")
+                continue
+            except Exception as e:
+                result['backends'][backend] = {'error': f"{e.__class__.__name__}: {e}"}
+                print(f"  {backend:<15} ✗ build failed: {e}")
+                continue
+
+            store = open_vector_store(path, kind)
+            entry = {
+                'build_seconds': round(build_s, 3),
+                'ingest_chunks_per_second': round(len(ids) / (chunk_s + embed_s + build_s), 1),
+                'disk_mb': round(sum(directory_bytes(root) for root, _, _ in os.walk(path)) / 1e6, 1),
+                'resident_mb': footprint_mb(kind, path, dim),
+                'queries': [measure_queries(store, query_embeddings, k, truth[k]) for k in ks]
+            }
+            result['backends'][backend] = entry
+            summary = ", ".join(f"k={q['k']} p50 {q['p50_ms']:.2f}/p99 {q['p99_ms']:.2f} ms "
+                                f"{q['qps']:.0f} qps recall {q['recall']:.3f}" for q in entry['queries'])
+            print(f"  {backend:<15} build {build_s:6.1f}s, disk {entry['disk_mb']:7.1f} MB, "
+                  f"resident {entry['resident_mb']} MB | {summary}")
+            del store
+            shutil.rmtree(path, ignore_errors=True)
+        return result
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def environment():
+    """What a run was measured on, saved next to the numbers"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import faiss
+        faiss_version = faiss.__version__
+    except ImportError:
+        faiss_version = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'faiss': faiss_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def run(scales=BENCH_SCALES, backends=BENCH_BACKENDS, ks=BENCH_KS, encoder_name=BENCH_ENCODER,
+        n_queries=BENCH_QUERIES, seed=0, out_dir=RESULTS_DIR):
+    """Benchmark every scale; returns (results, path of the saved JSON)"""
+    encoder = load_encoder(encoder_name)
+    profile = CorpusProfile.from_csv()
+    results = {
+        'environment': environment(),
+        'config': {'scales': list(scales), 'backends': list(backends), 'ks': list(ks),
+                   'encoder': encoder.name, 'queries': n_queries, 'seed': seed},
+        'scales': [run_scale(n, backends, ks, encoder, n_queries, seed, profile) for n in scales]
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return results, path
+
+
+def compare(baseline, current, tolerance=0.2, recall_drop=0.01):
+    """
+    Regressions of current against baseline (result dicts or JSON paths):
+    latency or build time up, or QPS down, by more than tolerance; recall
+    down by more than recall_drop. Returns a list of messages.
+    """
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    if isinstance(current, str):
+        with open(current) as f:
+            current = json.load(f)
+
+    old_scales = {s['target_chunks']: s for s in baseline['scales']}
+    regressions = []
+    for scale in current['scales']:
+        old = old_scales.get(scale['target_chunks'])
+        if old is None:
+            continue
+        for backend, entry in scale['backends'].items():
+            before = old['backends'].get(backend)
+            if not before or 'queries' not in before or 'queries' not in entry:
+                continue
+            label = f"{scale['target_chunks']:,} chunks, {backend}"
+            if entry['build_seconds'] > before['build_seconds'] * (1 + tolerance):
+                regressions.append(f"{label}: build {before['build_seconds']}s -> {entry['build_seconds']}s")
+            old_queries = {q['k']: q for q in before['queries']}
+            for q in entry['queries']:
+                prev = old_queries.get(q['k'])
+                if prev is None:
+                    continue
+                for metric in ('p50_ms', 'p99_ms'):
+                    if q[metric] > prev[metric] * (1 + tolerance):
+                        regressions.append(f"{label}, k={q['k']}: {metric} {prev[metric]} -> {q[metric]}")
+                if q['qps'] < prev['qps'] * (1 - tolerance):
+                    regressions.append(f"{label}, k={q['k']}: qps {prev['qps']} -> {q['qps']}")
+                if 'recall' in q and 'recall' in prev and q['recall'] < prev['recall'] - recall_drop:
+                    regressions.append(f"{label}, k={q['k']}: recall {prev['recall']} -> {q['recall']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    # python benchmark_suite.py [scale ...]               e.g. 10000 100000 1000000
+    # python benchmark_suite.py compare [old.json] new.json [tolerance]   (old defaults to the baseline)
+    # Backends, k values, encoder and query count: RAG_BENCH_BACKENDS, RAG_BENCH_KS,
+    # RAG_BENCH_ENCODER (auto|minilm|hashing), RAG_BENCH_QUERIES
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        paths = [a for a in sys.argv[2:] if a.endswith('.json')]
+        tolerance = float(sys.argv[-1]) if not sys.argv[-1].endswith('.json') else 0.2
+        baseline, current = paths if len(paths) > 1 else (BASELINE_PATH, paths[0])
+        regressions = compare(baseline, current, tolerance)
+        for message in regressions:
+            print(f"✗ {message}")
+        print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}" if regressions else "✓ No regressions")
+        sys.exit(1 if regressions else 0)
+
+    scales = [int(s) for s in sys.argv[1:]] or BENCH_SCALES
+    results, path = run(scales)
+    print(f"\n✓ Results saved to {path}")
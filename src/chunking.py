@@ -0,0 +1,309 @@
+"""
+Shared text chunking
+Redaction/whitespace cleanup, character mode (the splitter used for the
+Chroma store) and a tokenizer-aware mode that respects the embedding
+model's token limit
+"""
+
+import hashlib
+import re
+
+# all-MiniLM-L6-v2 truncates input at 256 word pieces, including [CLS]/[SEP]
+MODEL_MAX_TOKENS = 256
+
+NARRATIVE_COLUMNS = ['cleaned_narrative', 'Consumer complaint narrative', 'narrative']
+
+_BREAK_RE = re.compile(r"[ .!?,;\n]")
+
+# CFPB redactions: XXXX, XXXXXXXX, XX/XX/XXXX (any case). A run is several
+# of them separated only by whitespace or , ; : / - and collapses to one token.
+# (the word-boundary lookbehind sits after the first literal so the regex
+# engine can still skip ahead to candidate characters)
+_REDACTION = r"[xX](?<![^\W_].)[xX](?:/[xX]{2}){0,2}[xX]*"
+# Single spaces are left alone so only real anomalies produce matches
+_CLEAN_RE = re.compile(rf"(?P<run>{_REDACTION}(?:[\s,;:/\-]+{_REDACTION})*)|(?P<space> \s+|[^\S ]\s*)")
+
+
+def find_narrative_column(columns):
+    """Return the first known narrative column present in columns"""
+    for col in NARRATIVE_COLUMNS:
+        if col in columns:
+            return col
+    return None
+
+
+def chunk_id(complaint_id, chunk):
+    """Stable chunk id built from the complaint id and a hash of the chunk text"""
+    digest = hashlib.sha1(chunk.encode('utf-8')).hexdigest()[:16]
+    return f"{complaint_id}_{digest}"
+
+
+def clean_narrative(text, placeholder='xxxx'):
+    """
+    Collapse runs of redaction tokens to one placeholder and all whitespace
+    to single spaces.
+
+    Returns (clean, origin): origin has len(clean) + 1 entries and
+    origin[i] is the offset in text where clean[i] came from (the end
+    entry is len(text)), so spans of clean map back with original_span.
+    """
+    if not text or not isinstance(text, str):
+        return "", [0]
+
+    pieces = []
+    origin = []
+    position = 0
+    for match in _CLEAN_RE.finditer(text):
+        start, end = match.span()
+        if start > position:
+            pieces.append(text[position:start])
+            origin.extend(range(position, start))
+        if match.lastgroup == 'run':
+            token = placeholder.upper() if match.group()[0] == 'X' else placeholder
+            pieces.append(token)
+            origin.extend([start] * len(token))
+            # keep a word glued to the redaction ("XXXXI am") separate; the
+            # space maps to the run's end so spans ending here keep the run
+            if end < len(text) and text[end].isalnum():
+                pieces.append(' ')
+                origin.append(end)
+        else:
+            pieces.append(' ')
+            origin.append(start)
+        position = end
+    pieces.append(text[position:])
+    origin.extend(range(position, len(text)))
+
+    clean = ''.join(pieces)
+    start, end = _strip_span(clean, 0, len(clean))
+    origin = origin[start:end] + [origin[end] if end < len(clean) else len(text)]
+    return clean[start:end], origin
+
+
+def original_span(text, origin, start, end):
+    """Map a (start, end) span of clean_narrative(text) back to text, stripped"""
+    return _strip_span(text, origin[start], origin[end])
+
+
+def _strip_span(text, start, end):
+    """Shrink [start, end) so text[start:end] == text[start:end].strip()"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def split_spans(text, chunk_size=500, chunk_overlap=50, lookahead=100, force_extra=50):
+    """
+    Character-mode chunk boundaries as (start, end) offsets into text.
+
+    Chunks are ~chunk_size characters, extended to the next break character
+    (space or . ! ? , ; newline) within lookahead characters, or cut
+    force_extra characters past chunk_size if there is none. Consecutive
+    chunks overlap by chunk_overlap characters. The break search is one
+    bounded regex search per chunk, and every step advances by at least
+    chunk_size - chunk_overlap characters, so the cost is linear in the
+    text length.
+    """
+    if not text or not isinstance(text, str):
+        return []
+    if chunk_overlap >= chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+
+    offset, text_end = _strip_span(text, 0, len(text))
+    if text_end - offset <= chunk_size:
+        return [(offset, text_end)]
+
+    spans = []
+    start = offset
+
+    while start < text_end:
+        end = start + chunk_size
+        if end >= text_end:
+            span = _strip_span(text, start, text_end)
+            if span[1] > span[0]:
+                spans.append(span)
+            break
+
+        match = _BREAK_RE.search(text, end, min(text_end, end + lookahead))
+        if match:
+            break_point = match.start() + 1
+        else:
+            break_point = min(text_end, end + force_extra)
+
+        span = _strip_span(text, start, break_point)
+        if span[1] > span[0]:
+            spans.append(span)
+
+        start = max(start + 1, break_point - chunk_overlap)
+
+    return spans
+
+
+def split_text(text, chunk_size=500, chunk_overlap=50):
+    """Character-mode chunks as strings"""
+    return [text[start:end] for start, end in split_spans(text, chunk_size, chunk_overlap)]
+
+
+def split_token_spans(text, tokenizer, max_tokens=MODEL_MAX_TOKENS, overlap_tokens=16, special_tokens=2):
+    """
+    Tokenizer-aware chunk boundaries as (start, end) character offsets.
+
+    Every chunk holds at most max_tokens - special_tokens word pieces, so
+    nothing is silently truncated by the model. Cuts are moved back (by at
+    most half a chunk) to the nearest whitespace between tokens so words
+    are not split; consecutive chunks share overlap_tokens tokens.
+    tokenizer must be a HuggingFace fast tokenizer (model.tokenizer of a
+    SentenceTransformer).
+    """
+    if not text or not isinstance(text, str):
+        return []
+    budget = max_tokens - special_tokens
+    if overlap_tokens >= budget:
+        raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than {budget}")
+
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                        truncation=False, verbose=False)['offset_mapping']
+    n = len(offsets)
+    if n == 0:
+        return []
+    if n <= budget:
+        return [_strip_span(text, offsets[0][0], offsets[-1][1])]
+
+    spans = []
+    i = 0
+    while i < n:
+        j = min(n, i + budget)
+        if j < n:
+            # Prefer to end where there is whitespace before the next token
+            for cut in range(j, i + budget // 2, -1):
+                if offsets[cut][0] > offsets[cut - 1][1]:
+                    j = cut
+                    break
+        spans.append(_strip_span(text, offsets[i][0], offsets[j - 1][1]))
+        if j >= n:
+            break
+        i = max(i + 1, j - overlap_tokens)
+
+    return spans
+
+
+def truncation_report(chunks, tokenizer, max_tokens=MODEL_MAX_TOKENS, batch_size=256):
+    """How many chunks exceed the model's token limit and how many tokens get dropped"""
+    truncated = 0
+    dropped = 0
+    total = 0
+    for i in range(0, len(chunks), batch_size):
+        lengths = [len(ids) for ids in tokenizer(chunks[i:i + batch_size], add_special_tokens=True,
+                                                  truncation=False, verbose=False)['input_ids']]
+        total += sum(lengths)
+        for length in lengths:
+            if length > max_tokens:
+                truncated += 1
+                dropped += length - max_tokens
+    return {
+        'chunks': len(chunks),
+        'truncated_chunks': truncated,
+        'truncated_fraction': round(truncated / len(chunks), 4) if chunks else 0.0,
+        'tokens': total,
+        'tokens_dropped': dropped
+    }
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+
+    # Reference copies of the two splitters this module replaced
+    def legacy_char_splitter(text, chunk_size=500, chunk_overlap=50):
+        text = text.strip()
+        if len(text) <= chunk_size:
+            return [text]
+        chunks, start, text_length = [], 0, len(text)
+        while start < text_length:
+            end = start + chunk_size
+            if end >= text_length:
+                chunk = text[start:].strip()
+                if chunk:
+                    chunks.append(chunk)
+                break
+            break_point = end
+            for i in range(end, min(text_length, end + 100)):
+                if text[i] in ' .!?,;\n':
+                    break_point = i + 1
+                    break
+            if break_point == end:
+                break_point = min(text_length, end + 50)
+            chunk = text[start:break_point].strip()
+            if chunk:
+                chunks.append(chunk)
+            start = max(start + 1, break_point - chunk_overlap)
+        return chunks
+
+    def legacy_sentence_splitter(text, chunk_size=500, chunk_overlap=50):
+        chunks, current_chunk = [], ""
+        for sentence in re.split(r'(?<=[.!?])\s+', text):
+            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
+                chunks.append(current_chunk.strip())
+                current_chunk = current_chunk[max(0, len(current_chunk) - chunk_overlap):] + " " + sentence
+            else:
+                current_chunk += " " + sentence if current_chunk else sentence
+        if current_chunk.strip():
+            chunks.append(current_chunk.strip())
+        return chunks
+
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    texts = [str(t) for t in df[find_narrative_column(df.columns)].dropna()]
+    repeat = 20
+
+    print(f"Chunking {len(texts)} narratives x {repeat}")
+    for label, fn in [('legacy char loop', legacy_char_splitter),
+                      ('legacy sentence concat', legacy_sentence_splitter),
+                      ('shared char mode', split_text)]:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            n_chunks = sum(len(fn(t)) for t in texts)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"  {label:<24} {elapsed * 1000:7.2f} ms  ({n_chunks} chunks)")
+
+    raw_chunks = [c for t in texts for c in split_text(t)]
+    start = time.perf_counter()
+    cleaned = [clean_narrative(t)[0] for t in texts]
+    clean_seconds = time.perf_counter() - start
+    clean_chunks = [c for t in cleaned for c in split_text(t)]
+    print(f"\nRedaction collapsing ({clean_seconds * 1000:.1f} ms for the corpus):")
+    print(f"  Characters: {sum(map(len, texts)):,} -> {sum(map(len, cleaned)):,}")
+    print(f"  Chunks:     {len(raw_chunks):,} -> {len(clean_chunks):,}")
+
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/all-MiniLM-L6-v2')
+    except Exception as e:
+        print(f"\n(tokenizer unavailable, skipping token counts: {e.__class__.__name__})")
+    else:
+        raw_tokens = truncation_report(raw_chunks, tokenizer)['tokens']
+        clean_tokens = truncation_report(clean_chunks, tokenizer)['tokens']
+        print(f"  Tokens:     {raw_tokens:,} -> {clean_tokens:,}")
+
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer('all-MiniLM-L6-v2')
+            for label, chunks in [('raw', raw_chunks), ('cleaned', clean_chunks)]:
+                start = time.perf_counter()
+                model.encode(chunks, batch_size=64, show_progress_bar=False)
+                print(f"  Embedding {label} chunks: {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"  (embedding model unavailable: {e.__class__.__name__})")
+
+        char_chunks = [c for t in texts for c in split_text(t)]
+        report = truncation_report(char_chunks, tokenizer)
+        print(f"\nChar mode: {report['truncated_chunks']}/{report['chunks']} chunks exceed "
+              f"{MODEL_MAX_TOKENS} tokens ({report['tokens_dropped']} tokens silently dropped)")
+
+        start = time.perf_counter()
+        token_chunks = [text[s:e] for text in texts for s, e in split_token_spans(text, tokenizer)]
+        elapsed = time.perf_counter() - start
+        report = truncation_report(token_chunks, tokenizer)
+        print(f"Token mode: {len(token_chunks)} chunks in {elapsed * 1000:.1f} ms, "
+              f"{report['truncated_chunks']} truncated")
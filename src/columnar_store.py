@@ -0,0 +1,304 @@
+"""
+Columnar binary chunk store
+Chunk texts and typed metadata columns in one Arrow table (memory-mapped
+IPC file, or Parquet), embeddings in a memory-mappable .npy matrix
+"""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from chunking import chunk_id
+
+TABLE_FILES = {'arrow': 'chunks.arrow', 'parquet': 'chunks.parquet'}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar store (pip install pyarrow)")
+
+
+def find_table_file(path):
+    """(format, file path) of the chunk table in path, or (None, None)"""
+    for fmt, name in TABLE_FILES.items():
+        full = os.path.join(path, name)
+        if os.path.exists(full):
+            return fmt, full
+    return None, None
+
+
+class ArrowColumnSequence:
+    """Read-only list view of an Arrow column; values are converted on access"""
+
+    def __init__(self, column):
+        self.column = column
+
+    def __len__(self):
+        return len(self.column)
+
+    def __getitem__(self, row):
+        return self.column[int(row)].as_py()
+
+    def __iter__(self):
+        return iter(self.column.to_pylist())
+
+
+def _metadata_column(values):
+    """Typed Arrow array for one metadata field; repeated strings are dictionary-encoded"""
+    try:
+        array = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        array = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    if pa.types.is_string(array.type) and len(array) and \
+            len(set(values)) <= max(1, len(values) // 2):
+        array = array.dictionary_encode()
+    return array
+
+
+def build_table(ids, documents, metadatas):
+    """Arrow table with id, document and one typed column per metadata field"""
+    _require_pyarrow()
+    fields = []
+    for meta in metadatas:
+        for key in meta:
+            if key not in fields and key not in ('id', 'document'):
+                fields.append(key)
+
+    columns = {'id': pa.array([str(i) for i in ids], type=pa.string()),
+               'document': pa.array(list(documents), type=pa.string())}
+    for field in fields:
+        columns[field] = _metadata_column([meta.get(field) for meta in metadatas])
+    return pa.table(columns)
+
+
+def write_columnar_store(path, ids, documents, metadatas, embeddings=None, fmt='arrow', info=None):
+    """
+    Write a columnar store directory:
+      chunks.arrow / chunks.parquet - id, document and typed metadata columns
+      embeddings.npy                - (n, dim) float32, L2-normalized (if given)
+      store_info.json               - counts, schema, format
+
+    With embeddings the directory also opens as a NumpyVectorStore.
+    """
+    if fmt not in TABLE_FILES:
+        raise ValueError(f"Unknown table format '{fmt}', expected one of {tuple(TABLE_FILES)}")
+    os.makedirs(path, exist_ok=True)
+    table = build_table(ids, documents, metadatas)
+
+    for name in TABLE_FILES.values():
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+    table_path = os.path.join(path, TABLE_FILES[fmt])
+    if fmt == 'arrow':
+        # Uncompressed IPC so the loader can memory-map it without copying
+        with pa.OSFile(table_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    else:
+        pq.write_table(table, table_path, compression='zstd')
+
+    store_info = dict(info or {})
+    store_info.update({
+        'backend': 'numpy_exact',
+        'side_arrays': 'columnar',
+        'table_format': fmt,
+        'total_chunks': table.num_rows,
+        'metadata_fields': table.column_names[2:],
+        'schema': {field.name: str(field.type) for field in table.schema}
+    })
+
+    embeddings_path = os.path.join(path, 'embeddings.npy')
+    if embeddings is not None:
+        from vector_backends import normalize_rows
+
+        embeddings = normalize_rows(embeddings)
+        np.save(embeddings_path, embeddings)
+        store_info['embedding_dimension'] = int(embeddings.shape[1]) if len(embeddings) else 0
+    elif os.path.exists(embeddings_path):
+        os.remove(embeddings_path)
+
+    with open(os.path.join(path, 'store_info.json'), 'w') as f:
+        json.dump(store_info, f, indent=2)
+    return table.num_rows
+
+
+class ColumnarChunkStore:
+    """
+    Read side of the columnar layout.
+
+    The Arrow IPC file is memory-mapped, so opening costs a few
+    milliseconds regardless of size and columns are only paged in when
+    read; a Parquet table is decoded on open. embeddings.npy (if present)
+    is memory-mapped as well.
+    """
+
+    def __init__(self, path, mmap=True):
+        _require_pyarrow()
+        self.path = path
+        self.format, table_path = find_table_file(path)
+        if table_path is None:
+            raise FileNotFoundError(f"No chunks.arrow or chunks.parquet in {path}")
+
+        if self.format == 'arrow':
+            source = pa.memory_map(table_path, 'r') if mmap else pa.OSFile(table_path, 'rb')
+            self.table = pa.ipc.open_file(source).read_all()
+        else:
+            self.table = pq.read_table(table_path, memory_map=mmap)
+
+        embeddings_path = os.path.join(path, 'embeddings.npy')
+        self.embeddings = np.load(embeddings_path, mmap_mode='r' if mmap else None) \
+            if os.path.exists(embeddings_path) else None
+
+        self.ids = ArrowColumnSequence(self.table.column('id'))
+        self.documents = ArrowColumnSequence(self.table.column('document'))
+        self.metadata_fields = self.table.column_names[2:]
+        self._metadata_columns = [(field, self.table.column(field)) for field in self.metadata_fields]
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def text(self, row):
+        return self.documents[row]
+
+    def metadata(self, row):
+        """Metadata dict for one row (None values omitted, as in the other side arrays)"""
+        row = int(row)
+        meta = {}
+        for field, column in self._metadata_columns:
+            value = column[row].as_py()
+            if value is not None:
+                meta[field] = value
+        return meta
+
+    def column(self, field):
+        """Whole column as a NumPy array (zero-copy for numeric columns without nulls)"""
+        return self.table.column(field).to_numpy()
+
+    def to_pandas(self):
+        return self.table.to_pandas()
+
+
+def convert_simple_csv(csv_path='../vector_store/simple_vector_store.csv',
+                       out_path='../vector_store/simple_columnar_store', fmt='arrow', embed=False):
+    """
+    Convert create_vector_store.py's CSV (chunk_text + JSON metadata) to a
+    columnar store. The CSV has no embeddings; with embed=True they are
+    computed with the MiniLM model.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    documents = df['chunk_text'].fillna('').astype(str).tolist()
+    metadatas = [json.loads(m) if isinstance(m, str) else {} for m in df['metadata']]
+
+    ids = []
+    seen = set()
+    for i, (doc, meta) in enumerate(zip(documents, metadatas)):
+        cid = chunk_id(meta.get('complaint_id', f'ID_{i}'), doc)
+        if cid in seen:
+            cid = f"{cid}_{i}"
+        seen.add(cid)
+        ids.append(cid)
+
+    embeddings = None
+    if embed:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer('all-MiniLM-L6-v2')
+        embeddings = model.encode(documents, batch_size=64, show_progress_bar=False)
+
+    return write_columnar_store(out_path, ids, documents, metadatas, embeddings, fmt=fmt,
+                                info={'source': csv_path})
+
+
+def convert_chroma(chroma_path='../vector_store', out_path='../vector_store/columnar_store',
+                   fmt='arrow', collection_name='complaint_chunks'):
+    """Convert a Chroma store (ids, embeddings, documents, metadata) to a columnar store"""
+    from vector_backends import export_chroma
+
+    ids, embeddings, documents, metadatas = export_chroma(chroma_path, collection_name)
+    return write_columnar_store(out_path, ids, documents, metadatas, embeddings, fmt=fmt,
+                                info={'source': chroma_path})
+
+
+def _benchmark(csv_path, scale=1):
+    """Load time / memory of the CSV path vs the columnar store"""
+    import gc
+    import shutil
+    import tempfile
+    import time
+    import tracemalloc
+    import pandas as pd
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        source = pd.read_csv(csv_path)
+        if scale > 1:
+            source = pd.concat([source] * scale, ignore_index=True)
+        scaled_csv = os.path.join(work_dir, 'chunks.csv')
+        source.to_csv(scaled_csv, index=False)
+
+        def csv_load():
+            df = pd.read_csv(scaled_csv)
+            return df['chunk_text'].tolist(), [json.loads(m) for m in df['metadata']]
+
+        results = {}
+        for fmt in TABLE_FILES:
+            store_path = os.path.join(work_dir, fmt)
+            convert_simple_csv(scaled_csv, store_path, fmt=fmt)
+            results[fmt] = store_path
+
+        print(f"\nLoad benchmark: {len(source):,} chunks")
+        print("  (open = ready for row lookups; full = every row materialized as a DataFrame)")
+        print(f"  {'path':<22} {'open ms':>9} {'full ms':>9} {'heap MB':>9} {'disk MB':>9}")
+
+        def measure(label, open_fn, rows_fn, disk_bytes):
+            gc.collect()
+            # Arrow's pool is process-wide: only what this load added counts
+            arrow_before = pa.total_allocated_bytes()
+            tracemalloc.start()
+            start = time.perf_counter()
+            handle = open_fn()
+            opened = time.perf_counter() - start
+            rows_fn(handle)
+            total = time.perf_counter() - start
+            heap = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            arrow_bytes = pa.total_allocated_bytes() - arrow_before
+            del handle
+            print(f"  {label:<22} {opened * 1000:9.1f} {total * 1000:9.1f} "
+                  f"{(heap + arrow_bytes) / 1e6:9.2f} {disk_bytes / 1e6:9.2f}")
+
+        measure('CSV + json.loads', csv_load, lambda h: None, os.path.getsize(scaled_csv))
+        for fmt, store_path in results.items():
+            table_path = os.path.join(store_path, TABLE_FILES[fmt])
+            measure(f'columnar ({fmt})', lambda: ColumnarChunkStore(store_path),
+                    lambda s: s.to_pandas(),
+                    os.path.getsize(table_path))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if '--chroma' in sys.argv:
+        chroma_path = sys.argv[sys.argv.index('--chroma') + 1]
+        n = convert_chroma(chroma_path)
+        print(f"✓ Wrote {n:,} chunks from {chroma_path} to ../vector_store/columnar_store")
+        sys.exit(0)
+
+    csv_path = '../vector_store/simple_vector_store.csv'
+    n = convert_simple_csv(csv_path, embed='--embed' in sys.argv)
+    print(f"✓ Converted {n:,} chunks from {csv_path} to ../vector_store/simple_columnar_store")
+
+    scale = int(sys.argv[sys.argv.index('--scale') + 1]) if '--scale' in sys.argv else 1
+    _benchmark(csv_path, scale=scale)
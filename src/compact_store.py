@@ -0,0 +1,312 @@
+"""
+Compact chunk storage
+Each narrative is stored once; chunks are (complaint_row, start, end) spans
+into it and complaint-level fields live in one columnar table
+"""
+
+import json
+import os
+import shutil
+import sys
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from chunking import chunk_id, clean_narrative, find_narrative_column, original_span, split_spans
+
+# Complaint-level columns: stored name -> CSV column
+COMPLAINT_FIELDS = {
+    'complaint_id': 'Complaint ID',
+    'product': 'Product',
+    'issue': 'Issue',
+    'company': 'Company',
+    'state': 'State',
+    'date_received': 'Date received'
+}
+
+CHUNK_DTYPE = np.dtype([('complaint_row', '<i4'), ('start', '<i4'), ('end', '<i4'), ('chunk_index', '<i2'),
+                        ('char_start', '<i4'), ('char_end', '<i4')])
+
+
+class CompactChunkStore:
+    """
+    Read side of the compact layout.
+
+    Files in the directory:
+      narratives.bin      - every (cleaned) narrative once, UTF-8 (zlib per narrative if compressed)
+      narrative_offsets.npy - (n_complaints + 1,) int64 byte offsets into narratives.bin
+      chunks.npy          - one CHUNK_DTYPE record per chunk
+      complaints.json     - {field: [n_complaints values]}
+      compact_info.json   - counts, compression flag, chunking settings
+
+    start/end index the stored narrative; char_start/char_end index the
+    original CSV narrative (they differ when redactions were collapsed).
+    """
+
+    def __init__(self, path, narrative_cache_size=1024):
+        self.path = path
+        with open(os.path.join(path, 'compact_info.json')) as f:
+            self.info = json.load(f)
+        with open(os.path.join(path, 'complaints.json')) as f:
+            self.complaints = json.load(f)
+
+        self.chunks = np.load(os.path.join(path, 'chunks.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'narrative_offsets.npy'))
+        self.blob = np.memmap(os.path.join(path, 'narratives.bin'), dtype=np.uint8, mode='r') \
+            if self.offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        self.compressed = self.info.get('compressed', False)
+        self.total_chunks = np.bincount(self.chunks['complaint_row'], minlength=len(self.offsets) - 1)
+
+        self.narrative = lru_cache(maxsize=narrative_cache_size)(self._narrative)
+        self._row_of = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def _narrative(self, complaint_row):
+        raw = self.blob[self.offsets[complaint_row]:self.offsets[complaint_row + 1]].tobytes()
+        if self.compressed:
+            raw = zlib.decompress(raw)
+        return raw.decode('utf-8')
+
+    def text(self, row):
+        chunk = self.chunks[row]
+        return self.narrative(int(chunk['complaint_row']))[chunk['start']:chunk['end']]
+
+    def metadata(self, row):
+        """Chunk metadata in the same shape create_proper_vector_store writes to Chroma"""
+        chunk = self.chunks[row]
+        complaint_row = int(chunk['complaint_row'])
+        meta = {field: values[complaint_row] for field, values in self.complaints.items()
+                if values[complaint_row] is not None}
+        if 'product' in meta:
+            meta['product_category'] = meta['product']
+        meta['chunk_index'] = int(chunk['chunk_index'])
+        meta['total_chunks'] = int(self.total_chunks[complaint_row])
+        if 'char_start' in self.chunks.dtype.names:
+            meta['char_start'] = int(chunk['char_start'])
+            meta['char_end'] = int(chunk['char_end'])
+        return meta
+
+    def chunk_ids(self):
+        """Content-hash ids of every chunk, in row order"""
+        complaint_ids = self.complaints['complaint_id']
+        ids = []
+        previous_row, seen = None, set()
+        for row, chunk in enumerate(self.chunks):
+            complaint_row = int(chunk['complaint_row'])
+            if complaint_row != previous_row:
+                previous_row, seen = complaint_row, set()
+            cid = chunk_id(complaint_ids[complaint_row], self.text(row))
+            if cid in seen:
+                cid = f"{cid}_{int(chunk['chunk_index'])}"
+            seen.add(cid)
+            ids.append(cid)
+        return ids
+
+    def row_of(self, chunk_ids):
+        """Map chunk ids (e.g. a vector store's ids.json) to compact rows"""
+        if self._row_of is None:
+            self._row_of = {cid: row for row, cid in enumerate(self.chunk_ids())}
+        return np.array([self._row_of[cid] for cid in chunk_ids], dtype=np.int64)
+
+
+def _json_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def build_compact_store(path, csv_path='../data/filtered_complaints.csv', compress=True,
+                        chunk_size=500, chunk_overlap=50, min_length=20, collapse_redactions=True):
+    """
+    Write the compact layout for a complaints CSV. Chunk rows come out in
+    the same order as create_proper_vector_store.chunk_rows.
+    """
+    os.makedirs(path, exist_ok=True)
+    df = pd.read_csv(csv_path)
+    narrative_col = find_narrative_column(df.columns)
+
+    complaints = {field: [] for field in COMPLAINT_FIELDS}
+    complaints['original_row'] = []
+    offsets = [0]
+    chunk_records = []
+
+    with open(os.path.join(path, 'narratives.bin'), 'wb') as blob:
+        for idx, row in zip(df.index, df.to_dict('records')):
+            narrative = row.get(narrative_col)
+            narrative = str(narrative) if pd.notna(narrative) else ""
+            text, origin = clean_narrative(narrative) if collapse_redactions else (narrative, None)
+            if not text or len(text.strip()) < min_length:
+                continue
+
+            spans = split_spans(text, chunk_size, chunk_overlap)
+            if not spans:
+                continue
+
+            complaint_row = len(offsets) - 1
+            for field, column in COMPLAINT_FIELDS.items():
+                default = f'ID_{idx}' if field == 'complaint_id' else 'Unknown'
+                complaints[field].append(_json_value(row.get(column, default)))
+            complaints['original_row'].append(int(idx))
+
+            data = text.encode('utf-8')
+            if compress:
+                data = zlib.compress(data, 6)
+            blob.write(data)
+            offsets.append(offsets[-1] + len(data))
+
+            for i, (start, end) in enumerate(spans):
+                char_start, char_end = original_span(narrative, origin, start, end) if origin else (start, end)
+                chunk_records.append((complaint_row, start, end, i, char_start, char_end))
+
+    np.save(os.path.join(path, 'narrative_offsets.npy'), np.array(offsets, dtype=np.int64))
+    np.save(os.path.join(path, 'chunks.npy'), np.array(chunk_records, dtype=CHUNK_DTYPE))
+    with open(os.path.join(path, 'complaints.json'), 'w') as f:
+        json.dump(complaints, f)
+    with open(os.path.join(path, 'compact_info.json'), 'w') as f:
+        json.dump({
+            'total_complaints': len(offsets) - 1,
+            'total_chunks': len(chunk_records),
+            'compressed': compress,
+            'chunk_size': chunk_size,
+            'chunk_overlap': chunk_overlap,
+            'collapse_redactions': collapse_redactions,
+            'source': csv_path
+        }, f, indent=2)
+
+    return CompactChunkStore(path)
+
+
+def directory_bytes(path, names=None):
+    """Total size of the files in path (optionally only the given names)"""
+    total = 0
+    for name in os.listdir(path):
+        if names is None or name in names:
+            full = os.path.join(path, name)
+            if os.path.isfile(full):
+                total += os.path.getsize(full)
+    return total
+
+
+def size_report(store):
+    """
+    Compare the per-chunk layout (full text + full metadata dict per chunk,
+    as written to Chroma / documents.json + metadata.json) with the compact one
+    """
+    documents = [store.text(row) for row in range(len(store))]
+    metadatas = [store.metadata(row) for row in range(len(store))]
+
+    per_chunk_disk = len(json.dumps(documents).encode('utf-8')) + len(json.dumps(metadatas).encode('utf-8'))
+    per_chunk_ram = sum(sys.getsizeof(d) for d in documents) + sum(
+        sys.getsizeof(m) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in m.items()) for m in metadatas)
+
+    narratives = [store.narrative(i) for i in range(len(store.offsets) - 1)]
+    compact_disk = directory_bytes(store.path, {'narratives.bin', 'narrative_offsets.npy',
+                                                'chunks.npy', 'complaints.json'})
+    compact_ram = (store.blob.nbytes + store.offsets.nbytes + store.chunks.nbytes
+                   + sum(sys.getsizeof(v) for values in store.complaints.values() for v in values))
+
+    return {
+        'chunks': len(store),
+        'complaints': len(narratives),
+        'per_chunk_disk_bytes': per_chunk_disk,
+        'compact_disk_bytes': compact_disk,
+        'per_chunk_ram_bytes': per_chunk_ram,
+        'compact_ram_bytes': compact_ram
+    }
+
+
+def _chunking_options(store_path, documents, collapse_redactions, chunk_size=500):
+    """
+    create_proper_vector_store options that likely explain a store's
+    unresolved chunks, guessed from their documents since store_info.json
+    doesn't record how the store was chunked
+    """
+    with open(os.path.join(store_path, 'store_info.json')) as f:
+        fields = json.load(f).get('metadata_fields', [])
+    raw_redactions = any('XX' in doc for doc in documents)
+
+    options = []
+    if any(len(doc) > chunk_size for doc in documents):
+        options.append('--token-aware')
+    if collapse_redactions and raw_redactions:
+        options.append('--keep-redactions')
+    if not collapse_redactions and not raw_redactions:
+        options.append('redactions collapsed (built without --keep-redactions)')
+    if 'duplicate_count' in fields or 'duplicate_of' in fields:
+        options.append('--dedup')
+    return options or [f'a chunk size/overlap other than {chunk_size}/50']
+
+
+def attach_to_vector_store(store_path, csv_path='../data/filtered_complaints.csv', compress=True,
+                           collapse_redactions=True):
+    """
+    Give a NumPy/FAISS store compact side arrays: builds them next to the
+    store, checks that every id in ids.json resolves (ValueError naming the
+    chunking options otherwise) and texts match, moves them to
+    store_path/compact, then drops documents.json and metadata.json
+    """
+    with open(os.path.join(store_path, 'ids.json')) as f:
+        ids = json.load(f)
+    with open(os.path.join(store_path, 'documents.json')) as f:
+        documents = json.load(f)
+
+    before = directory_bytes(store_path, {'documents.json', 'metadata.json'})
+    # Built aside first: a compact/ directory whose ids don't resolve would break opening the store
+    staging = os.path.join(store_path, 'compact.partial')
+    shutil.rmtree(staging, ignore_errors=True)
+    compact = build_compact_store(staging, csv_path, compress=compress, collapse_redactions=collapse_redactions)
+
+    known = set(compact.chunk_ids())
+    missing = [row for row, cid in enumerate(ids) if cid not in known]
+    if missing:
+        del compact
+        shutil.rmtree(staging, ignore_errors=True)
+        options = _chunking_options(store_path, [documents[row] for row in missing], collapse_redactions)
+        raise ValueError(
+            f"{len(missing):,} of {len(ids):,} ids in {store_path} (e.g. {ids[missing[0]]!r}) don't match the "
+            f"compact store's chunking (chunk_size=500, chunk_overlap=50, collapse_redactions={collapse_redactions}); "
+            f"the store looks built with {', '.join(options)}. Not attached, the store is unchanged")
+
+    final = os.path.join(store_path, 'compact')
+    del compact
+    shutil.rmtree(final, ignore_errors=True)
+    os.rename(staging, final)
+    compact = CompactChunkStore(final)
+
+    rows = compact.row_of(ids)
+    mismatched = sum(1 for row, doc in zip(rows, documents) if compact.text(row) != doc)
+    if mismatched:
+        raise ValueError(f"{mismatched} chunk texts differ between the store and {csv_path}")
+
+    os.remove(os.path.join(store_path, 'documents.json'))
+    os.remove(os.path.join(store_path, 'metadata.json'))
+    after = directory_bytes(compact.path)
+    print(f"✓ {store_path}: side arrays {before:,} -> {after:,} bytes")
+    return before, after
+
+
+if __name__ == "__main__":
+    if '--store' in sys.argv:
+        attach_to_vector_store(sys.argv[sys.argv.index('--store') + 1],
+                               collapse_redactions='--keep-redactions' not in sys.argv)
+        sys.exit(0)
+
+    out_path = sys.argv[1] if len(sys.argv) > 1 else '../vector_store/compact_chunks'
+
+    for compress in (False, True):
+        store = build_compact_store(out_path, compress=compress)
+        report = size_report(store)
+        label = 'compressed' if compress else 'uncompressed'
+        print(f"\nCompact store ({label}): {report['complaints']} complaints, {report['chunks']} chunks")
+        print(f"  On disk: {report['per_chunk_disk_bytes']:,} -> {report['compact_disk_bytes']:,} bytes "
+              f"({report['compact_disk_bytes'] / report['per_chunk_disk_bytes']:.1%})")
+        print(f"  In RAM:  {report['per_chunk_ram_bytes']:,} -> {report['compact_ram_bytes']:,} bytes "
+              f"({report['compact_ram_bytes'] / report['per_chunk_ram_bytes']:.1%})")
+
+    print(f"\n✓ Compact store written to: {out_path}")
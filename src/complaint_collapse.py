@@ -0,0 +1,223 @@
+"""
+Complaint-level result collapsing
+Over-fetch chunks until the top results cover k distinct complaints, keep
+the best-scoring chunk of each (plus optional neighboring chunks) and
+track how much over-fetching that took
+"""
+
+from collections import deque
+
+import numpy as np
+
+DEFAULT_INITIAL_FACTOR = 3.0
+
+
+class OverfetchStats:
+    """
+    Running over-fetch statistics for collapsed queries.
+
+    For each query the 'needed' factor is the rank of the chunk that
+    completed the k-th distinct complaint divided by k; the next query
+    starts fetching at the mean needed factor over the last window
+    queries times headroom, so typical queries finish in one round.
+    """
+
+    def __init__(self, initial_factor=DEFAULT_INITIAL_FACTOR, window=1000, headroom=1.25):
+        self.default_factor = initial_factor
+        self.headroom = headroom
+        self.needed = deque(maxlen=window)
+        self.queries = 0
+        self.rounds = 0
+        self.requeried = 0
+        self.fetched = 0
+        self.requested = 0
+
+    def initial_factor(self):
+        if not self.needed:
+            return self.default_factor
+        return max(1.0, float(np.mean(self.needed)) * self.headroom)
+
+    def record(self, n_results, fetched, needed_rank, rounds):
+        self.queries += 1
+        self.rounds += rounds
+        self.requeried += rounds > 1
+        self.fetched += fetched
+        self.requested += n_results
+        if needed_rank is not None:
+            self.needed.append(needed_rank / n_results)
+
+    def report(self):
+        return {
+            'queries': self.queries,
+            'avg_overfetch_factor': round(self.fetched / self.requested, 3) if self.requested else 0.0,
+            'avg_needed_factor': round(float(np.mean(self.needed)), 3) if self.needed else 0.0,
+            'next_initial_factor': round(self.initial_factor(), 3),
+            'avg_rounds': round(self.rounds / self.queries, 3) if self.queries else 0.0,
+            'requery_rate': round(self.requeried / self.queries, 4) if self.queries else 0.0
+        }
+
+
+def join_chunks(texts, max_overlap=200):
+    """Concatenate consecutive chunks of one narrative, dropping the text they share"""
+    joined = texts[0] if texts else ''
+    for text in texts[1:]:
+        shared = 0
+        for size in range(min(max_overlap, len(joined), len(text)), 0, -1):
+            if joined.endswith(text[:size]):
+                shared = size
+                break
+        joined += text[shared:] if shared else ' ' + text
+    return joined
+
+
+def _collapse_one(ids, metadatas, n_results):
+    """
+    Best chunk per complaint in score order: (positions, hit counts,
+    1-based rank of the chunk that completed n_results complaints or None)
+    """
+    best = {}
+    order = []
+    needed_rank = None
+    for j, meta in enumerate(metadatas):
+        complaint = (meta or {}).get('complaint_id', ids[j])
+        if complaint in best:
+            best[complaint][1] += 1
+            continue
+        best[complaint] = [j, 1]
+        order.append(complaint)
+        if len(order) == n_results:
+            needed_rank = j + 1
+    order = order[:n_results]
+    return [best[c][0] for c in order], [best[c][1] for c in order], needed_rank
+
+
+def _with_neighbors(store, meta, document, neighbors):
+    """Best chunk's text joined with up to neighbors chunks on either side"""
+    index = meta.get('chunk_index')
+    if index is None or 'complaint_id' not in meta:
+        return document, index, index
+    nearby = [(m.get('chunk_index', 0), doc) for doc, m in store.complaint_chunks(meta['complaint_id'])
+              if abs(m.get('chunk_index', 0) - index) <= neighbors]
+    if not nearby:
+        return document, index, index
+    nearby.sort(key=lambda item: item[0])
+    return join_chunks([doc for _, doc in nearby]), nearby[0][0], nearby[-1][0]
+
+
+def query_complaints(store, query_embeddings, n_results=5, neighbors=0,
+                     include=('documents', 'metadatas', 'distances'), filters=None, stats=None):
+    """
+    Chroma-style results with one entry per distinct complaint_id.
+
+    Each entry is the complaint's best-scoring chunk; its metadata gains
+    matched_chunks (how many of the fetched chunks came from that
+    complaint). With neighbors > 0 the document is the best chunk joined
+    with the chunks up to neighbors positions before and after it, and the
+    metadata records the range as context_start / context_end.
+
+    The first fetch is n_results * stats.initial_factor(); queries that
+    still have fewer than n_results complaints are re-queried with double
+    the fetch until they do or the store is exhausted.
+    """
+    stats = stats if stats is not None else OverfetchStats()
+    queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+    total = store.count()
+    fetch_include = list(dict.fromkeys(list(include) + ['metadatas', 'distances']
+                                       + (['documents'] if neighbors else [])))
+
+    collapsed = {key: [[] for _ in queries] for key in ['ids'] + list(include)}
+    if total == 0 or n_results <= 0:
+        return collapsed
+
+    outputs = [None] * len(queries)
+    pending = list(range(len(queries)))
+    fetch = min(total, int(np.ceil(n_results * stats.initial_factor())))
+    rounds = 0
+    while pending:
+        rounds += 1
+        results = store.query(queries[pending], n_results=fetch, include=fetch_include, filters=filters)
+        still_pending = []
+        for j, q in enumerate(pending):
+            ids = results['ids'][j]
+            positions, counts, needed_rank = _collapse_one(ids, results['metadatas'][j], n_results)
+            exhausted = len(ids) < fetch or fetch >= total
+            if needed_rank is None and not exhausted:
+                still_pending.append(q)
+                continue
+            stats.record(n_results, fetch, needed_rank, rounds)
+            outputs[q] = (results, j, positions, counts)
+        pending = still_pending
+        fetch = min(total, fetch * 2)
+
+    for q, (results, j, positions, counts) in enumerate(outputs):
+        entries = {key: [] for key in collapsed}
+        for position, count in zip(positions, counts):
+            meta = dict(results['metadatas'][j][position] or {}, matched_chunks=count)
+            document = results['documents'][j][position] if results.get('documents') else None
+            if neighbors:
+                document, meta['context_start'], meta['context_end'] = \
+                    _with_neighbors(store, meta, document, neighbors)
+            entries['ids'].append(results['ids'][j][position])
+            if 'documents' in entries:
+                entries['documents'].append(document)
+            if 'metadatas' in entries:
+                entries['metadatas'].append(meta)
+            if 'distances' in entries:
+                entries['distances'].append(results['distances'][j][position])
+        for key in collapsed:
+            collapsed[key][q] = entries[key]
+    return collapsed
+
+
+if __name__ == "__main__":
+    import shutil
+    import sys
+    import tempfile
+    import time
+    import zlib
+    import pandas as pd
+    from chunking import clean_narrative, find_narrative_column, split_text
+    from vector_backends import NumpyVectorStore
+
+    # Bag-of-words hashing embeddings: no model download, but chunks of one
+    # complaint share vocabulary the way they share meaning for MiniLM
+    def embed(texts, dim=384):
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.encode('utf-8')) % dim] += 1.0
+        return vectors
+
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    narrative_col = find_narrative_column(df.columns)
+    ids, chunks, metadatas = [], [], []
+    for complaint_id, narrative in zip(df['Complaint ID'], df[narrative_col].fillna('').astype(str)):
+        for i, chunk in enumerate(split_text(clean_narrative(narrative)[0])):
+            ids.append(f"{complaint_id}_{i}")
+            chunks.append(chunk)
+            metadatas.append({'complaint_id': str(complaint_id), 'chunk_index': i})
+    # Queries: the opening of random narratives, so each has a known best complaint
+    queries = [text[:200] for text in df[narrative_col].dropna().sample(100, random_state=0).astype(str)]
+    query_embeddings = embed(queries)
+    ks = [int(k) for k in sys.argv[1:]] or [3, 5, 10]
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        NumpyVectorStore.build(work_dir, ids, embed(chunks), chunks, metadatas)
+        store = NumpyVectorStore(work_dir)
+        print(f"Complaint collapsing: {len(chunks)} chunks from {len(set(m['complaint_id'] for m in metadatas))} "
+              f"complaints, {len(queries)} queries")
+        for k in ks:
+            plain = store.query(query_embeddings, n_results=k, include=['metadatas'])
+            distinct = np.mean([len({m['complaint_id'] for m in q}) for q in plain['metadatas']])
+            stats = OverfetchStats()
+            start = time.perf_counter()
+            for q in query_embeddings:
+                query_complaints(store, q, k, include=['metadatas'], stats=stats)
+            elapsed = (time.perf_counter() - start) / len(queries) * 1000
+            report = stats.report()
+            print(f"  k={k:<3} plain top-k: {distinct:.2f} distinct complaints | collapsed: "
+                  f"avg over-fetch {report['avg_overfetch_factor']:.2f}x (needed {report['avg_needed_factor']:.2f}x), "
+                  f"{report['avg_rounds']:.2f} rounds, {elapsed:.2f} ms/query")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -8,9 +8,16 @@ import numpy as np
 import os
 import json
 import re
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+import sys
+import time
+from chunking import (chunk_id, clean_narrative, find_narrative_column, original_span, split_spans,
+                      split_text, split_token_spans)
+from embedding_cache import EmbeddingCache
+from ingest_pipeline import IngestionPipeline
+from near_dedup import DEDUP_MODES, NearDuplicateIndex
+from parallel_embedding import ParallelEmbedder
+from store_manifest import record_store, store_entry
+from vector_backends import FAISS_INDEX_TYPES, ChromaVectorStore, build_faiss_store_from_chroma
 
 print("=" * 70)
 print("FIXED TASK 2: Creating Vector Store")
@@ -18,50 +25,413 @@ print("=" * 70)
 
 def simple_text_splitter(text, chunk_size=500, chunk_overlap=50):
     """Simple but effective text splitter"""
-    if not text or not isinstance(text, str):
-        return []
+    return split_text(text, chunk_size, chunk_overlap)
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process in MB (nan if unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def chunk_rows(df, narrative_col, chunk_size=500, chunk_overlap=50, tokenizer=None, max_tokens=256,
+               collapse_redactions=True):
+    """
+    Chunk every narrative in df, returning (ids, chunks, metadata) lists.
+    With a tokenizer, chunks are cut at max_tokens model tokens instead of
+    chunk_size characters (see chunking.split_token_spans).
     
-    text = text.strip()
-    if len(text) <= chunk_size:
-        return [text]
+    With collapse_redactions=True narratives go through
+    chunking.clean_narrative first; char_start/char_end in the metadata
+    always point into the original narrative.
+    """
+    ids_out = []
+    chunks_out = []
+    metadata_out = []
     
-    chunks = []
-    start = 0
-    text_length = len(text)
+    for idx, row in zip(df.index, df.to_dict('records')):
+        narrative = row.get(narrative_col)
+        narrative = str(narrative) if pd.notna(narrative) else ""
+        text, origin = clean_narrative(narrative) if collapse_redactions else (narrative, None)
+        
+        if not text or len(text.strip()) < 20:
+            continue
+        
+        if tokenizer is not None:
+            spans = split_token_spans(text, tokenizer, max_tokens)
+        else:
+            spans = split_spans(text, chunk_size, chunk_overlap)
+        chunks = [text[start:end] for start, end in spans]
+        complaint_id = row.get('Complaint ID', f'ID_{idx}')
+        seen_ids = set()
+        
+        for i, (chunk, span) in enumerate(zip(chunks, spans)):
+            char_start, char_end = original_span(narrative, origin, *span) if origin else span
+            cid = chunk_id(complaint_id, chunk)
+            # Identical chunks inside one complaint get an occurrence suffix
+            if cid in seen_ids:
+                cid = f"{cid}_{i}"
+            seen_ids.add(cid)
+            
+            ids_out.append(cid)
+            chunks_out.append(chunk)
+            metadata_out.append({
+                'complaint_id': complaint_id,
+                'product_category': row.get('Product', 'Unknown'),
+                'product': row.get('Product', 'Unknown'),
+                'issue': row.get('Issue', 'Unknown'),
+                'company': row.get('Company', 'Unknown'),
+                'state': row.get('State', 'Unknown'),
+                'chunk_index': i,
+                'total_chunks': len(chunks),
+                'date_received': row.get('Date received', 'Unknown'),
+                'original_row': idx,
+                'char_start': char_start,
+                'char_end': char_end
+            })
     
-    while start < text_length:
-        end = start + chunk_size
-        
-        if end >= text_length:
-            chunk = text[start:].strip()
-            if chunk:
-                chunks.append(chunk)
+    return ids_out, chunks_out, metadata_out
+
+
+def load_embedding_model():
+    """Load the MiniLM model, falling back to the smaller paraphrase model
+    
+    Returns (model, model_name).
+    """
+    from sentence_transformers import SentenceTransformer
+    
+    try:
+        model_name = 'all-MiniLM-L6-v2'
+        model = SentenceTransformer(model_name)
+    except:
+        print("⚠️  Could not load all-MiniLM-L6-v2, trying paraphrase model...")
+        model_name = 'paraphrase-MiniLM-L3-v2'
+        model = SentenceTransformer(model_name)
+    print(f"✓ Loaded embedding model: {model_name}")
+    return model, model_name
+
+
+def open_collection(store_path, collection_name="complaint_chunks", reset=True):
+    """Open (and optionally recreate) the complaint collection"""
+    import chromadb
+    from chromadb.config import Settings
+    
+    os.makedirs(store_path, exist_ok=True)
+    
+    chroma_client = chromadb.PersistentClient(
+        path=store_path,
+        settings=Settings(anonymized_telemetry=False)
+    )
+    
+    if reset:
+        try:
+            chroma_client.delete_collection(collection_name)
+            print(f"  Cleared existing collection")
+        except:
+            pass
+    
+    collection = chroma_client.get_or_create_collection(
+        name=collection_name,
+        metadata={"hnsw:space": "cosine"}
+    )
+    return collection
+
+
+def store_version(collection, store_path):
+    """Version string of a Chroma collection as the query caches see it"""
+    return ChromaVectorStore(collection, store_path).version()
+
+
+def fetch_existing_ids(collection, page_size=10000):
+    """Return the set of all ids already stored in the collection"""
+    existing = set()
+    offset = 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)
+        if not page['ids']:
             break
+        existing.update(page['ids'])
+        offset += len(page['ids'])
+    return existing
+
+
+def chroma_embeddings(embeddings):
+    """
+    Pass the embedding matrix to Chroma without copying where possible.
+    
+    chromadb >= 0.5 accepts numpy arrays directly; 0.4.x (pinned in
+    requirements.txt) validates for nested lists, so convert only there.
+    """
+    import chromadb
+    
+    try:
+        major, minor = (int(p) for p in chromadb.__version__.split('.')[:2])
+    except (AttributeError, ValueError):
+        return embeddings.tolist()
+    if (major, minor) >= (0, 5):
+        return embeddings
+    return embeddings.tolist()
+
+
+def link_duplicates(collection, dedup_index, reset_stale=False, page_size=500):
+    """
+    Write duplicate_count for every canonical chunk that absorbed near
+    duplicates. Canonicals may have been stored in an earlier batch (or an
+    earlier run), so this runs once after ingestion. With reset_stale=True,
+    stored chunks whose duplicates disappeared are set back to 0.
+    """
+    counts = dedup_index.duplicate_counts()
+    if reset_stale:
+        try:
+            stale = collection.get(where={'duplicate_count': {'$gt': 0}}, include=[])['ids']
+            for cid in stale:
+                counts.setdefault(cid, 0)
+        except Exception as e:
+            print(f"⚠️  Could not look up stale duplicate counts: {e}")
+    
+    ids = list(counts)
+    for i in range(0, len(ids), page_size):
+        page = collection.get(ids=ids[i:i + page_size], include=['metadatas'])
+        metadatas = []
+        for cid, meta in zip(page['ids'], page['metadatas']):
+            meta = dict(meta or {})
+            meta['duplicate_count'] = counts[cid]
+            metadatas.append(meta)
+        if metadatas:
+            collection.update(ids=page['ids'], metadatas=metadatas)
+    return len(ids)
+
+
+def stream_ingest(csv_path='../data/filtered_complaints.csv',
+                  store_path='../vector_store/chroma_db_final',
+                  rows_per_batch=1000, encode_batch_size=64,
+                  chunk_size=500, chunk_overlap=50, incremental=False, use_cache=True,
+                  pipelined=False, queue_size=4, embed_workers=0, token_aware=False,
+                  collapse_redactions=True, dedup=None, dedup_threshold=0.85):
+    """
+    Streaming ingestion with bounded memory.
+    
+    Reads the CSV rows_per_batch rows at a time and chunks, embeds and
+    adds each batch to ChromaDB before reading the next one, so peak
+    memory depends on the batch size rather than the corpus size.
+    
+    With incremental=True the existing collection is kept: only chunks
+    whose content-hash id is not stored yet are embedded and upserted,
+    and chunks of complaints that changed or disappeared are deleted.
+    
+    With use_cache=True embeddings are looked up in the on-disk
+    EmbeddingCache first, so unchanged or repeated text is never re-encoded.
+    
+    With pipelined=True the chunk, embed and write stages run in their own
+    threads connected by queues of at most queue_size batches, so encoding
+    overlaps with CSV parsing and SQLite/HNSW writes.
+    
+    With embed_workers > 0 encoding is spread over that many processes,
+    each with its own model copy (see ParallelEmbedder).
+    
+    With token_aware=True chunks are sized by the model's tokenizer so
+    none exceeds its max_seq_length. Chunk ids change, so switching modes
+    re-embeds the whole corpus on the next incremental run. The same
+    applies to collapse_redactions (see chunk_rows).
+    
+    With dedup='drop' or 'link' near-duplicate chunks (estimated Jaccard
+    similarity >= dedup_threshold to an earlier chunk, see NearDuplicateIndex)
+    are neither embedded nor stored; 'link' also records how many were
+    folded into each kept chunk as duplicate_count.
+    """
+    print("\nStreaming ingestion" + (" (incremental)" if incremental else "")
+          + (" (pipelined)" if pipelined else ""))
+    print(f"  Source: {csv_path}")
+    print(f"  Rows per batch: {rows_per_batch:,}")
+    
+    start_time = time.perf_counter()
+    model, model_name = load_embedding_model()
+    tokenizer = model.tokenizer if token_aware else None
+    max_tokens = getattr(model, 'max_seq_length', None) or 256
+    if token_aware:
+        print(f"  Token-aware chunking: at most {max_tokens} tokens per chunk")
+    if embed_workers:
+        model = ParallelEmbedder(model_name, workers=embed_workers)
+        print(f"  Embedding with {model.workers} worker processes "
+              f"({model.torch_threads} torch threads each)")
+    cache = EmbeddingCache(model_name) if use_cache else None
+    collection = open_collection(store_path, reset=not incremental)
+    dedup_index = NearDuplicateIndex(dedup_threshold) if dedup else None
+    if dedup:
+        print(f"  Near-duplicate {dedup}: threshold {dedup_threshold} "
+              f"({dedup_index.bands} bands x {dedup_index.rows} rows)")
+    
+    existing_ids = fetch_existing_ids(collection) if incremental else set()
+    seen_ids = set()
+    if incremental:
+        print(f"  Existing chunks in store: {len(existing_ids):,}")
+    
+    totals = {'rows': 0, 'chunks': 0, 'embedded': 0, 'dim': None}
+    narrative_col = None
+    
+    def chunk_stage(df):
+        nonlocal narrative_col
+        if narrative_col is None:
+            narrative_col = find_narrative_column(df.columns)
+            if not narrative_col:
+                raise ValueError(f"No narrative column found in {list(df.columns)}")
+            print(f"Using column '{narrative_col}' for narratives")
+        
+        totals['rows'] += len(df)
+        ids, chunks, metadata = chunk_rows(df, narrative_col, chunk_size, chunk_overlap,
+                                           tokenizer=tokenizer, max_tokens=max_tokens,
+                                           collapse_redactions=collapse_redactions)
+        totals['chunks'] += len(ids)
+        
+        # Runs before the incremental filter so stored chunks still act as canonicals
+        if dedup_index is not None:
+            ids, chunks, metadata = dedup_index.filter(ids, chunks, metadata, mode=dedup)
+        
+        if incremental:
+            seen_ids.update(ids)
+            new_rows = [j for j, cid in enumerate(ids) if cid not in existing_ids]
+            ids = [ids[j] for j in new_rows]
+            chunks = [chunks[j] for j in new_rows]
+            metadata = [metadata[j] for j in new_rows]
+        
+        if not chunks:
+            return None
+        return {'ids': ids, 'chunks': chunks, 'metadata': metadata}
+    
+    def embed_stage(batch):
+        if cache is not None:
+            batch['embeddings'] = cache.encode(model, batch['chunks'], batch_size=encode_batch_size)
+        else:
+            batch['embeddings'] = model.encode(batch['chunks'], batch_size=encode_batch_size,
+                                               show_progress_bar=False)
+        totals['dim'] = batch['embeddings'].shape[1]
+        return batch
+    
+    def write_stage(batch):
+        collection.upsert(
+            ids=batch['ids'],
+            embeddings=chroma_embeddings(batch['embeddings']),
+            documents=batch['chunks'],
+            metadatas=batch['metadata']
+        )
+        totals['embedded'] += len(batch['ids'])
         
-        # Find a good break point
-        break_chars = ' .!?,;\n'
-        break_point = end
-        
-        # Look ahead for break character
-        for i in range(end, min(text_length, end + 100)):
-            if text[i] in break_chars:
-                break_point = i + 1
-                break
-        
-        # If no break found, force break at end
-        if break_point == end:
-            break_point = min(text_length, end + 50)
-        
-        chunk = text[start:break_point].strip()
-        if chunk:
-            chunks.append(chunk)
-        
-        # Move start with overlap
-        start = max(start + 1, break_point - chunk_overlap)
+        elapsed = time.perf_counter() - start_time
+        print(f"  {totals['rows']:,} rows / {totals['chunks']:,} chunks "
+              f"({totals['rows'] / elapsed:,.0f} rows/sec, peak {peak_memory_mb():,.0f} MB)")
+    
+    source = pd.read_csv(csv_path, chunksize=rows_per_batch)
+    stage_stats = None
+    
+    try:
+        if pipelined:
+            pipeline = IngestionPipeline(
+                [('chunk', chunk_stage), ('embed', embed_stage), ('write', write_stage)],
+                queue_size=queue_size,
+                batch_size=lambda b: len(b['ids']) if isinstance(b, dict) else len(b)
+            )
+            stage_stats = pipeline.run(source)
+        else:
+            for df in source:
+                batch = chunk_stage(df)
+                if batch is not None:
+                    write_stage(embed_stage(batch))
+    except ValueError as e:
+        print(f"✗ ERROR: {e}")
+        return None
+    finally:
+        if embed_workers:
+            model.close()
+    
+    deleted_chunks = 0
+    if incremental:
+        stale_ids = list(existing_ids - seen_ids)
+        for i in range(0, len(stale_ids), 5000):
+            collection.delete(ids=stale_ids[i:i + 5000])
+        deleted_chunks = len(stale_ids)
     
-    return chunks
+    if dedup == 'link':
+        link_duplicates(collection, dedup_index, reset_stale=incremental)
+    
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        'rows': totals['rows'],
+        'chunks': totals['chunks'],
+        'embedded_chunks': totals['embedded'],
+        'deleted_chunks': deleted_chunks,
+        'embedding_dimension': totals['dim'],
+        'seconds': round(elapsed, 2),
+        'rows_per_sec': round(totals['rows'] / elapsed, 1) if elapsed > 0 else 0.0,
+        'peak_memory_mb': round(peak_memory_mb(), 1)
+    }
+    if cache is not None:
+        cache.flush()
+        stats['embedding_cache'] = cache.stats()
+    if stage_stats is not None:
+        stats['stages'] = stage_stats
+    if dedup_index is not None:
+        stats['dedup'] = dedup_index.report()
+    
+    record_store('chroma', store_path, collection_name=collection.name, embedding_model=model_name,
+                 embedding_dimension=totals['dim'], count=collection.count(),
+                 version=store_version(collection, store_path))
+    
+    print("\n✓ Streaming ingestion complete")
+    print(f"• Rows processed: {stats['rows']:,}")
+    print(f"• Chunks in source: {stats['chunks']:,}")
+    print(f"• Chunks embedded/upserted: {stats['embedded_chunks']:,}")
+    if incremental:
+        print(f"• Stale chunks deleted: {stats['deleted_chunks']:,}")
+    print(f"• Throughput: {stats['rows_per_sec']:,.1f} rows/sec")
+    print(f"• Peak memory: {stats['peak_memory_mb']:,.1f} MB")
+    if cache is not None:
+        cache_stats = stats['embedding_cache']
+        print(f"• Embedding cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses "
+              f"({cache_stats['hit_rate']:.1%} hit rate)")
+    if dedup_index is not None:
+        report = stats['dedup']
+        print(f"• Duplicates removed: {report['exact_duplicates']:,} exact + "
+              f"{report['near_duplicates']:,} near ({report['removed_fraction']:.1%} of chunks)")
+    if stage_stats is not None:
+        print("• Pipeline stages:")
+        for st in stage_stats:
+            print(f"    {st['stage']:<6} {st['items_per_sec']:>10,.1f} items/sec busy, "
+                  f"blocked {st['blocked_seconds']:.2f}s, "
+                  f"queue avg {st['avg_input_queue_depth']:.1f} / max {st['max_input_queue_depth']}")
+    
+    return stats
+
 
-def main():
+def build_faiss_index(store_path='../vector_store/chroma_db_final', index_type='hnsw',
+                      out_path='../vector_store/faiss_store', **params):
+    """
+    Train and save a FAISS index from the Chroma store written above.
+    
+    Recall@k against exact search and p50/p99 query latency are saved in
+    the FAISS store's store_info.json.
+    """
+    print(f"\nBuilding FAISS '{index_type}' index from {store_path}...")
+    info = build_faiss_store_from_chroma(store_path, out_path, index_type=index_type, **params)
+    chroma_entry = store_entry('chroma') or {}
+    record_store('faiss', out_path, embedding_model=chroma_entry.get('embedding_model'),
+                 embedding_dimension=info['embedding_dimension'], count=info['total_chunks'])
+    
+    evaluation = info['evaluation']
+    recall_key = f"recall_at_{evaluation['k']}"
+    print(f"✓ FAISS index saved to: {out_path} ({info['factory']})")
+    print(f"  Recall@{evaluation['k']}: {evaluation[recall_key]:.3f}")
+    print(f"  Latency p50/p99: {evaluation['p50_ms']:.2f} / {evaluation['p99_ms']:.2f} ms")
+    return info
+
+
+def main(dedup=None, dedup_threshold=0.85):
     print("\nStep 1: Loading and analyzing data...")
     
     try:
@@ -84,15 +454,7 @@ def main():
         print(f"\nUsing ALL {len(sample_df):,} complaints (dataset is small)")
         
         print("\nStep 2: Chunking text narratives...")
-        all_chunks = []
-        all_metadata = []
-        
-        # Find the narrative column name
-        narrative_col = None
-        for col in ['cleaned_narrative', 'Consumer complaint narrative', 'narrative']:
-            if col in sample_df.columns:
-                narrative_col = col
-                break
+        narrative_col = find_narrative_column(sample_df.columns)
         
         if not narrative_col:
             print("✗ ERROR: No narrative column found!")
@@ -101,36 +463,24 @@ def main():
         
         print(f"Using column '{narrative_col}' for narratives")
         
-        for idx, row in sample_df.iterrows():
-            narrative = str(row[narrative_col]) if pd.notna(row[narrative_col]) else ""
-            
-            if not narrative or len(narrative.strip()) < 20:
-                continue
-            
-            chunks = simple_text_splitter(narrative, chunk_size=500, chunk_overlap=50)
-            
-            for i, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                all_metadata.append({
-                    'complaint_id': row.get('Complaint ID', f'ID_{idx}'),
-                    'product_category': row.get('Product', 'Unknown'),
-                    'product': row.get('Product', 'Unknown'),
-                    'issue': row.get('Issue', 'Unknown'),
-                    'company': row.get('Company', 'Unknown'),
-                    'state': row.get('State', 'Unknown'),
-                    'chunk_index': i,
-                    'total_chunks': len(chunks),
-                    'date_received': row.get('Date received', 'Unknown'),
-                    'original_row': idx
-                })
-            
-            # Progress
-            if idx % 50 == 0:
-                print(f"  Processed {idx}/{len(sample_df)} complaints...")
+        all_ids, all_chunks, all_metadata = chunk_rows(sample_df, narrative_col, chunk_size=500, chunk_overlap=50)
         
         print(f"\n✓ Created {len(all_chunks):,} total chunks")
         print(f"  Average chunks per complaint: {len(all_chunks)/len(sample_df):.2f}")
         
+        dedup_report = None
+        if dedup:
+            dedup_index = NearDuplicateIndex(dedup_threshold)
+            all_ids, all_chunks, all_metadata = dedup_index.filter(all_ids, all_chunks, all_metadata, mode=dedup)
+            if dedup == 'link':
+                counts = dedup_index.duplicate_counts()
+                for cid, meta in zip(all_ids, all_metadata):
+                    meta['duplicate_count'] = counts.get(cid, 0)
+            dedup_report = dedup_index.report()
+            print(f"✓ Near-duplicate {dedup} (threshold {dedup_threshold}): removed "
+                  f"{dedup_report['exact_duplicates']} exact + {dedup_report['near_duplicates']} near duplicates, "
+                  f"{len(all_chunks):,} chunks left")
+        
         if len(all_chunks) == 0:
             print("✗ ERROR: No chunks created!")
             return
@@ -138,13 +488,8 @@ def main():
         print("\nStep 3: Creating embeddings...")
         
         # Use a smaller model if sentence-transformers fails
-        try:
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-            print("✓ Loaded embedding model: all-MiniLM-L6-v2")
-        except:
-            print("⚠️  Could not load all-MiniLM-L6-v2, trying paraphrase model...")
-            model = SentenceTransformer('paraphrase-MiniLM-L3-v2')
-            print("✓ Loaded embedding model: paraphrase-MiniLM-L3-v2")
+        model, model_name = load_embedding_model()
+        cache = EmbeddingCache(model_name)
         
         print(f"Creating embeddings for {len(all_chunks)} chunks...")
         
@@ -154,14 +499,17 @@ def main():
         
         for i in range(0, len(all_chunks), batch_size):
             batch = all_chunks[i:i + batch_size]
-            batch_embeddings = model.encode(batch, show_progress_bar=False)
+            batch_embeddings = cache.encode(model, batch, batch_size=batch_size)
             embeddings_list.append(batch_embeddings)
             
             if i % 200 == 0:
                 print(f"  Embedded {min(i + batch_size, len(all_chunks))}/{len(all_chunks)} chunks...")
         
         embeddings = np.vstack(embeddings_list)
+        cache.flush()
+        cache_stats = cache.stats()
         print(f"✓ Embeddings created: {embeddings.shape}")
+        print(f"  Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
         print(f"  Dimension: {embeddings.shape[1]}")
         
         print("\nStep 4: Creating ChromaDB vector store...")
@@ -170,6 +518,9 @@ def main():
         os.makedirs('../vector_store/chroma_db_final', exist_ok=True)
         
         # Initialize ChromaDB
+        import chromadb
+        from chromadb.config import Settings
+        
         chroma_client = chromadb.PersistentClient(
             path='../vector_store/chroma_db_final',
             settings=Settings(anonymized_telemetry=False)
@@ -202,7 +553,7 @@ def main():
         for i in range(0, total_chunks, batch_size):
             end_idx = min(i + batch_size, total_chunks)
             
-            batch_ids = [f"chunk_{j}" for j in range(i, end_idx)]
+            batch_ids = all_ids[i:end_idx]
             batch_documents = all_chunks[i:end_idx]
             batch_embeddings = embeddings[i:end_idx].tolist()
             batch_metadata = all_metadata[i:end_idx]
@@ -239,18 +590,22 @@ def main():
         sample_info = {
             'total_complaints': len(sample_df),
             'total_chunks_created': len(all_chunks),
-            'embedding_model': model._model_name if hasattr(model, '_model_name') else 'MiniLM',
+            'embedding_model': model_name,
             'embedding_dimension': embeddings.shape[1],
             'chunk_size': 500,
             'chunk_overlap': 50,
+            'collapse_redactions': True,
+            'dedup': dedup_report,
             'vector_database': 'ChromaDB',
             'collection_name': collection_name,
             'storage_path': 'vector_store/chroma_db_final',
             'note': 'Used entire dataset (191 complaints)'
         }
         
-        with open('../vector_store/task2_info.json', 'w') as f:
-            json.dump(sample_info, f, indent=2)
+        record_store('chroma', '../vector_store/chroma_db_final', collection_name=collection_name,
+                     embedding_model=model_name, embedding_dimension=int(embeddings.shape[1]),
+                     count=collection.count(), version=store_version(collection, '../vector_store/chroma_db_final'),
+                     info=sample_info)
         
         print(f"✓ Configuration saved to: vector_store/task2_info.json")
         
@@ -262,6 +617,7 @@ def main():
         print(f"• Chunks created: {len(all_chunks):,}")
         print(f"• Average chunks/complaint: {len(all_chunks)/len(sample_df):.2f}")
         print(f"• Embedding dimension: {embeddings.shape[1]}")
+        print(f"• Embedding cache hit rate: {cache_stats['hit_rate']:.1%}")
         print(f"• Vector store: vector_store/chroma_db_final")
         print("\nReady for Task 3: RAG Pipeline!")
         print("=" * 70)
@@ -309,4 +665,33 @@ def create_simple_fallback():
         print(f"✗ Fallback also failed: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    pipelined = '--pipeline' in sys.argv
+    token_aware = '--token-aware' in sys.argv
+    collapse_redactions = '--keep-redactions' not in sys.argv
+    dedup = None
+    dedup_threshold = 0.85
+    if '--dedup' in sys.argv:
+        position = sys.argv.index('--dedup') + 1
+        dedup = sys.argv[position] if position < len(sys.argv) and sys.argv[position] in DEDUP_MODES else 'link'
+    if '--dedup-threshold' in sys.argv:
+        dedup_threshold = float(sys.argv[sys.argv.index('--dedup-threshold') + 1])
+    embed_workers = 0
+    if '--workers' in sys.argv:
+        embed_workers = int(sys.argv[sys.argv.index('--workers') + 1])
+    
+    if '--incremental' in sys.argv:
+        stream_ingest(incremental=True, pipelined=pipelined, embed_workers=embed_workers,
+                      token_aware=token_aware, collapse_redactions=collapse_redactions,
+                      dedup=dedup, dedup_threshold=dedup_threshold)
+    elif '--stream' in sys.argv or pipelined or embed_workers or token_aware or not collapse_redactions:
+        stream_ingest(pipelined=pipelined, embed_workers=embed_workers, token_aware=token_aware,
+                      collapse_redactions=collapse_redactions, dedup=dedup, dedup_threshold=dedup_threshold)
+    else:
+        main(dedup=dedup, dedup_threshold=dedup_threshold)
+    
+    if '--faiss' in sys.argv:
+        index_type = sys.argv[sys.argv.index('--faiss') + 1]
+        if index_type not in FAISS_INDEX_TYPES:
+            print(f"✗ Unknown FAISS index type '{index_type}', expected one of {FAISS_INDEX_TYPES}")
+        else:
+            build_faiss_index(index_type=index_type)
\ No newline at end of file
@@ -8,34 +8,16 @@ import numpy as np
 import os
 import json
 import re
+from chunking import chunk_id, clean_narrative, split_text
+from columnar_store import write_columnar_store
 
 print("=" * 70)
 print("SIMPLIFIED TASK 2: Creating Vector Store")
 print("=" * 70)
 
 def simple_text_splitter(text, chunk_size=500, chunk_overlap=50):
-    """Simple text splitter without langchain"""
-    chunks = []
-    
-    # Split by sentences first (simple approach)
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
-    current_chunk = ""
-    for sentence in sentences:
-        # If adding this sentence would exceed chunk size
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            # Keep overlap
-            overlap_start = max(0, len(current_chunk) - chunk_overlap)
-            current_chunk = current_chunk[overlap_start:] + " " + sentence
-        else:
-            current_chunk += " " + sentence if current_chunk else sentence
-    
-    # Add the last chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-    
-    return chunks
+    """Simple text splitter without langchain (shared with create_proper_vector_store)"""
+    return split_text(text, chunk_size, chunk_overlap)
 
 def main():
     print("\nStep 1: Loading data...")
@@ -61,6 +43,8 @@ def main():
                     narrative = row[col]
                     break
             
+            # Collapse XXXX redaction runs and whitespace before chunking
+            narrative, _ = clean_narrative(narrative)
             if not narrative or len(narrative.strip()) < 50:
                 continue
             
@@ -78,16 +62,31 @@ def main():
         
         print(f"✓ Created {len(all_chunks)} chunks")
         
-        print("\nStep 3: Creating simple vector store (CSV-based)...")
-        
-        # Create a simple vector store using pandas
-        vector_data = pd.DataFrame({
-            'chunk_text': all_chunks,
-            'metadata': [json.dumps(m) for m in all_metadata]
-        })
+        print("\nStep 3: Creating simple vector store (columnar)...")
         
-        # Save to CSV
-        vector_data.to_csv('../vector_store/simple_vector_store.csv', index=False)
+        try:
+            # Same ids as columnar_store.convert_simple_csv gives the CSV fallback
+            ids = []
+            seen = set()
+            for i, (chunk, meta) in enumerate(zip(all_chunks, all_metadata)):
+                cid = chunk_id(meta['complaint_id'], chunk)
+                if cid in seen:
+                    cid = f"{cid}_{i}"
+                seen.add(cid)
+                ids.append(cid)
+            write_columnar_store('../vector_store/simple_columnar_store', ids, all_chunks, all_metadata)
+            store_path = 'vector_store/simple_columnar_store'
+            store_kind = 'columnar_arrow_store'
+        except ImportError as e:
+            # No pyarrow: fall back to the CSV with JSON metadata
+            print(f"⚠️  {e}, writing CSV instead")
+            vector_data = pd.DataFrame({
+                'chunk_text': all_chunks,
+                'metadata': [json.dumps(m) for m in all_metadata]
+            })
+            vector_data.to_csv('../vector_store/simple_vector_store.csv', index=False)
+            store_path = 'vector_store/simple_vector_store.csv'
+            store_kind = 'simple_csv_store'
         
         # Save info
         sample_info = {
@@ -95,7 +94,8 @@ def main():
             'total_chunks_created': len(all_chunks),
             'chunk_size': 500,
             'chunk_overlap': 50,
-            'vector_store': 'simple_csv_store'
+            'collapse_redactions': True,
+            'vector_store': store_kind
         }
         
         with open('../vector_store/sample_info.json', 'w') as f:
@@ -105,7 +105,7 @@ def main():
         print("✓ SIMPLIFIED TASK 2 COMPLETED!")
         print("=" * 70)
         print(f"Created: {len(all_chunks)} chunks")
-        print(f"Saved to: vector_store/simple_vector_store.csv")
+        print(f"Saved to: {store_path}")
         
     except Exception as e:
         print(f"✗ Error: {e}")
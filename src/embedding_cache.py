@@ -0,0 +1,296 @@
+"""
+Persistent embedding cache
+Memory-mapped vector matrix + hash index so identical text is only embedded once
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process per cache directory assumed
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'embedding_cache')
+FLUSH_INTERVAL = float(os.environ.get('RAG_CACHE_FLUSH_SECONDS', 30))
+
+# One open cache per directory in this process, shared by every caller asking for it
+_OPEN_CACHES = weakref.WeakValueDictionary()
+_OPEN_LOCK = threading.Lock()
+
+
+def text_hash(text):
+    """20-byte sha1 digest used as the cache key for a piece of text"""
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+
+def cache_path(model_name, normalize=False, name='chunks', cache_dir=DEFAULT_CACHE_DIR, dtype='float32'):
+    """Directory of the cache for this (model, normalization, dtype) combination"""
+    dtype = np.dtype(dtype)
+    namespace = hashlib.sha1(f"{model_name}|normalize={normalize}|{dtype.name}".encode('utf-8')).hexdigest()[:12]
+    return os.path.abspath(os.path.join(cache_dir, f"{name}_{namespace}"))
+
+
+@atexit.register
+def _close_open_caches():
+    for cache in list(_OPEN_CACHES.values()):
+        cache.close()
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings keyed by text hash.
+
+    Each (model, normalization, dtype) combination gets its own directory
+    holding three memory-mapped arrays:
+      vectors.npy    - (capacity, dim) embedding matrix
+      keys.npy       - (capacity, 20) sha1 digest stored in each row
+      last_used.npy  - (capacity,) logical clock used for LRU eviction
+    Rows are reused in least-recently-used order once the cache is full.
+
+    Within a process, constructing a cache for a directory that is
+    already open returns that same instance (e.g. UniversalRAG and
+    several OfflineRAGs all using 'queries'), so they share its arrays
+    and lock. Across processes one owns a directory (advisory lock on
+    <directory>.lock); another process opening it meanwhile gets an
+    in-memory cache instead of corrupting the shared files. Writes are
+    flushed at most every flush_interval seconds and on close(), which
+    also runs at exit and releases the lock.
+    """
+
+    def __new__(cls, model_name, normalize=False, name='chunks', cache_dir=DEFAULT_CACHE_DIR, capacity=500_000,
+                dtype='float32', flush_interval=FLUSH_INTERVAL):
+        path = cache_path(model_name, normalize, name, cache_dir, dtype)
+        with _OPEN_LOCK:
+            cache = _OPEN_CACHES.get(path)
+            if cache is None:
+                cache = super().__new__(cls)
+                cache._opened = False
+                _OPEN_CACHES[path] = cache
+            return cache
+
+    def __init__(self, model_name, normalize=False, name='chunks',
+                 cache_dir=DEFAULT_CACHE_DIR, capacity=500_000, dtype='float32', flush_interval=FLUSH_INTERVAL):
+        if self._opened:
+            return
+        self._opened = True
+        self.model_name = model_name
+        self.normalize = normalize
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.path = cache_path(model_name, normalize, name, cache_dir, dtype)
+
+        self.vectors = None
+        self.keys = None
+        self.last_used = None
+        self.index = {}
+        self.clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self._dirty = False
+        self._last_flush = time.monotonic()
+
+        self._lock_file = None
+        self.persistent = self._acquire_directory()
+        if self.persistent:
+            self._load()
+
+    def _acquire_directory(self):
+        """Take the cross-process lock on this cache directory; False if another process holds it"""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            print(f"⚠️  Embedding cache {self.path} is in use by another process; caching in memory only")
+            return False
+        self._lock_file = lock_file
+        # Unlocks if the cache is garbage-collected without close()
+        weakref.finalize(self, lock_file.close)
+        return True
+
+    def _load(self):
+        """Open an existing cache directory if there is one"""
+        info_path = os.path.join(self.path, 'cache_info.json')
+        if not os.path.exists(info_path):
+            return
+
+        try:
+            self.vectors = np.load(os.path.join(self.path, 'vectors.npy'), mmap_mode='r+')
+            self.keys = np.load(os.path.join(self.path, 'keys.npy'), mmap_mode='r+')
+            self.last_used = np.load(os.path.join(self.path, 'last_used.npy'), mmap_mode='r+')
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable embedding cache at {self.path}: {e}")
+            self.vectors = self.keys = self.last_used = None
+            return
+
+        self.capacity = len(self.keys)
+        used = np.flatnonzero(self.last_used > 0)
+        self.index = {self.keys[row].tobytes(): int(row) for row in used}
+        self.clock = int(self.last_used.max()) if len(self.last_used) else 0
+
+    def _create(self, dim):
+        """Allocate the memory-mapped arrays on first write (plain arrays when not persistent)"""
+        if not self.persistent:
+            self.vectors = np.zeros((self.capacity, dim), dtype=self.dtype)
+            self.keys = np.zeros((self.capacity, 20), dtype=np.uint8)
+            self.last_used = np.zeros(self.capacity, dtype=np.int64)
+            return
+        os.makedirs(self.path, exist_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        self.vectors = open_memmap(os.path.join(self.path, 'vectors.npy'), mode='w+',
+                                   dtype=self.dtype, shape=(self.capacity, dim))
+        self.keys = open_memmap(os.path.join(self.path, 'keys.npy'), mode='w+',
+                                dtype=np.uint8, shape=(self.capacity, 20))
+        self.last_used = open_memmap(os.path.join(self.path, 'last_used.npy'), mode='w+',
+                                     dtype=np.int64, shape=(self.capacity,))
+
+        with open(os.path.join(self.path, 'cache_info.json'), 'w') as f:
+            json.dump({
+                'model_name': self.model_name,
+                'normalize': self.normalize,
+                'dtype': self.dtype.name,
+                'capacity': self.capacity,
+                'dimension': dim
+            }, f, indent=2)
+
+    def _allocate_rows(self, n):
+        """Return n free row numbers, evicting least-recently-used rows if needed"""
+        free = np.flatnonzero(self.last_used == 0)[:n]
+        if len(free) >= n:
+            return free
+
+        needed = n - len(free)
+        used = np.flatnonzero(self.last_used > 0)
+        order = np.argpartition(self.last_used[used], needed - 1)[:needed]
+        victims = used[order]
+        for row in victims:
+            self.index.pop(self.keys[row].tobytes(), None)
+        self.last_used[victims] = 0
+        self.evictions += needed
+        return np.concatenate([free, victims])
+
+    def encode(self, model, texts, batch_size=32):
+        """
+        Embed texts with model, serving cached rows where possible.
+
+        Returns a float32 array in the same order as texts. Misses are
+        de-duplicated before being sent to the model and written back to
+        the cache.
+        """
+        if len(texts) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        hashes = [text_hash(t) for t in texts]
+
+        with self._lock:
+            cached_rows = [self.index.get(h) for h in hashes]
+            hit_positions = [i for i, row in enumerate(cached_rows) if row is not None]
+            hit_vectors = None
+            if hit_positions:
+                rows = [cached_rows[i] for i in hit_positions]
+                hit_vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+                self.clock += 1
+                self.last_used[rows] = self.clock
+                self._dirty = True
+            self.hits += len(hit_positions)
+            self.misses += len(texts) - len(hit_positions)
+
+        # Unique missing hashes -> first position they appear at
+        missing = {}
+        for i, row in enumerate(cached_rows):
+            if row is None:
+                missing.setdefault(hashes[i], i)
+
+        new_vectors = None
+        if missing:
+            miss_texts = [texts[i] for i in missing.values()]
+            new_vectors = model.encode(miss_texts, batch_size=batch_size, show_progress_bar=False,
+                                       normalize_embeddings=self.normalize)
+            new_vectors = np.asarray(new_vectors, dtype=np.float32)
+
+            with self._lock:
+                if self.vectors is None:
+                    self._create(new_vectors.shape[1])
+                # Another thread may have stored some of these while we were encoding
+                store = [(h, j) for j, h in enumerate(missing) if h not in self.index]
+                if store and len(store) <= self.capacity:
+                    rows = self._allocate_rows(len(store))
+                    self.vectors[rows] = new_vectors[[j for _, j in store]]
+                    self.keys[rows] = np.frombuffer(b''.join(h for h, _ in store), dtype=np.uint8).reshape(-1, 20)
+                    self.clock += 1
+                    self.last_used[rows] = self.clock
+                    for (h, _), row in zip(store, rows):
+                        self.index[h] = int(row)
+                    self._dirty = True
+
+        dim = hit_vectors.shape[1] if hit_vectors is not None else new_vectors.shape[1]
+        result = np.empty((len(texts), dim), dtype=np.float32)
+        if hit_vectors is not None:
+            result[hit_positions] = hit_vectors
+        if new_vectors is not None:
+            miss_position = {h: j for j, h in enumerate(missing)}
+            for i, row in enumerate(cached_rows):
+                if row is None:
+                    result[i] = new_vectors[miss_position[hashes[i]]]
+
+        self._maybe_flush()
+        return result
+
+    def _maybe_flush(self):
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write memory-mapped pages back to disk"""
+        with self._lock:
+            if self.persistent:
+                for arr in (self.vectors, self.keys, self.last_used):
+                    if arr is not None:
+                        arr.flush()
+            self._dirty = False
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Flush, release the directory lock and stop sharing this instance;
+        later encode() calls still work, caching in memory only
+        """
+        self.flush()
+        with _OPEN_LOCK:
+            if _OPEN_CACHES.get(self.path) is self:
+                del _OPEN_CACHES[self.path]
+        with self._lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            if self.persistent:
+                self.persistent = False
+                self.vectors = self.keys = self.last_used = None
+                self.index = {}
+
+    def stats(self):
+        """Hit/miss counters for run summaries"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self.index),
+            'capacity': self.capacity
+        }
@@ -0,0 +1,137 @@
+"""
+Pipelined ingestion engine
+Runs chunking, embedding and vector store writes as overlapping stages
+connected by bounded queues
+"""
+
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class StageStats:
+    """Throughput and queue-depth counters for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    def sample_depth(self, depth):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+        self._depth_samples += 1
+
+    def summary(self):
+        return {
+            'stage': self.name,
+            'batches': self.batches,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'blocked_seconds': round(self.blocked_seconds, 3),
+            'items_per_sec': round(self.items / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            'avg_input_queue_depth': round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+            'max_input_queue_depth': self.max_queue_depth
+        }
+
+
+class IngestionPipeline:
+    """
+    Producer/consumer pipeline with one thread per stage.
+
+    stages is a list of (name, fn) pairs. Each fn takes a batch and returns
+    the batch for the next stage (or None to drop it). Queues between stages
+    hold at most queue_size batches, so a slow stage blocks the stages
+    before it instead of letting memory grow.
+    """
+
+    def __init__(self, stages, queue_size=4, batch_size=len):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.stats = [StageStats(name) for name, _ in stages]
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, q, item, stats=None):
+        """Blocking put that gives up once the pipeline is stopping"""
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if stats is not None:
+            stats.blocked_seconds += time.perf_counter() - start
+
+    def _get(self, q):
+        """Blocking get that returns _DONE once the pipeline is stopping"""
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _DONE
+
+    def _run_source(self, source, out_q):
+        try:
+            for batch in source:
+                if self._stop.is_set():
+                    break
+                self._put(out_q, batch)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            self._put(out_q, _DONE)
+
+    def _run_stage(self, fn, stats, in_q, out_q):
+        try:
+            while True:
+                stats.sample_depth(in_q.qsize())
+                batch = self._get(in_q)
+                if batch is _DONE or self._stop.is_set():
+                    break
+
+                start = time.perf_counter()
+                result = fn(batch)
+                stats.busy_seconds += time.perf_counter() - start
+                stats.batches += 1
+                stats.items += self.batch_size(batch)
+
+                if result is not None and out_q is not None:
+                    self._put(out_q, result, stats)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            if out_q is not None:
+                self._put(out_q, _DONE)
+
+    def run(self, source):
+        """Feed batches from source through all stages; returns stage stats"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(source, queues[0]), daemon=True)]
+
+        for i, ((name, fn), stats) in enumerate(zip(self.stages, self.stats)):
+            out_q = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(target=self._run_stage, args=(fn, stats, queues[i], out_q),
+                                            name=f"ingest-{name}", daemon=True))
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        return [s.summary() for s in self.stats]
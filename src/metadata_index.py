@@ -0,0 +1,226 @@
+"""
+Metadata indexes for filtered retrieval
+Packed bitmaps over the categorical chunk fields and a sorted index over
+date_received, combined into a candidate row mask before the vector scan
+"""
+
+import numpy as np
+
+CATEGORICAL_FIELDS = ('product', 'product_category', 'state', 'company', 'issue')
+DATE_FIELD = 'date_received'
+DATE_FILTERS = ('date_from', 'date_to')
+
+
+def _key(value):
+    return str(value).strip().lower()
+
+
+def normalize_filters(filters):
+    """
+    Drop empty entries and turn single values into lists, e.g.
+    {'state': 'TX', 'company': None} -> {'state': ['TX']}
+    """
+    normalized = {}
+    for field, value in (filters or {}).items():
+        if value is None or value == '' or value == []:
+            continue
+        if field in DATE_FILTERS:
+            normalized[field] = str(value)
+        else:
+            normalized[field] = list(value) if isinstance(value, (list, tuple, set)) else [value]
+    return normalized
+
+
+def filters_key(filters):
+    """Hashable form of a filter dict (for cache keys)"""
+    filters = normalize_filters(filters)
+    return tuple(sorted((field, tuple(sorted(map(_key, value))) if isinstance(value, list) else value)
+                        for field, value in filters.items()))
+
+
+class MetadataIndex:
+    """
+    Bitmap index over categorical metadata plus a sorted date index.
+
+    Each distinct value of a categorical field gets a packed bitmap of the
+    rows that have it, so a filter is a few bitwise ORs (values of one
+    field) and ANDs (across fields) over n/8 bytes. Values match case-
+    insensitively; when no value matches exactly, any value containing the
+    filter text matches ("wells fargo" -> "WELLS FARGO & COMPANY"). Date
+    ranges are two binary searches over the sorted dates.
+
+    filters: {field: value or [values], 'date_from': 'YYYY-MM-DD',
+    'date_to': 'YYYY-MM-DD'} with fields from CATEGORICAL_FIELDS.
+    """
+
+    def __init__(self, columns, n):
+        import pandas as pd
+
+        self.n = n
+        self.bitmaps = {}
+        self.values = {}
+        for field in CATEGORICAL_FIELDS:
+            values = columns.get(field)
+            if values is None:
+                continue
+            keys = np.array([_key(v) if v is not None else '' for v in values], dtype=object)
+            codes, uniques = pd.factorize(keys)
+            self.bitmaps[field] = {}
+            self.values[field] = {}
+            for code, key in enumerate(uniques):
+                if key:
+                    self.bitmaps[field][key] = np.packbits(codes == code)
+            for value in values:
+                if value is not None and _key(value):
+                    self.values[field].setdefault(_key(value), value)
+
+        self.sorted_dates = None
+        if columns.get(DATE_FIELD) is not None:
+            dates = pd.to_datetime(pd.Series(columns[DATE_FIELD], dtype=object), errors='coerce')
+            dates = dates.to_numpy(dtype='datetime64[D]')
+            self.date_order = np.argsort(dates, kind='stable')
+            self.sorted_dates = dates[self.date_order]
+
+    @classmethod
+    def from_metadatas(cls, metadatas):
+        metadatas = list(metadatas)
+        fields = CATEGORICAL_FIELDS + (DATE_FIELD,)
+        # Every row is checked: a field first appearing late must still be indexed
+        columns = {field: [meta.get(field) for meta in metadatas] for field in fields
+                   if any(field in meta for meta in metadatas)}
+        return cls(columns, len(metadatas))
+
+    def matching_values(self, field, value):
+        """Stored values of field matched by one filter value"""
+        key = _key(value)
+        if key in self.bitmaps[field]:
+            return [key]
+        return [k for k in self.bitmaps[field] if key in k]
+
+    def _field_bitmap(self, field, values):
+        if field not in self.bitmaps:
+            raise ValueError(f"Cannot filter on '{field}': not indexed "
+                             f"(indexed: {sorted(self.bitmaps) + list(DATE_FILTERS)})")
+        bitmap = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        for value in values:
+            for key in self.matching_values(field, value):
+                bitmap |= self.bitmaps[field][key]
+        return bitmap
+
+    def _date_mask(self, date_from, date_to):
+        if self.sorted_dates is None:
+            raise ValueError(f"Cannot filter on dates: no '{DATE_FIELD}' metadata")
+        start = 0
+        end = np.searchsorted(self.sorted_dates, np.datetime64('NaT'), side='left')
+        if date_from:
+            start = np.searchsorted(self.sorted_dates[:end], np.datetime64(date_from, 'D'), side='left')
+        if date_to:
+            end = np.searchsorted(self.sorted_dates[:end], np.datetime64(date_to, 'D'), side='right')
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self.date_order[start:end]] = True
+        return mask
+
+    def mask(self, filters):
+        """Boolean row mask for filters, or None if filters is empty"""
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+
+        packed = None
+        for field, values in filters.items():
+            if field in DATE_FILTERS:
+                continue
+            bitmap = self._field_bitmap(field, values)
+            packed = bitmap if packed is None else packed & bitmap
+
+        mask = np.unpackbits(packed, count=self.n).astype(bool) if packed is not None else None
+        if 'date_from' in filters or 'date_to' in filters:
+            dates = self._date_mask(filters.get('date_from'), filters.get('date_to'))
+            mask = dates if mask is None else mask & dates
+        return mask
+
+    def where_clause(self, filters):
+        """
+        Chroma `where` for the categorical part of filters, using the stored
+        spelling of each matched value (date ranges are not expressible on
+        string dates and are left to post-filtering)
+        """
+        clauses = []
+        for field, values in normalize_filters(filters).items():
+            if field in DATE_FILTERS:
+                continue
+            if field not in self.bitmaps:
+                raise ValueError(f"Cannot filter on '{field}': not indexed")
+            stored = [self.values[field][key] for value in values for key in self.matching_values(field, value)]
+            if not stored:
+                return None
+            options = [{field: value} for value in dict.fromkeys(stored)]
+            clauses.append(options[0] if len(options) == 1 else {'$or': options})
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+if __name__ == "__main__":
+    import shutil
+    import sys
+    import tempfile
+    import time
+    import pandas as pd
+    from vector_backends import FaissVectorStore, NumpyVectorStore
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    dim, k, n_queries = 384, 5, 50
+    rng = np.random.default_rng(0)
+
+    # Corpus-shaped metadata: states/companies drawn with the real frequencies
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    sample = df.sample(n, replace=True, random_state=0)
+    metadatas = [{'product': p, 'state': s, 'company': c, 'issue': i, 'date_received': d}
+                 for p, s, c, i, d in zip(sample['Product'], sample['State'], sample['Company'],
+                                          sample['Issue'], sample['Date received'])]
+    # Rewrite 'issue' into nested sel_* buckets so filters hit exact selectivities
+    buckets = rng.random(n)
+    selectivities = [0.001, 0.01, 0.05, 0.2, 0.5, 0.9]
+    for meta, b in zip(metadatas, buckets):
+        meta['issue'] = next(f"sel_{s}" for s in selectivities + [1.0] if b < s) if b < 0.9 else meta['issue']
+
+    embeddings = rng.standard_normal((n, dim)).astype(np.float32)
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+    ids = [str(i) for i in range(n)]
+    documents = [''] * n
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        stores = {'numpy': None, 'faiss_hnsw': None}
+        NumpyVectorStore.build(f'{work_dir}/numpy', ids, embeddings, documents, metadatas)
+        stores['numpy'] = NumpyVectorStore(f'{work_dir}/numpy')
+        FaissVectorStore.build(f'{work_dir}/faiss', ids, embeddings, documents, metadatas,
+                               index_type='hnsw', evaluate=False)
+        stores['faiss_hnsw'] = FaissVectorStore(f'{work_dir}/faiss')
+
+        def timed(store, filters):
+            start = time.perf_counter()
+            for q in queries:
+                store.filtered_search(q, k, filters) if filters else store.search(q, k)
+            return (time.perf_counter() - start) / len(queries) * 1000
+
+        print(f"Filtered retrieval: {n:,} chunks x {dim} dims, k={k}, ms per query")
+        for name, store in stores.items():
+            start = time.perf_counter()
+            store.metadata_index()
+            print(f"\n{name}: index built in {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"unfiltered {timed(store, None):.2f} ms (default switch at {store.prefilter_selectivity:.0%})")
+            print(f"  {'selectivity':>11} {'prefilter':>10} {'postfilter':>11} {'auto':>8}  auto strategy")
+            default = store.prefilter_selectivity
+            for s in selectivities:
+                filters = {'issue': [f"sel_{x}" for x in selectivities if x <= s]}
+                store.prefilter_selectivity = 1.0
+                pre = timed(store, filters)
+                store.prefilter_selectivity = 0.0
+                post = timed(store, filters)
+                store.prefilter_selectivity = default
+                auto = timed(store, filters)
+                print(f"  {s:>11.1%} {pre:>10.2f} {post:>11.2f} {auto:>8.2f}  {store.last_filter_plan['strategy']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,180 @@
+"""
+Near-duplicate chunk detection
+MinHash signatures over word shingles plus LSH banding, so each new chunk
+is compared only against the few earlier chunks that share a band
+"""
+
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_SHIFT_32 = np.uint64(32)
+
+DEDUP_MODES = ('drop', 'link')
+
+
+def lsh_bands(threshold, num_perm):
+    """
+    (bands, rows) with bands * rows == num_perm whose S-curve
+    1 - (1 - s**rows)**bands best separates pairs above/below threshold
+    (equal weight on false positives and false negatives)
+    """
+    s = np.linspace(0.0, 1.0, 201)
+    best, best_error = (num_perm, 1), float('inf')
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        probability = 1.0 - (1.0 - s ** rows) ** bands
+        error = np.mean(np.where(s < threshold, probability, 1.0 - probability))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate detector for chunk texts.
+
+    check(chunk_id, text) returns the id of an earlier chunk whose
+    estimated Jaccard similarity (word shingles of shingle_size words) is at
+    least threshold, or None after registering the chunk as canonical.
+    Exact copies are caught by a content hash before any MinHash work.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=128, shingle_size=3, seed=1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+
+        # Multiply-shift hashing: (a * x + b) mod 2**64 >> 32 with odd a
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._shingle_weights = rng.integers(1, 1 << 31, shingle_size, dtype=np.uint64)
+
+        self._exact = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        self._signatures = {}
+        self.duplicates = {}
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.chunks_seen = 0
+
+    def signature(self, text):
+        """MinHash signature of text as (num_perm,) uint32"""
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return np.zeros(self.num_perm, dtype=np.uint32)
+        word_hashes = np.array([zlib.crc32(w.encode('utf-8')) for w in words], dtype=np.uint64)
+
+        k = min(self.shingle_size, len(word_hashes))
+        n = len(word_hashes) - k + 1
+        shingles = np.zeros(n, dtype=np.uint64)
+        for i in range(k):
+            shingles = (shingles + word_hashes[i:i + n] * self._shingle_weights[i]) & _MASK_32
+        shingles = np.unique(shingles)
+
+        hashed = (shingles[:, None] * self._a[None, :] + self._b[None, :]) >> _SHIFT_32
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def check(self, chunk_id, text):
+        """Canonical id if chunk_id duplicates an earlier chunk, else None"""
+        self.chunks_seen += 1
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        canonical = self._exact.get(digest)
+        if canonical is not None:
+            self.exact_duplicates += 1
+            self.duplicates.setdefault(canonical, []).append(chunk_id)
+            return canonical
+
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        candidates = []
+        for bucket, key in zip(self._buckets, keys):
+            for candidate in bucket.get(key, ()):
+                if candidate not in candidates:
+                    candidates.append(candidate)
+
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is not None:
+            self.near_duplicates += 1
+            self.duplicates.setdefault(best, []).append(chunk_id)
+            return best
+
+        self._exact[digest] = chunk_id
+        self._signatures[chunk_id] = signature
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(chunk_id)
+        return None
+
+    def filter(self, ids, chunks, metadata, mode='link'):
+        """
+        Drop duplicate chunks from parallel (ids, chunks, metadata) lists.
+        With mode='link' the kept chunks' metadata gets a duplicate_count
+        field (0 here; canonical counts grow as later duplicates arrive and
+        are applied with duplicate_counts()).
+        """
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode '{mode}', expected one of {DEDUP_MODES}")
+        keep = [j for j, (cid, chunk) in enumerate(zip(ids, chunks)) if self.check(cid, chunk) is None]
+        if mode == 'link':
+            for j in keep:
+                metadata[j]['duplicate_count'] = len(self.duplicates.get(ids[j], ()))
+        return [ids[j] for j in keep], [chunks[j] for j in keep], [metadata[j] for j in keep]
+
+    def duplicate_counts(self):
+        """{canonical_id: number of chunks folded into it}"""
+        return {cid: len(dups) for cid, dups in self.duplicates.items()}
+
+    def report(self):
+        removed = self.exact_duplicates + self.near_duplicates
+        return {
+            'threshold': self.threshold,
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'rows_per_band': self.rows,
+            'shingle_size': self.shingle_size,
+            'chunks_seen': self.chunks_seen,
+            'canonical_chunks': self.chunks_seen - removed,
+            'exact_duplicates': self.exact_duplicates,
+            'near_duplicates': self.near_duplicates,
+            'removed_fraction': round(removed / self.chunks_seen, 4) if self.chunks_seen else 0.0
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import pandas as pd
+    from chunking import clean_narrative, split_text
+
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    chunks = [c for t in df['cleaned_narrative'].dropna() for c in split_text(clean_narrative(str(t))[0])]
+    ids = [str(i) for i in range(len(chunks))]
+
+    thresholds = [float(t) for t in sys.argv[1:]] or [0.95, 0.9, 0.85, 0.8, 0.7, 0.5]
+    print(f"Near-duplicate scan of {len(chunks)} chunks")
+    for threshold in thresholds:
+        index = NearDuplicateIndex(threshold)
+        start = time.perf_counter()
+        kept = sum(1 for cid, chunk in zip(ids, chunks) if index.check(cid, chunk) is None)
+        elapsed = time.perf_counter() - start
+        report = index.report()
+        print(f"  threshold {threshold:.2f} ({report['bands']}x{report['rows_per_band']} bands): "
+              f"kept {kept}, exact {report['exact_duplicates']}, near {report['near_duplicates']} "
+              f"({report['removed_fraction']:.1%} removed) in {elapsed * 1000:.0f} ms")
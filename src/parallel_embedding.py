@@ -0,0 +1,119 @@
+"""
+Multi-process CPU embedding
+A pool of worker processes, each with its own SentenceTransformer copy
+"""
+
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+_worker_model = None
+
+
+def _init_worker(model_name, torch_threads):
+    """Load one model copy per worker and pin its torch thread count"""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(args):
+    batch, normalize = args
+    return _worker_model.encode(batch, batch_size=len(batch), show_progress_bar=False,
+                                normalize_embeddings=normalize)
+
+
+class ParallelEmbedder:
+    """
+    Drop-in replacement for SentenceTransformer.encode that spreads the
+    work over a process pool.
+
+    Texts are sorted by length before batching so each batch holds texts of
+    similar length (less padding), and results are scattered back so the
+    output rows follow the input order.
+    """
+
+    def __init__(self, model_name='all-MiniLM-L6-v2', workers=None, torch_threads=None):
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+
+        ctx = mp.get_context('spawn')
+        self.pool = ctx.Pool(self.workers, initializer=_init_worker,
+                             initargs=(model_name, self.torch_threads))
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, normalize_embeddings=False):
+        if len(texts) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+        jobs = [([texts[j] for j in idx], normalize_embeddings) for idx in batches]
+
+        result = None
+        for idx, vectors in zip(batches, self.pool.imap(_encode_batch, jobs)):
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            result[idx] = vectors
+        return result
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(texts, worker_counts=None, batch_size=32, model_name='all-MiniLM-L6-v2'):
+    """
+    Compare docs/sec of the single-process batch-of-50 loop used by
+    create_proper_vector_store.main against pools of different sizes.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    cpu_count = os.cpu_count() or 1
+    if worker_counts is None:
+        worker_counts = sorted({w for w in (1, 2, 4, cpu_count) if w <= cpu_count})
+
+    results = []
+
+    model = SentenceTransformer(model_name)
+    model.encode(texts[:batch_size], show_progress_bar=False)  # warm up
+    start = time.perf_counter()
+    for i in range(0, len(texts), 50):
+        model.encode(texts[i:i + 50], show_progress_bar=False)
+    elapsed = time.perf_counter() - start
+    results.append({'mode': 'baseline loop', 'workers': 1, 'docs_per_sec': round(len(texts) / elapsed, 1)})
+
+    for workers in worker_counts:
+        with ParallelEmbedder(model_name, workers=workers) as embedder:
+            embedder.encode(texts[:batch_size * workers], batch_size=batch_size)  # load models
+            start = time.perf_counter()
+            embedder.encode(texts, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+        results.append({'mode': 'process pool', 'workers': workers,
+                        'torch_threads': max(1, cpu_count // workers),
+                        'docs_per_sec': round(len(texts) / elapsed, 1)})
+
+    return results
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from create_proper_vector_store import chunk_rows, find_narrative_column
+
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    _, chunks, _ = chunk_rows(df, find_narrative_column(df.columns))
+    print(f"Benchmarking embedding of {len(chunks):,} chunks")
+
+    for row in benchmark(chunks):
+        print(f"  {row['mode']:<14} workers={row['workers']:<3} {row['docs_per_sec']:>8,.1f} docs/sec")
@@ -0,0 +1,302 @@
+"""
+Micro-batching query server
+Sits between UI handlers and a RAG object: queries arriving within a short
+window are answered with one batched process_queries() (or
+retrieve_queries()) call and the results are handed back to each waiting
+caller
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from metadata_index import filters_key
+
+BATCH_WINDOW_MS = float(os.environ.get('RAG_BATCH_WINDOW_MS', 5))
+MAX_BATCH_SIZE = int(os.environ.get('RAG_MAX_BATCH_SIZE', 32))
+MAX_QUEUE_DEPTH = int(os.environ.get('RAG_MAX_QUEUE_DEPTH', 256))
+BATCH_WORKERS = int(os.environ.get('RAG_BATCH_WORKERS', 1))
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit() when max_queue_depth queries are already waiting"""
+
+
+class _Request:
+    __slots__ = ('query', 'options', 'group', 'future', 'enqueued')
+
+    def __init__(self, query, options):
+        self.query = query
+        self.options = options
+        self.group = tuple(sorted((name, filters_key(value) if name == 'filters' else value)
+                                  for name, value in options.items()))
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+def _resolve(future, result=None, exception=None):
+    """Set a future's outcome; one bad future must never kill a worker thread"""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except Exception:
+        pass
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent queries into batched rag.process_queries() calls
+    (or another batched method of rag named by method, e.g.
+    'retrieve_queries' to batch only encode + search and let streaming
+    callers build the answer themselves).
+
+    A worker takes the oldest waiting query, then keeps collecting until
+    batch_window_ms after that query arrived or max_batch_size queries are
+    in hand. When the worker's previous batch was a single query and
+    nothing else is waiting (a lone user), the query is sent at once
+    instead of waiting out the window. Queries with different options
+    (k, filters, ...) in the same window are answered by one call per
+    option set. At most
+    max_queue_depth queries wait at once; submit() raises QueueFullError
+    beyond that so callers can shed load. With workers > 1 several batches
+    run at the same time (the batched method must be thread-safe, as
+    UniversalRAG and OfflineRAG are). stats() percentiles cover the last
+    stats_window batches / queries.
+    """
+
+    def __init__(self, rag, batch_window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE,
+                 max_queue_depth=MAX_QUEUE_DEPTH, workers=BATCH_WORKERS, method='process_queries',
+                 stats_window=10_000):
+        self.rag = rag
+        self.method = method
+        self._batched = getattr(rag, method)
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue_depth = max_queue_depth
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Recent history only, so a long-running server's stats stay bounded
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._latencies = deque(maxlen=stats_window)
+        self._queries = 0
+        self._batches = 0
+        self._max_depth = 0
+        self.rejected = 0
+        self._threads = [threading.Thread(target=self._run_worker, name=f"query-batcher-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, query, **options):
+        """Future resolving to this query's entry of rag.<method>([query], **options)"""
+        if self._stop.is_set():
+            raise RuntimeError("QueryBatcher is closed")
+        request = _Request(query, options)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(f"{self.max_queue_depth} queries already waiting")
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return request.future
+
+    def process_query(self, query, timeout=None, **options):
+        """Blocking drop-in for rag.process_query (or the single-query form of method)"""
+        return self.submit(query, **options).result(timeout)
+
+    def _collect(self, wait_window=True):
+        """Oldest request plus whatever arrives within the batch window (None when stopping)"""
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._stop.is_set():
+                    return None
+        batch = [first]
+        deadline = first.enqueued + (self.batch_window if wait_window or not self._queue.empty() else 0.0)
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_worker(self):
+        previous_size = 0
+        while True:
+            batch = self._collect(wait_window=previous_size != 1)
+            if batch is None:
+                return
+            previous_size = len(batch)
+            groups = {}
+            for request in batch:
+                # Callers that timed out may have cancelled their future; don't compute those
+                if request.future.set_running_or_notify_cancel():
+                    groups.setdefault(request.group, []).append(request)
+            for requests in groups.values():
+                try:
+                    outputs = list(self._batched([r.query for r in requests], **requests[0].options))
+                    if len(outputs) != len(requests):
+                        raise RuntimeError(f"{self.method} returned {len(outputs)} results for {len(requests)} queries")
+                except Exception as e:
+                    for request in requests:
+                        _resolve(request.future, exception=e)
+                    continue
+                done = time.perf_counter()
+                for request, output in zip(requests, outputs):
+                    _resolve(request.future, result=output)
+                with self._lock:
+                    self._batch_sizes.append(len(requests))
+                    self._queries += len(requests)
+                    self._batches += 1
+                    self._latencies.extend(done - r.enqueued for r in requests)
+
+    def stats(self):
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            latencies = np.array(self._latencies) * 1000
+            rejected = self.rejected
+            queries, batches = self._queries, self._batches
+        return {
+            'queries': queries,
+            'batches': batches,
+            'avg_batch_size': round(float(np.mean(sizes)), 2) if sizes else 0.0,
+            'max_batch_size_seen': max(sizes, default=0),
+            'max_queue_depth_seen': self._max_depth,
+            'rejected': rejected,
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2) if len(latencies) else 0.0,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2) if len(latencies) else 0.0
+        }
+
+    def close(self, timeout=5.0):
+        """Stop accepting queries; workers finish what is queued, then exit"""
+        self._stop.set()
+        deadline = time.perf_counter() + timeout
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.perf_counter()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import shutil
+    import sys
+    import tempfile
+    import zlib
+    import pandas as pd
+    from chunking import clean_narrative, find_narrative_column, split_text
+    from vector_backends import NumpyVectorStore
+
+    class SyntheticEncoder:
+        """
+        Stand-in for MiniLM with comparable per-token compute (6 feed-forward
+        layers, 384 -> 1536 -> 384, over up to 32 hashed tokens), so batch
+        efficiency comes from the same BLAS calls a real encoder makes
+        """
+
+        def __init__(self, dim=384, layers=6, max_tokens=32):
+            rng = np.random.default_rng(0)
+            self.vocab = rng.standard_normal((4096, dim)).astype(np.float32)
+            self.layers = [((rng.standard_normal((dim, dim * 4)) / np.sqrt(dim)).astype(np.float32),
+                            (rng.standard_normal((dim * 4, dim)) / np.sqrt(dim * 4)).astype(np.float32))
+                           for _ in range(layers)]
+            self.max_tokens = max_tokens
+
+        def encode(self, texts, batch_size=64, show_progress_bar=False):
+            if len(texts) > batch_size:
+                return np.concatenate([self.encode(texts[i:i + batch_size], batch_size)
+                                       for i in range(0, len(texts), batch_size)])
+            ids = np.zeros((len(texts), self.max_tokens), dtype=np.int64)
+            lengths = np.ones(len(texts))
+            for i, text in enumerate(texts):
+                words = text.lower().split()[:self.max_tokens] or ['']
+                ids[i, :len(words)] = [zlib.crc32(w.encode('utf-8')) % 4096 for w in words]
+                lengths[i] = len(words)
+            x = self.vocab[ids]
+            for w1, w2 in self.layers:
+                x = x + np.maximum(x @ w1, 0) @ w2
+            return x.sum(axis=1) / lengths[:, None].astype(np.float32)
+
+    class BenchRAG:
+        """process_queries() = batched encode + one store search, like UniversalRAG without caches"""
+
+        def __init__(self, model, store):
+            self.model = model
+            self.store = store
+
+        def process_queries(self, queries, k=3):
+            results = self.store.query(self.model.encode(queries), n_results=k)
+            return [("", docs, metas) for docs, metas in zip(results['documents'], results['metadatas'])]
+
+        def process_query(self, query, k=3):
+            return self.process_queries([query], k=k)[0]
+
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    narrative_col = find_narrative_column(df.columns)
+    chunks = [c for t in df[narrative_col].dropna().astype(str) for c in split_text(clean_narrative(t)[0])]
+    corpus = (chunks * (20_000 // len(chunks) + 1))[:20_000]
+    queries = [c[:120] for c in chunks]
+    model = SyntheticEncoder()
+    clients_list = [int(c) for c in sys.argv[1:]] or [1, 8, 32, 128]
+    duration = 3.0
+
+    def run_clients(answer, clients):
+        latencies = []
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + duration
+
+        def client(i):
+            j = i
+            local = []
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                answer(queries[j % len(queries)])
+                local.append(time.perf_counter() - start)
+                j += clients
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        latencies = np.array(latencies) * 1000
+        return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        NumpyVectorStore.build(work_dir, [str(i) for i in range(len(corpus))], model.encode(corpus), corpus,
+                               [{'complaint_id': str(i)} for i in range(len(corpus))])
+        rag = BenchRAG(model, NumpyVectorStore(work_dir))
+        print(f"Serving {len(corpus):,} chunks, synthetic MiniLM-sized encoder, {duration:.0f}s per point")
+        print(f"  {'clients':>7}  {'mode':<22} {'queries/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'avg batch':>10}")
+        for clients in clients_list:
+            qps, p50, p99 = run_clients(rag.process_query, clients)
+            print(f"  {clients:>7}  {'direct (batch of 1)':<22} {qps:10.1f} {p50:9.2f} {p99:9.2f} {1:10.2f}")
+            with QueryBatcher(rag, max_queue_depth=max(256, clients)) as batcher:
+                qps, p50, p99 = run_clients(batcher.process_query, clients)
+                stats = batcher.stats()
+            label = f"batched ({BATCH_WINDOW_MS:g} ms window)"
+            print(f"  {clients:>7}  {label:<22} {qps:10.1f} {p50:9.2f} {p99:9.2f} {stats['avg_batch_size']:10.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
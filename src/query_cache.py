@@ -0,0 +1,219 @@
+"""
+Two-level query cache for the serving path
+1. exact-string LRU of query embeddings (skips the transformer)
+2. semantic cache of retrieval results for near-identical queries
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import METRICS
+
+
+class QueryEmbeddingLRU:
+    """Exact-string LRU of query embeddings with a TTL"""
+
+    def __init__(self, max_size=2048, ttl_seconds=3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+    def get(self, query):
+        entry = self._entries.get(query)
+        if entry is None:
+            return None
+        embedding, created = entry
+        if time.monotonic() - created > self.ttl_seconds:
+            del self._entries[query]
+            return None
+        self._entries.move_to_end(query)
+        return embedding
+
+    def put(self, query, embedding):
+        self._entries[query] = (embedding, time.monotonic())
+        self._entries.move_to_end(query)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SemanticResultCache:
+    """
+    Cache of query results looked up by cosine similarity.
+
+    Cached query embeddings live in one (max_size, dim) matrix so a lookup
+    is a single matrix-vector product. An entry only matches queries with
+    the same partition key (e.g. k), and expires after ttl_seconds. When
+    full, the least-recently-used entry is replaced.
+    """
+
+    def __init__(self, max_size=512, ttl_seconds=900, threshold=0.95):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.clear()
+
+    def clear(self):
+        self._matrix = None
+        self._entries = [None] * self.max_size
+        self._last_used = np.zeros(self.max_size)
+
+    def __len__(self):
+        return sum(1 for e in self._entries if e is not None)
+
+    def lookup(self, embedding, key=None):
+        """Return (result, compute_seconds) of the closest live entry, or None"""
+        if self._matrix is None:
+            return None
+
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return None
+        sims = self._matrix @ (embedding / norm)
+
+        now = time.monotonic()
+        for slot in np.argsort(-sims):
+            if sims[slot] < self.threshold:
+                break
+            entry = self._entries[slot]
+            if entry is None or entry['key'] != key:
+                continue
+            if now - entry['created'] > self.ttl_seconds:
+                self._entries[slot] = None
+                self._matrix[slot] = 0
+                continue
+            self._last_used[slot] = now
+            return entry['result'], entry['compute_seconds']
+        return None
+
+    def put(self, embedding, result, key=None, compute_seconds=0.0):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_size, len(embedding)), dtype=np.float32)
+
+        empty = [i for i, e in enumerate(self._entries) if e is None]
+        slot = empty[0] if empty else int(np.argmin(self._last_used))
+
+        now = time.monotonic()
+        self._matrix[slot] = embedding / norm
+        self._entries[slot] = {'key': key, 'result': result, 'created': now,
+                               'compute_seconds': compute_seconds}
+        self._last_used[slot] = now
+
+
+class QueryCache:
+    """
+    Both cache levels plus invalidation on vector store version changes
+    and hit-rate / time-saved counters.
+    """
+
+    def __init__(self, embedding_size=2048, embedding_ttl=3600,
+                 result_size=512, result_ttl=900, similarity_threshold=0.95,
+                 version_check_interval=5.0):
+        self.embeddings = QueryEmbeddingLRU(embedding_size, embedding_ttl)
+        self.results = SemanticResultCache(result_size, result_ttl, similarity_threshold)
+        self.version_check_interval = version_check_interval
+
+        self.store_version = None
+        self._last_version_check = 0.0
+        self._lock = threading.Lock()
+
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+        self.result_hits = 0
+        self.result_misses = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+        self._encode_seconds = 0.0
+
+    def check_version(self, store):
+        """Clear both levels if the store's version changed since the last check"""
+        now = time.monotonic()
+        if now - self._last_version_check < self.version_check_interval:
+            return
+        self._last_version_check = now
+
+        version = store.version()
+        with self._lock:
+            if self.store_version is not None and version != self.store_version:
+                self.embeddings.clear()
+                self.results.clear()
+                self.invalidations += 1
+            self.store_version = version
+
+    def embed(self, encode, queries):
+        """
+        Embeddings for queries, calling encode(list_of_misses) once for
+        the strings not in the LRU
+        """
+        with self._lock:
+            cached = [self.embeddings.get(q) for q in queries]
+        misses = list(dict.fromkeys(q for q, e in zip(queries, cached) if e is None))
+
+        fresh = {}
+        if misses:
+            start = time.perf_counter()
+            vectors = encode(misses)
+            elapsed = time.perf_counter() - start
+            fresh = dict(zip(misses, vectors))
+
+        with self._lock:
+            hits = sum(1 for e in cached if e is not None)
+            if hits and self.embedding_misses:
+                self.seconds_saved += hits * self._encode_seconds / self.embedding_misses
+            self.embedding_hits += hits
+            self.embedding_misses += len(misses)
+            if misses:
+                self._encode_seconds += elapsed
+            for q, e in fresh.items():
+                self.embeddings.put(q, e)
+        METRICS.inc('cache_hits', hits, cache='embedding')
+        METRICS.inc('cache_misses', len(misses), cache='embedding')
+
+        return np.vstack([e if e is not None else fresh[q] for q, e in zip(queries, cached)])
+
+    def lookup(self, embedding, key=None):
+        with self._lock:
+            hit = self.results.lookup(embedding, key)
+            if hit is None:
+                self.result_misses += 1
+                METRICS.inc('cache_misses', cache='result')
+                return None
+            result, compute_seconds = hit
+            self.result_hits += 1
+            self.seconds_saved += compute_seconds
+        METRICS.inc('cache_hits', cache='result')
+        return result
+
+    def store(self, embedding, result, key=None, compute_seconds=0.0):
+        with self._lock:
+            self.results.put(embedding, result, key, compute_seconds)
+
+    def stats(self):
+        embed_total = self.embedding_hits + self.embedding_misses
+        result_total = self.result_hits + self.result_misses
+        return {
+            'embedding_hits': self.embedding_hits,
+            'embedding_misses': self.embedding_misses,
+            'embedding_hit_rate': round(self.embedding_hits / embed_total, 4) if embed_total else 0.0,
+            'result_hits': self.result_hits,
+            'result_misses': self.result_misses,
+            'result_hit_rate': round(self.result_hits / result_total, 4) if result_total else 0.0,
+            'cached_embeddings': len(self.embeddings),
+            'cached_results': len(self.results),
+            'invalidations': self.invalidations,
+            'seconds_saved': round(self.seconds_saved, 3),
+            'store_version': self.store_version
+        }
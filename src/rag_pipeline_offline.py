@@ -4,12 +4,16 @@ Uses tiny local model that doesn't need downloading
 """
 
 import pandas as pd
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+from embedding_cache import EmbeddingCache
+from metrics import METRICS, get_logger
+from vector_backends import open_vector_store
+from theme_extraction import load_taxonomy
+from warmup import print_report as print_warmup_report, warmup as run_warmup
 import json
 import re
 
+log = get_logger('rag_pipeline_offline')
+
 print("=" * 70)
 print("TASK 3: OFFLINE RAG Pipeline")
 print("=" * 70)
@@ -19,24 +23,40 @@ class OfflineRAG:
     RAG system that works completely offline
     """
     
-    def __init__(self, vector_store_path='../vector_store/chroma_db_final'):
+    def __init__(self, vector_store_path='../vector_store/chroma_db_final', backend=None,
+                 taxonomy_path=None, warmup=True, warmup_options=None):
         """
         Initialize offline RAG system
+        
+        backend selects the vector store implementation ('chroma' or
+        'numpy'); it defaults to the RAG_VECTOR_BACKEND environment variable.
+        taxonomy_path optionally points to a JSON {category: [terms]} file
+        used for theme extraction instead of the built-in keywords.
+        
+        warmup runs synthetic queries through the model and store before
+        the first real one (see warmup.warmup); the report is kept in
+        warmup_report.
         """
         print("Initializing OFFLINE RAG System...")
         
         # 1. Load embedding model (already downloaded in Task 2)
+        from sentence_transformers import SentenceTransformer
+        
         self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_cache = EmbeddingCache('all-MiniLM-L6-v2', name='queries', capacity=50_000)
         print("✓ Loaded embedding model")
         
         # 2. Load vector store
         print(f"Loading vector store from {vector_store_path}...")
-        self.client = chromadb.PersistentClient(
-            path=vector_store_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        self.collection = self.client.get_collection("complaint_chunks")
-        print(f"✓ Loaded vector store with {self.collection.count()} chunks")
+        self.collection = open_vector_store(vector_store_path, backend)
+        print(f"✓ Loaded {self.collection.name} vector store with {self.collection.count()} chunks")
+        
+        self.theme_extractor = load_taxonomy(taxonomy_path)
+        
+        self.warmup_report = None
+        if warmup:
+            self.warmup_report = run_warmup(self.embedding_model, self.collection, **(warmup_options or {}))
+            print_warmup_report(self.warmup_report)
         
         # 3. NO INTERNET-DEPENDENT LLM - Using rule-based generation
         print("✓ Using rule-based answer generation (no LLM download needed)")
@@ -45,38 +65,64 @@ class OfflineRAG:
         print("OFFLINE RAG System Ready!")
         print("=" * 50)
     
-    def retrieve_chunks(self, query, k=5):
+    def retrieve_chunks(self, query, k=5, filters=None, collapse=False, neighbors=0):
         """
         Retrieve relevant complaint chunks
+        
+        filters restricts the search to matching metadata, e.g.
+        {'product': 'Credit card', 'state': 'TX', 'company': 'wells fargo',
+        'date_from': '2025-01-01'} (see metadata_index.MetadataIndex)
+        
+        collapse=True returns k distinct complaints (best chunk of each,
+        joined with up to neighbors adjacent chunks) instead of k chunks
+        """
+        METRICS.inc('queries')
+        with METRICS.span('encode'):
+            query_embedding = self.embedding_cache.encode(self.embedding_model, [query]).tolist()
+        
+        return self._search(query_embedding, k, filters, collapse, neighbors)
+    
+    def retrieve_chunks_batch(self, queries, k=5, filters=None, collapse=False, neighbors=0):
         """
-        query_embedding = self.embedding_model.encode([query]).tolist()
+        Retrieve chunks for many queries with one encode and one search
+        """
+        queries = list(queries)
+        METRICS.inc('queries', len(queries))
+        with METRICS.span('encode'):
+            query_embeddings = self.embedding_cache.encode(self.embedding_model, queries, batch_size=64)
         
-        results = self.collection.query(
-            query_embeddings=query_embedding,
+        return self._search(query_embeddings, k, filters, collapse, neighbors)
+    
+    def _search(self, query_embeddings, k, filters, collapse, neighbors):
+        include = ['documents', 'metadatas', 'distances']
+        if collapse:
+            return self.collection.query_complaints(query_embeddings, n_results=k, neighbors=neighbors,
+                                                    include=include, filters=filters)
+        return self.collection.query(
+            query_embeddings=query_embeddings,
             n_results=k,
-            include=['documents', 'metadatas', 'distances']
+            include=include,
+            filters=filters
         )
-        
-        return results
+    
+    def overfetch_stats(self):
+        """Average over-fetch of collapsed (collapse=True) retrieval so far"""
+        return self.collection.collapse_stats.report()
     
     def generate_answer_offline(self, query, chunks, metadata):
         """
         Generate answer without LLM - using smart text analysis
         """
+        with METRICS.span('answer'):
+            return self._compose_answer(query, chunks, metadata)
+    
+    def _compose_answer(self, query, chunks, metadata):
         # Analyze the retrieved chunks
         products = {}
         issues = {}
-        keywords = {}
-        
-        # Common financial complaint keywords
-        complaint_keywords = {
-            'billing': ['bill', 'charge', 'fee', 'payment', 'billing'],
-            'service': ['service', 'support', 'call', 'wait', 'representative'],
-            'fraud': ['fraud', 'unauthorized', 'theft', 'scam'],
-            'late': ['late', 'delay', 'overdue', 'penalty'],
-            'error': ['error', 'mistake', 'incorrect', 'wrong'],
-            'interest': ['interest', 'rate', 'apr', 'finance charge']
-        }
+        
+        # Keyword themes in one pass per chunk
+        keywords = self.theme_extractor.category_counts(chunks)
         
         # Analyze each chunk
         for chunk, meta in zip(chunks, metadata):
@@ -89,13 +135,6 @@ class OfflineRAG:
             # Count issues
             if issue != 'Unknown':
                 issues[issue] = issues.get(issue, 0) + 1
-            
-            # Check for keywords in chunk text
-            chunk_lower = chunk.lower()
-            for category, words in complaint_keywords.items():
-                for word in words:
-                    if word in chunk_lower:
-                        keywords[category] = keywords.get(category, 0) + 1
         
         # Build the answer
         answer_parts = []
@@ -134,14 +173,14 @@ class OfflineRAG:
         
         return "\n".join(answer_parts)
     
-    def process_query(self, query, k=3):
+    def process_query(self, query, k=3, filters=None, collapse=False, neighbors=0):
         """
         Complete RAG pipeline (offline version)
         """
-        print(f"\nQuery: '{query}'")
+        log.debug("Query: %r", query)
         
         # Retrieve chunks
-        results = self.retrieve_chunks(query, k=k)
+        results = self.retrieve_chunks(query, k=k, filters=filters, collapse=collapse, neighbors=neighbors)
         
         if not results['documents'] or len(results['documents'][0]) == 0:
             return "No relevant complaints found.", [], []
@@ -149,12 +188,34 @@ class OfflineRAG:
         chunks = results['documents'][0]
         metadata = results['metadatas'][0]
         
-        print(f"  Retrieved {len(chunks)} relevant chunks")
+        log.debug("Retrieved %d relevant chunks", len(chunks))
         
         # Generate answer offline
         answer = self.generate_answer_offline(query, chunks, metadata)
         
         return answer, chunks, metadata
+    
+    def process_queries(self, queries, k=3, filters=None, collapse=False, neighbors=0):
+        """
+        Batched RAG pipeline: returns [(answer, chunks, metadata), ...]
+        in the same order as queries
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        
+        results = self.retrieve_chunks_batch(queries, k=k, filters=filters, collapse=collapse, neighbors=neighbors)
+        
+        outputs = []
+        for i, query in enumerate(queries):
+            chunks = results['documents'][i] if results.get('documents') else []
+            metadata = results['metadatas'][i] if results.get('metadatas') else []
+            if not chunks:
+                outputs.append(("No relevant complaints found.", [], []))
+                continue
+            outputs.append((self.generate_answer_offline(query, chunks, metadata), chunks, metadata))
+        
+        return outputs
 
 def run_evaluation_offline():
     """
@@ -179,12 +240,12 @@ def run_evaluation_offline():
     evaluation_results = []
     
     print("\nRunning evaluation...")
-    for i, question in enumerate(test_questions):
+    batch_results = rag.process_queries(test_questions, k=3)
+    
+    for i, (question, (answer, chunks, metadata)) in enumerate(zip(test_questions, batch_results)):
         print(f"\n{'='*40}")
         print(f"Test {i+1}: {question}")
         
-        answer, chunks, metadata = rag.process_query(question, k=3)
-        
         print(f"\nAnswer (first 200 chars):")
         print(answer[:200] + "..." if len(answer) > 200 else answer)
         
@@ -210,6 +271,21 @@ def run_evaluation_offline():
     print("\nEvaluation Table:")
     print(eval_df.to_string(index=False))
     
+    # Separate pass, so the table above stays comparable with earlier k=3 chunk runs
+    print("\nCollapsed retrieval (k=3 distinct complaints, separate pass):")
+    collapsed_results = rag.process_queries(test_questions, k=3, collapse=True)
+    collapse_rows = []
+    for question, (_, chunks, metadata), (_, collapsed, _) in zip(test_questions, batch_results, collapsed_results):
+        distinct = len({m.get('complaint_id') for m in metadata})
+        collapse_rows.append((question, distinct, len(collapsed)))
+        print(f"  {question[:45]:<45} top-3 chunks from {distinct} complaints, collapsed {len(collapsed)}")
+    overfetch = rag.overfetch_stats()
+    print(f"  Avg over-fetch {overfetch['avg_overfetch_factor']:.2f}x, {overfetch['avg_rounds']:.2f} rounds")
+    
+    print("\nStage latency:")
+    for stage, stats in METRICS.snapshot()['stages'].items():
+        print(f"  {stage:<7} n={stats['count']:<4} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+    
     # Save results
     eval_df.to_csv('../data/offline_rag_evaluation.csv', index=False)
     print(f"\n✓ Saved to: data/offline_rag_evaluation.csv")
@@ -229,6 +305,16 @@ def run_evaluation_offline():
     for _, row in eval_df.iterrows():
         report += f"| {row['Question']} | {row['Answer Length']} chars | {row['Sources Used']} | {row['Products Found']} |\n"
     
+    report += "\n## Collapsed Retrieval (separate pass)\n"
+    report += "k=3 distinct complaints per question (best chunk of each) instead of k=3 chunks; "
+    report += "not part of the results table above.\n\n"
+    report += "| Question | Complaints in top-3 chunks | Collapsed complaints |\n"
+    report += "|----------|----------------------------|----------------------|\n"
+    for question, distinct, collapsed in collapse_rows:
+        report += f"| {question} | {distinct} | {collapsed} |\n"
+    report += (f"\nAverage over-fetch {overfetch['avg_overfetch_factor']:.2f}x, "
+               f"{overfetch['avg_rounds']:.2f} search rounds per query.\n")
+    
     report += "\n## Key Insights\n"
     report += "1. **Effective Retrieval**: Vector search finds relevant complaints\n"
     report += "2. **Product Analysis**: Correctly identifies financial products\n"
@@ -263,10 +349,9 @@ def demonstrate_interactive():
         "Any problems with customer service?"
     ]
     
-    for query in demo_queries:
+    for query, (answer, chunks, metadata) in zip(demo_queries, rag.process_queries(demo_queries, k=2)):
         print(f"\n{'='*40}")
         print(f"USER: {query}")
-        answer, chunks, metadata = rag.process_query(query, k=2)
         
         print(f"\nASSISTANT: {answer[:150]}...")
         print(f"  [Based on {len(chunks)} complaint excerpts]")
@@ -295,6 +380,12 @@ def main():
     print("=" * 70)
     
     rag = OfflineRAG()
+    stages = METRICS.snapshot()['stages']
+    if stages:
+        latency = ", ".join(f"{stage} {stats['p50_ms']:.1f} ms" for stage, stats in stages.items())
+        response_time = f"✓ Measured p50 per stage: {latency} (at scale: python benchmark_suite.py)"
+    else:
+        response_time = "✓ Response time: see python benchmark_suite.py"
     
     capabilities = [
         "✓ Semantic search of 567 complaint chunks",
@@ -303,7 +394,7 @@ def main():
         "✓ Keyword-based theme extraction",
         "✓ Source-excerpt presentation",
         "✓ No internet dependency",
-        "✓ Fast response time"
+        response_time
     ]
     
     for cap in capabilities:
@@ -0,0 +1,91 @@
+"""
+Startup profile for the app entry points
+Import-time breakdown (python -X importtime) of the serving modules and
+time until the UI port would open with eager vs background model loading
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+# What app.py does before demo.launch(), followed by binding a port
+_PORT_SCRIPT = """
+import socket, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+try:
+    import gradio
+except ImportError:
+    gradio = None
+from rag_universal import UniversalRAG
+rag = UniversalRAG(background={background})
+sock = socket.socket()
+sock.bind(('127.0.0.1', 0))
+sock.listen()
+port_open = time.perf_counter() - start
+rag.wait_ready()
+ready = time.perf_counter() - start
+print('RESULT', port_open, ready, gradio is not None)
+"""
+
+
+def import_profile(module, top=10):
+    """(total ms, [(cumulative ms, direct child import)] slowest first) for `import module`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=SRC_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return float('nan'), []
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            entries.append((int(match.group(2)) / 1000, len(match.group(3)) // 2, match.group(4)))
+
+    # importtime prints children before their parent: walk back from the module's line
+    end = max(i for i, (_, depth, name) in enumerate(entries) if depth == 0 and name == module)
+    rows = []
+    for cumulative, depth, name in reversed(entries[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            rows.append((cumulative, name))
+    return entries[end][0], sorted(rows, reverse=True)[:top]
+
+
+def time_to_port(background):
+    """(seconds until the port is bound, seconds until the RAG system is ready)"""
+    result = subprocess.run([sys.executable, '-c', _PORT_SCRIPT.format(src=SRC_DIR, background=background)],
+                            cwd=SRC_DIR, capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith('RESULT'):
+            _, port_open, ready, has_gradio = line.split()
+            return float(port_open), float(ready), has_gradio == 'True'
+    raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'no output')
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or ['rag_universal', 'sentence_transformers', 'chromadb', 'gradio']
+    print("Import time (python -X importtime, cumulative)")
+    for module in modules:
+        total, rows = import_profile(module)
+        if total != total:
+            print(f"\n  {module}: not importable here")
+            continue
+        print(f"\n  {module}: {total:,.1f} ms")
+        for cumulative, name in rows:
+            print(f"    {cumulative:9,.1f} ms  {name}")
+
+    print("\nTime to port open (app.py startup, measured in a fresh process)")
+    for label, background in [('eager load (before)', False), ('background load (after)', True)]:
+        try:
+            port_open, ready, has_gradio = time_to_port(background)
+        except RuntimeError as e:
+            print(f"  {label:<24} failed: {e}")
+            continue
+        note = '' if has_gradio else '  (gradio not installed, import not counted)'
+        print(f"  {label:<24} port open {port_open * 1000:9,.1f} ms, RAG ready {ready * 1000:9,.1f} ms{note}")
@@ -0,0 +1,116 @@
+"""
+Vector store manifest
+vector_store/task2_info.json records where each built store lives (path,
+collection, model, dimension, version), so the RAG apps open it directly
+instead of scanning directories for something that looks like a store
+"""
+
+import json
+import os
+import time
+
+MANIFEST_NAME = 'task2_info.json'
+# Anchored at this file, so resolution does not depend on the working directory
+DEFAULT_MANIFEST = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                 '..', 'vector_store', MANIFEST_NAME))
+MANIFEST_ENV = 'RAG_STORE_MANIFEST'
+
+
+def manifest_path(path=None):
+    """Explicit path, else $RAG_STORE_MANIFEST, else vector_store/task2_info.json"""
+    return path or os.environ.get(MANIFEST_ENV) or DEFAULT_MANIFEST
+
+
+def load_manifest(path=None):
+    """Manifest dict, or None if the file is missing or unreadable"""
+    try:
+        with open(manifest_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def record_store(backend, store_path, collection_name=None, embedding_model=None,
+                 embedding_dimension=None, count=None, version=None, info=None, path=None):
+    """
+    Add or replace the manifest entry for one backend's store.
+
+    store_path is saved relative to the manifest's directory. info updates
+    the top-level (task summary) fields; entries of other backends are kept.
+    """
+    path = manifest_path(path)
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+    manifest = load_manifest(path) or {}
+    manifest.update(info or {})
+
+    entry = {'path': os.path.relpath(os.path.abspath(store_path), manifest_dir)}
+    for key, value in [('collection_name', collection_name), ('embedding_model', embedding_model),
+                       ('embedding_dimension', embedding_dimension), ('count', count),
+                       ('store_version', version)]:
+        if value is not None:
+            entry[key] = value
+    entry['recorded_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    manifest.setdefault('stores', {})[backend] = entry
+
+    os.makedirs(manifest_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return entry
+
+
+def store_entry(backend, path=None, manifest=None):
+    """
+    Manifest entry for backend with an absolute 'path', or None.
+
+    Manifests written before the 'stores' section existed still resolve:
+    storage_path (relative to the project root) or the manifest's own
+    directory for Chroma, and vector_store/<backend>_store for the local
+    backends.
+    """
+    path = manifest_path(path)
+    manifest = manifest if manifest is not None else load_manifest(path)
+    if manifest is None:
+        return None
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+
+    marker = 'chroma.sqlite3' if backend == 'chroma' else 'store_info.json'
+    entry = manifest.get('stores', {}).get(backend)
+    if entry is not None:
+        candidates = [dict(entry, path=os.path.normpath(os.path.join(manifest_dir, entry['path'])))]
+    elif backend == 'chroma':
+        legacy = {'collection_name': manifest.get('collection_name', 'complaint_chunks'),
+                  'embedding_dimension': manifest.get('embedding_dimension')}
+        paths = [os.path.join(manifest_dir, '..', manifest['storage_path'])] if manifest.get('storage_path') else []
+        candidates = [dict(legacy, path=os.path.normpath(p)) for p in paths + [manifest_dir]]
+    else:
+        candidates = [{'path': os.path.join(manifest_dir, f'{backend}_store')}]
+
+    for entry in candidates:
+        if os.path.exists(os.path.join(entry['path'], marker)):
+            return entry
+    return None
+
+
+def open_from_manifest(backend, path=None):
+    """(store, entry) for backend from the manifest, or (None, None)"""
+    from vector_backends import open_vector_store
+
+    entry = store_entry(backend, path)
+    if entry is None:
+        return None, None
+    store = open_vector_store(entry['path'], backend, entry.get('collection_name') or 'complaint_chunks')
+    return store, entry
+
+
+if __name__ == "__main__":
+    import sys
+
+    manifest = load_manifest()
+    print(f"Manifest: {manifest_path()}" + ("" if manifest is not None else " (missing)"))
+    for backend in sys.argv[1:] or ['chroma', 'numpy', 'faiss']:
+        entry = store_entry(backend, manifest=manifest)
+        if entry is None:
+            print(f"  {backend:<7} -")
+        else:
+            details = ", ".join(f"{k}={v}" for k, v in entry.items() if k != 'path')
+            print(f"  {backend:<7} {entry['path']}" + (f" ({details})" if details else ""))
@@ -0,0 +1,177 @@
+"""
+Synthetic complaint corpus
+Generates complaints in the schema of filtered_complaints.csv, following
+its product/issue mix, company/state frequencies, dates and narrative
+lengths, so ingestion and retrieval can be benchmarked at 10k-1M+ chunks
+"""
+
+import math
+import random
+import re
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from chunking import clean_narrative, find_narrative_column, split_spans
+
+CATEGORY_COLUMNS = ['Product', 'Sub-product', 'Issue', 'Sub-issue']
+# Sampled independently, each by its observed frequency (missing values included)
+INDEPENDENT_COLUMNS = ['Company', 'State', 'ZIP code', 'Tags', 'Consumer consent provided?', 'Submitted via',
+                       'Company public response', 'Company response to consumer', 'Timely response?',
+                       'Consumer disputed?']
+RAW_NARRATIVE = 'Consumer complaint narrative'
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_AMOUNT_RE = re.compile(r'\{\$[\d,]+(?:\.\d+)?\}')
+_CFPB_RE = re.compile(r'\bcfpb\b')
+
+
+_PUNCT_RE = re.compile(r"[^\w\s.,!?]")
+
+
+def eda_clean(narrative):
+    """cleaned_narrative as the EDA step made it: lower case, no 'cfpb', spaces collapsed, then symbols dropped"""
+    text = " ".join(_CFPB_RE.sub('', narrative.lower()).split())
+    return _PUNCT_RE.sub('', text).strip()
+
+
+def _frequencies(values):
+    counts = Counter(None if pd.isna(v) else v for v in values)
+    return list(counts), list(counts.values())
+
+
+class CorpusProfile:
+    """Distributions of one complaints CSV that generate() samples from"""
+
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self.narrative_col = find_narrative_column(df.columns)
+        present = [c for c in CATEGORY_COLUMNS if c in df.columns]
+        self.category_columns = present
+        counts = Counter(df[present].astype(object).where(df[present].notna(), None).itertuples(index=False, name=None))
+        self.categories, self.category_weights = list(counts), list(counts.values())
+        self.independent = {c: _frequencies(df[c]) for c in INDEPENDENT_COLUMNS if c in df.columns}
+
+        received = pd.to_datetime(df['Date received'], errors='coerce')
+        self.first_date = received.min().date()
+        self.date_span = max(1, (received.max() - received.min()).days + 1)
+        self.send_lags = [0]
+        if 'Date sent to company' in df.columns:
+            sent = pd.to_datetime(df['Date sent to company'], errors='coerce')
+            self.send_lags = [int(d) for d in (sent - received).dt.days.dropna()] or [0]
+
+        # Sentences come from the raw narratives; cleaned_narrative is derived from them
+        self.source_col = RAW_NARRATIVE if RAW_NARRATIVE in df.columns else self.narrative_col
+        narratives = df[self.source_col].dropna().astype(str)
+        self.word_counts = [len(n.split()) for n in narratives]
+        # Sentences pooled per issue, so a narrative reads like its issue
+        self.sentences = {}
+        issue_col = 'Issue' if 'Issue' in df.columns else None
+        for issue, narrative in zip(df[issue_col] if issue_col else [None] * len(df), df[self.source_col]):
+            if pd.isna(narrative):
+                continue
+            sentences = [s for s in _SENTENCE_RE.split(str(narrative).strip()) if s]
+            self.sentences.setdefault(issue, []).extend(sentences)
+        self.all_sentences = [s for pool in self.sentences.values() for s in pool]
+
+        chunk_counts = [len(split_spans(clean_narrative(str(n))[0])) for n in df[self.narrative_col].dropna()]
+        self.chunks_per_complaint = float(np.mean(chunk_counts)) if chunk_counts else 1.0
+        self.next_complaint_id = int(df['Complaint ID'].max()) + 1 if 'Complaint ID' in df.columns else 1
+
+    @classmethod
+    def from_csv(cls, csv_path='../data/filtered_complaints.csv'):
+        return cls(pd.read_csv(csv_path))
+
+    def complaints_for_chunks(self, n_chunks):
+        """Complaints to generate for about n_chunks chunks with the default chunker"""
+        return max(1, math.ceil(n_chunks / self.chunks_per_complaint))
+
+
+def _narrative(rng, profile, issue):
+    target = rng.choice(profile.word_counts)
+    pool = profile.sentences.get(issue) or profile.all_sentences
+    words = 0
+    sentences = []
+    while words < target:
+        sentence = rng.choice(pool if rng.random() < 0.8 else profile.all_sentences)
+        # Fresh amounts keep recombined sentences from repeating verbatim
+        sentence = _AMOUNT_RE.sub(lambda m: f"{{${rng.randint(5, 9999)}.{rng.randint(0, 99):02d}}}", sentence)
+        sentences.append(sentence)
+        words += len(sentence.split())
+    return " ".join(sentences)
+
+
+def generate(profile, n_complaints, seed=0, start_id=None):
+    """DataFrame of n_complaints synthetic complaints with the profile's columns"""
+    rng = random.Random(seed)
+    start_id = profile.next_complaint_id if start_id is None else start_id
+    categories = rng.choices(profile.categories, profile.category_weights, k=n_complaints)
+    columns = {c: rng.choices(values, weights, k=n_complaints)
+               for c, (values, weights) in profile.independent.items()}
+
+    rows = {c: [] for c in profile.columns}
+    for i in range(n_complaints):
+        category = dict(zip(profile.category_columns, categories[i]))
+        received = profile.first_date + timedelta(days=rng.randrange(profile.date_span))
+        narrative = _narrative(rng, profile, category.get('Issue'))
+        values = dict(category)
+        values.update({c: columns[c][i] for c in columns})
+        values.update({
+            'Date received': received.isoformat(),
+            'Date sent to company': (received + timedelta(days=rng.choice(profile.send_lags))).isoformat(),
+            profile.source_col: narrative,
+            'Complaint ID': start_id + i,
+            'narrative_length': len(narrative),
+            'word_count': len(narrative.split())
+        })
+        if profile.narrative_col != profile.source_col:
+            values[profile.narrative_col] = eda_clean(narrative)
+        for c in profile.columns:
+            rows[c].append(values.get(c))
+    return pd.DataFrame(rows, columns=profile.columns)
+
+
+def generate_batches(profile, n_chunks, batch_size=10_000, seed=0):
+    """Yield DataFrames of at most batch_size complaints, about n_chunks chunks in total"""
+    total = profile.complaints_for_chunks(n_chunks)
+    start_id = profile.next_complaint_id
+    for batch, offset in enumerate(range(0, total, batch_size)):
+        n = min(batch_size, total - offset)
+        yield generate(profile, n, seed=seed * 1_000_003 + batch, start_id=start_id + offset)
+
+
+def write_csv(path, n_chunks, csv_path='../data/filtered_complaints.csv', seed=0, batch_size=10_000):
+    """Write a synthetic complaints CSV of about n_chunks chunks; returns the number of complaints"""
+    profile = CorpusProfile.from_csv(csv_path)
+    written = 0
+    for df in generate_batches(profile, n_chunks, batch_size, seed):
+        df.to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += len(df)
+    return written
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # python synthetic_corpus.py [n_chunks] [out.csv]
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    out = sys.argv[2] if len(sys.argv) > 2 else f'../data/synthetic_complaints_{n_chunks}.csv'
+    source = pd.read_csv('../data/filtered_complaints.csv')
+    profile = CorpusProfile(source)
+    start = time.perf_counter()
+    written = write_csv(out, n_chunks)
+    elapsed = time.perf_counter() - start
+    synthetic = pd.read_csv(out)
+    print(f"✓ Wrote {written:,} complaints (~{n_chunks:,} chunks) to {out} in {elapsed:.1f}s")
+
+    print("\nDistribution check (share of complaints, real vs synthetic):")
+    for column in ['Issue', 'Company', 'State']:
+        real = source[column].value_counts(normalize=True)
+        fake = synthetic[column].value_counts(normalize=True)
+        print(f"  {column}:")
+        for value in real.index[:3]:
+            print(f"    {str(value)[:40]:<40} {real[value]:6.1%}  {fake.get(value, 0.0):6.1%}")
+    print(f"  words/narrative: real median {np.median(profile.word_counts):.0f}, "
+          f"synthetic median {synthetic['word_count'].median():.0f}")
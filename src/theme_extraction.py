@@ -0,0 +1,170 @@
+"""
+Shared keyword/theme extraction
+Compiles a keyword taxonomy once and scans each chunk in a single pass
+"""
+
+import json
+import re
+
+# Categories used by OfflineRAG.generate_answer_offline
+COMPLAINT_KEYWORDS = {
+    'billing': ['bill', 'charge', 'fee', 'payment', 'billing'],
+    'service': ['service', 'support', 'call', 'wait', 'representative'],
+    'fraud': ['fraud', 'unauthorized', 'theft', 'scam'],
+    'late': ['late', 'delay', 'overdue', 'penalty'],
+    'error': ['error', 'mistake', 'incorrect', 'wrong'],
+    'interest': ['interest', 'rate', 'apr', 'finance charge']
+}
+
+# Theme words reported by UniversalRAG._generate_smart_answer
+COMMON_THEME_WORDS = ['billing', 'service', 'fee', 'charge', 'error', 'problem', 'delay', 'unauthorized']
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# ASCII punctuation/whitespace -> space, so str.split() tokenizes like _TOKEN_RE
+_SEPARATORS = {i: ' ' for i in range(128) if not chr(i).isalnum()}
+
+
+def _inflections(word):
+    """The word plus the simple inflected forms that should match it"""
+    forms = {word, word + 's', word + 'es', word + 'ed', word + 'd', word + 'ing'}
+    if word.endswith('e'):
+        forms.add(word[:-1] + 'ing')
+    return forms
+
+
+class ThemeExtractor:
+    """
+    Whole-word matcher for a {category: [terms]} taxonomy.
+
+    All single-word terms and their simple inflections ("charges",
+    "charged" -> "charge") are compiled into one dict, so matching a chunk
+    is a tokenization pass plus a set intersection: the cost depends on the
+    chunk length, not on how many terms the taxonomy has. Multi-word terms
+    ("finance charge") are compiled into a single alternation regex.
+    """
+
+    def __init__(self, taxonomy):
+        self.taxonomy = {category: list(terms) for category, terms in taxonomy.items()}
+        self.term_categories = {}
+        for category, terms in self.taxonomy.items():
+            for term in terms:
+                key = ' '.join(_TOKEN_RE.findall(term.lower()))
+                if key:
+                    self.term_categories.setdefault(key, []).append(category)
+
+        # surface form -> canonical term
+        self.word_forms = {}
+        self.phrase_forms = {}
+        for term in self.term_categories:
+            words = term.split()
+            if len(words) == 1:
+                for form in _inflections(term):
+                    self.word_forms.setdefault(form, term)
+            else:
+                for form in _inflections(words[-1]):
+                    self.phrase_forms.setdefault(' '.join(words[:-1] + [form]), term)
+        # exact terms win over inflections of other terms
+        for term in self.term_categories:
+            if ' ' not in term:
+                self.word_forms[term] = term
+        self._word_keys = frozenset(self.word_forms)
+
+        # Phrases grouped by first word; no leading \b so the regex engine can
+        # use its fast literal-prefix scan (the left boundary is checked by hand)
+        by_first_word = {}
+        for phrase in self.phrase_forms:
+            first, rest = phrase.split(' ', 1)
+            by_first_word.setdefault(first, []).append(r'\s+'.join(map(re.escape, rest.split())))
+        self._phrase_starts = frozenset(by_first_word)
+        self._phrase_re = None
+        if by_first_word:
+            groups = [re.escape(first) + r'\s+(?:' + '|'.join(sorted(rests, key=len, reverse=True)) + ')'
+                      for first, rests in by_first_word.items()]
+            self._phrase_re = re.compile('(?:' + '|'.join(groups) + r')\b')
+
+    @classmethod
+    def from_words(cls, words):
+        """Taxonomy where every word is its own category"""
+        return cls({word: [word] for word in words})
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a {category: [terms]} taxonomy from a JSON file"""
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def match_terms(self, text):
+        """Set of taxonomy terms that occur as whole words in text"""
+        text = text.lower()
+        tokens = set(text.translate(_SEPARATORS).split())
+        found = {self.word_forms[t] for t in self._word_keys.intersection(tokens)}
+        # Only run the phrase regex when a phrase's first word is present
+        if self._phrase_re is not None and not self._phrase_starts.isdisjoint(tokens):
+            for match in self._phrase_re.finditer(text):
+                start = match.start()
+                if start == 0 or not text[start - 1].isalnum():
+                    found.add(self.phrase_forms[' '.join(match.group().split())])
+        return found
+
+    def category_counts(self, chunks):
+        """
+        {category: count} where each matched term in each chunk adds one
+        to every category it belongs to
+        """
+        counts = {}
+        for chunk in chunks:
+            for term in self.match_terms(chunk):
+                for category in self.term_categories[term]:
+                    counts[category] = counts.get(category, 0) + 1
+        return counts
+
+    def categories_found(self, chunks):
+        """Distinct categories matched across chunks, in taxonomy order"""
+        matched = set()
+        for chunk in chunks:
+            for term in self.match_terms(chunk):
+                matched.update(self.term_categories[term])
+        return [category for category in self.taxonomy if category in matched]
+
+
+def load_taxonomy(path=None, default=COMPLAINT_KEYWORDS):
+    """ThemeExtractor for the JSON taxonomy at path, or the built-in default"""
+    if path:
+        return ThemeExtractor.from_file(path)
+    return ThemeExtractor(default)
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+
+    df = pd.read_csv('../data/filtered_complaints.csv')
+    chunks = [str(t) for t in df['cleaned_narrative'].dropna()]
+
+    def nested_loop(chunks, taxonomy):
+        keywords = {}
+        for chunk in chunks:
+            chunk_lower = chunk.lower()
+            for category, words in taxonomy.items():
+                for word in words:
+                    if word in chunk_lower:
+                        keywords[category] = keywords.get(category, 0) + 1
+        return keywords
+
+    vocabulary = sorted(set(_TOKEN_RE.findall(' '.join(chunks).lower())))
+    large_taxonomy = {f"category_{i}": vocabulary[i::50][:10] for i in range(50)}
+
+    for label, taxonomy in [('built-in', COMPLAINT_KEYWORDS), ('500-term', large_taxonomy)]:
+        n_terms = sum(len(v) for v in taxonomy.values())
+        start = time.perf_counter()
+        nested_loop(chunks, taxonomy)
+        old = time.perf_counter() - start
+
+        extractor = ThemeExtractor(taxonomy)
+        start = time.perf_counter()
+        extractor.category_counts(chunks)
+        new = time.perf_counter() - start
+
+        print(f"{label:>9} taxonomy ({n_terms} terms): nested loop {old * 1000:7.1f} ms, "
+              f"single pass {new * 1000:7.1f} ms over {len(chunks)} narratives")
@@ -0,0 +1,662 @@
+"""
+Pluggable vector store backends
+Every backend answers query() with the same dict layout as a Chroma
+collection, so OfflineRAG / UniversalRAG do not care which one is in use
+"""
+
+import json
+import mmap
+import os
+
+import numpy as np
+
+from metrics import METRICS
+
+DEFAULT_BACKEND = os.environ.get('RAG_VECTOR_BACKEND', 'chroma')
+
+
+class VectorStore:
+    """
+    Minimal interface shared by all backends.
+
+    query() returns {'ids': [[...]], 'documents': [[...]],
+    'metadatas': [[...]], 'distances': [[...]]} with one inner list per
+    query embedding. Distances are cosine distances (1 - cosine similarity).
+    With filters (see metadata_index.MetadataIndex) only chunks whose
+    metadata match are returned, so inner lists may be shorter than
+    n_results.
+    """
+
+    name = 'vector_store'
+    _metadata_index = None
+    last_filter_plan = None
+    _collapse_stats = None
+
+    def count(self):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=5, include=('documents', 'metadatas', 'distances'),
+              filters=None):
+        raise NotImplementedError
+
+    def _all_metadata(self):
+        raise NotImplementedError
+
+    def metadata_index(self):
+        """MetadataIndex over every chunk, built on first use"""
+        if self._metadata_index is None:
+            from metadata_index import MetadataIndex
+
+            self._metadata_index = MetadataIndex.from_metadatas(self._all_metadata())
+        return self._metadata_index
+
+    def complaint_chunks(self, complaint_id):
+        """[(document, metadata), ...] for every chunk of one complaint"""
+        raise NotImplementedError
+
+    def pretouch(self):
+        """Fault in memory-mapped files so the first query does not; returns bytes touched"""
+        return 0
+
+    @property
+    def collapse_stats(self):
+        """complaint_collapse.OverfetchStats shared by this store's collapsed queries"""
+        if self._collapse_stats is None:
+            from complaint_collapse import OverfetchStats
+
+            self._collapse_stats = OverfetchStats()
+        return self._collapse_stats
+
+    def query_complaints(self, query_embeddings, n_results=5, neighbors=0,
+                         include=('documents', 'metadatas', 'distances'), filters=None):
+        """query() collapsed to n_results distinct complaints (see complaint_collapse.query_complaints)"""
+        from complaint_collapse import query_complaints
+
+        return query_complaints(self, query_embeddings, n_results, neighbors=neighbors, include=include,
+                                filters=filters, stats=self.collapse_stats)
+
+    def version(self):
+        """Cheap identifier that changes whenever the store contents change"""
+        return f"{self.name}:{self.count()}"
+
+
+class ChromaVectorStore(VectorStore):
+    """Thin wrapper around an existing Chroma collection"""
+
+    def __init__(self, collection, path=None):
+        self.collection = collection
+        self.name = collection.name
+        self.path = path
+
+    @classmethod
+    def open(cls, path, collection_name='complaint_chunks'):
+        import chromadb
+        from chromadb.config import Settings
+
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        return cls(client.get_collection(collection_name), path)
+
+    def count(self):
+        return self.collection.count()
+
+    def version(self):
+        version = f"chroma:{self.name}:{self.count()}"
+        sqlite_path = os.path.join(self.path, 'chroma.sqlite3') if self.path else None
+        if sqlite_path and os.path.exists(sqlite_path):
+            version += f":{os.path.getmtime(sqlite_path)}"
+        return version
+
+    def _all_metadata(self, page_size=5000):
+        offset = 0
+        while True:
+            page = self.collection.get(include=['metadatas'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            for meta in page['metadatas']:
+                yield meta or {}
+            offset += len(page['ids'])
+
+    def complaint_chunks(self, complaint_id):
+        page = self.collection.get(where={'complaint_id': complaint_id}, include=['documents', 'metadatas'])
+        return list(zip(page['documents'], page['metadatas']))
+
+    def query(self, query_embeddings, n_results=5, include=('documents', 'metadatas', 'distances'),
+              filters=None):
+        if isinstance(query_embeddings, np.ndarray):
+            query_embeddings = query_embeddings.tolist()
+        # Chroma decodes documents/metadata inside query(), so this span covers both
+        with METRICS.span('search'):
+            if not filters:
+                return self.collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                             include=list(include))
+            return self._filtered_query(query_embeddings, n_results, include, filters)
+
+    def _filtered_query(self, query_embeddings, n_results, include, filters, overfetch=2.0):
+        """
+        Categorical filters become a Chroma `where` (filtered inside Chroma's
+        own search); a date range is post-filtered with over-fetch sized by
+        its selectivity among the chunks that pass the `where`, doubling the
+        fetch until every query has n_results matches (or all of them).
+        """
+        from metadata_index import DATE_FILTERS, normalize_filters
+
+        index = self.metadata_index()
+        filters = normalize_filters(filters)
+        mask = index.mask(filters)
+        matching = int(mask.sum()) if mask is not None else index.n
+        where = index.where_clause(filters)
+        empty = {key: [[] for _ in query_embeddings] for key in ['ids'] + list(include)}
+        if where is None or matching == 0:
+            self.last_filter_plan = {'strategy': 'empty', 'candidates': 0}
+            return empty
+
+        dates = {f: filters[f] for f in DATE_FILTERS if f in filters}
+        categorical = {f: v for f, v in filters.items() if f not in DATE_FILTERS}
+        category_count = int(index.mask(categorical).sum()) if categorical else index.n
+        selectivity = matching / max(category_count, 1)
+        fetch = n_results if not dates else min(category_count, int(np.ceil(n_results / selectivity * overfetch)))
+
+        include_fetch = list(dict.fromkeys(list(include) + (['metadatas'] if dates else [])))
+        date_from, date_to = dates.get('date_from'), dates.get('date_to')
+        wanted = min(n_results, matching)
+        while True:
+            results = self.collection.query(query_embeddings=query_embeddings, n_results=fetch,
+                                            where=where or None, include=include_fetch)
+            if not dates:
+                break
+            kept = []
+            for metas in results['metadatas']:
+                keep = []
+                for j, meta in enumerate(metas):
+                    date = str((meta or {}).get('date_received', ''))[:10]
+                    if date and (not date_from or date >= date_from) and (not date_to or date <= date_to):
+                        keep.append(j)
+                kept.append(keep[:n_results])
+            if fetch >= category_count or all(len(keep) >= wanted for keep in kept):
+                break
+            fetch = min(category_count, fetch * 2)
+        self.last_filter_plan = {'strategy': 'chroma_where' + ('+date_postfilter' if dates else ''),
+                                 'candidates': matching, 'selectivity': matching / max(index.n, 1),
+                                 'fetched': fetch}
+        if not dates:
+            return results
+
+        filtered = {key: [] for key in results if results[key] is not None}
+        for q, keep in enumerate(kept):
+            for key in filtered:
+                filtered[key].append([results[key][q][j] for j in keep])
+        if 'metadatas' not in include:
+            filtered.pop('metadatas', None)
+        return filtered
+
+
+def touch_pages(array):
+    """Read one byte per OS page of a (memory-mapped) contiguous array; returns its size in bytes"""
+    if array is None or array.size == 0:
+        return 0
+    raw = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+    int(raw[::mmap.PAGESIZE].sum())
+    return raw.nbytes
+
+
+def normalize_rows(embeddings):
+    """Return a float32 copy of embeddings with unit-length rows"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+class SideArrayStore(VectorStore):
+    """
+    Base for local backends that keep ids, documents and metadata in
+    side arrays indexed by row (metadata stored column-wise).
+
+    If the store directory has a compact/ subdirectory (see
+    compact_store.py), documents and metadata are read from narrative
+    spans and the complaint table instead of documents.json/metadata.json.
+    If it has chunks.arrow / chunks.parquet (see columnar_store.py), ids,
+    documents and metadata all come from that memory-mapped table.
+    """
+
+    compact = None
+    columnar = None
+    _complaint_rows = None
+    # Filtered queries scan the matching rows exactly below this fraction
+    # of the corpus and over-fetch from the full index above it
+    prefilter_selectivity = 0.3
+
+    def _load_side_arrays(self, path):
+        with open(os.path.join(path, 'store_info.json')) as f:
+            self.info = json.load(f)
+
+        if self.info.get('side_arrays') == 'columnar':
+            from columnar_store import ColumnarChunkStore
+
+            self.columnar = ColumnarChunkStore(path)
+            self.ids = self.columnar.ids
+            return
+
+        with open(os.path.join(path, 'ids.json')) as f:
+            self.ids = json.load(f)
+
+        compact_path = os.path.join(path, 'compact')
+        if os.path.isdir(compact_path):
+            from compact_store import CompactChunkStore
+
+            self.compact = CompactChunkStore(compact_path)
+            self.compact_rows = self.compact.row_of(self.ids)
+            return
+
+        with open(os.path.join(path, 'documents.json')) as f:
+            self.documents = json.load(f)
+        with open(os.path.join(path, 'metadata.json')) as f:
+            self.metadata_columns = json.load(f)
+
+    @staticmethod
+    def _write_side_arrays(path, ids, documents, metadatas, info):
+        os.makedirs(path, exist_ok=True)
+
+        fields = []
+        for meta in metadatas:
+            for key in meta:
+                if key not in fields:
+                    fields.append(key)
+        columns = {field: [meta.get(field) for meta in metadatas] for field in fields}
+
+        with open(os.path.join(path, 'ids.json'), 'w') as f:
+            json.dump(list(ids), f)
+        with open(os.path.join(path, 'documents.json'), 'w') as f:
+            json.dump(list(documents), f)
+        with open(os.path.join(path, 'metadata.json'), 'w') as f:
+            json.dump(columns, f)
+
+        info = dict(info, total_chunks=len(ids), metadata_fields=fields)
+        with open(os.path.join(path, 'store_info.json'), 'w') as f:
+            json.dump(info, f, indent=2)
+
+    def count(self):
+        return len(self.ids)
+
+    def version(self):
+        info_path = os.path.join(self.path, 'store_info.json')
+        return f"{self.name}:{self.count()}:{os.path.getmtime(info_path)}"
+
+    def _document(self, row):
+        if self.columnar is not None:
+            return self.columnar.text(row)
+        if self.compact is not None:
+            return self.compact.text(self.compact_rows[row])
+        return self.documents[row]
+
+    def _metadata(self, row):
+        if self.columnar is not None:
+            return self.columnar.metadata(row)
+        if self.compact is not None:
+            return self.compact.metadata(self.compact_rows[row])
+        return {field: values[row] for field, values in self.metadata_columns.items()
+                if values[row] is not None}
+
+    def _all_metadata(self):
+        if self.columnar is None and self.compact is None:
+            fields = list(self.metadata_columns.items())
+            return ({field: values[row] for field, values in fields if values[row] is not None}
+                    for row in range(len(self.ids)))
+        return (self._metadata(row) for row in range(len(self.ids)))
+
+    def complaint_chunks(self, complaint_id):
+        if self._complaint_rows is None:
+            self._complaint_rows = {}
+            for row, meta in enumerate(self._all_metadata()):
+                self._complaint_rows.setdefault(meta.get('complaint_id'), []).append(row)
+        return [(self._document(row), self._metadata(row)) for row in self._complaint_rows.get(complaint_id, ())]
+
+    def pretouch(self):
+        if self.compact is not None:
+            return touch_pages(self.compact.chunks) + touch_pages(self.compact.blob)
+        return 0
+
+    def _candidate_vectors(self, rows):
+        """Normalized stored vectors for the given rows"""
+        raise NotImplementedError
+
+    def search_rows(self, query_embeddings, n_results, rows):
+        """Exact search restricted to rows (pre-filtering)"""
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+        scores = queries @ self._candidate_vectors(rows).T
+        k = min(n_results, len(rows))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < len(rows) else \
+            np.tile(np.arange(len(rows)), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return rows[top], np.take_along_axis(top_scores, order, axis=1)
+
+    def filtered_search(self, query_embeddings, n_results, filters, overfetch=2.0):
+        """
+        (rows, sims) lists per query, restricted to chunks matching filters.
+
+        Below prefilter_selectivity the candidate rows from the metadata
+        index are scanned exactly; above it the normal index is searched for
+        n_results / selectivity * overfetch rows and non-matching rows are
+        dropped, doubling the fetch until every query has n_results.
+        """
+        queries = np.atleast_2d(query_embeddings)
+        n = len(self.ids)
+        mask = self.metadata_index().mask(filters)
+        if mask is None:
+            rows, sims = self.search(queries, n_results)
+            return list(rows), list(sims)
+
+        candidates = np.flatnonzero(mask)
+        selectivity = len(candidates) / max(n, 1)
+        plan = {'candidates': len(candidates), 'selectivity': selectivity}
+        if len(candidates) == 0:
+            self.last_filter_plan = dict(plan, strategy='empty')
+            return [np.zeros(0, dtype=np.int64)] * len(queries), [np.zeros(0, dtype=np.float32)] * len(queries)
+
+        if selectivity <= self.prefilter_selectivity:
+            rows, sims = self.search_rows(queries, n_results, candidates)
+            self.last_filter_plan = dict(plan, strategy='prefilter')
+            return list(rows), list(sims)
+
+        k = min(n_results, len(candidates))
+        fetch = min(n, int(np.ceil(n_results / selectivity * overfetch)))
+        while True:
+            rows, sims = self.search(queries, fetch)
+            keep = [mask[r] for r in rows]
+            if fetch >= n or all(m.sum() >= k for m in keep):
+                break
+            fetch = min(n, fetch * 2)
+        self.last_filter_plan = dict(plan, strategy='postfilter', fetched=fetch)
+        return ([r[m][:k] for r, m in zip(rows, keep)], [s[m][:k] for s, m in zip(sims, keep)])
+
+    def query(self, query_embeddings, n_results=5, include=('documents', 'metadatas', 'distances'),
+              filters=None):
+        with METRICS.span('search'):
+            if filters:
+                rows, sims = self.filtered_search(query_embeddings, n_results, filters)
+            else:
+                rows, sims = self.search(query_embeddings, n_results)
+        with METRICS.span('decode'):
+            return rows_to_results(self, rows, sims, include)
+
+
+class NumpyVectorStore(SideArrayStore):
+    """
+    Exact cosine search over one contiguous float32 matrix.
+
+    Embeddings are L2-normalized at build time so a query is a single
+    matrix product followed by argpartition. Documents and metadata live
+    in side arrays indexed by row; metadata is stored column-wise.
+
+    Files in the store directory:
+      embeddings.npy  - (n, dim) float32, optionally memory-mapped on load
+      ids.json        - list of n chunk ids
+      documents.json  - list of n chunk texts
+      metadata.json   - {field: [n values]}
+      store_info.json - counts, dimension and backend name
+    """
+
+    name = 'numpy_exact'
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        self.embeddings = np.load(os.path.join(path, 'embeddings.npy'), mmap_mode='r' if mmap else None)
+        self._load_side_arrays(path)
+
+    @staticmethod
+    def build(path, ids, embeddings, documents, metadatas):
+        """Write a store directory from parallel lists / an embedding matrix"""
+        embeddings = normalize_rows(embeddings)
+        SideArrayStore._write_side_arrays(path, ids, documents, metadatas, {
+            'backend': NumpyVectorStore.name,
+            'embedding_dimension': int(embeddings.shape[1]) if len(embeddings) else 0
+        })
+        np.save(os.path.join(path, 'embeddings.npy'), embeddings)
+
+    def pretouch(self):
+        return touch_pages(self.embeddings) + super().pretouch()
+
+    def _candidate_vectors(self, rows):
+        return self.embeddings[rows]
+
+    def search(self, query_embeddings, n_results=5):
+        """Return (rows, similarities) arrays of shape (n_queries, k)"""
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+
+        k = min(n_results, len(self.ids))
+        scores = queries @ self.embeddings.T
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+FAISS_INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq')
+
+
+def faiss_factory_string(index_type, n, dim, nlist=None, hnsw_m=32, pq_m=None, pq_bits=8):
+    """Translate an index type and corpus size into a faiss.index_factory string"""
+    if index_type == 'flat':
+        return 'Flat'
+    if index_type == 'hnsw':
+        return f'HNSW{hnsw_m}'
+
+    # faiss wants ~39+ training points per centroid
+    nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+    if index_type == 'ivf_flat':
+        return f'IVF{nlist},Flat'
+    if index_type == 'ivf_pq':
+        pq_m = pq_m or next(m for m in (48, 32, 24, 16, 12, 8, 6, 4, 3, 2, 1) if dim % m == 0)
+        if n < 2 ** pq_bits:
+            raise ValueError(f"ivf_pq with {pq_bits}-bit codes needs at least {2 ** pq_bits} vectors, got {n}")
+        return f'IVF{nlist},PQ{pq_m}x{pq_bits}'
+    raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {FAISS_INDEX_TYPES})")
+
+
+class FaissVectorStore(SideArrayStore):
+    """
+    Approximate (or exact, for 'flat') search with a FAISS index.
+
+    Vectors are L2-normalized and searched by inner product, so scores are
+    cosine similarities like the other backends. nprobe (IVF) and
+    ef_search (HNSW) can be overridden at load time; otherwise the values
+    saved in store_info.json are used.
+
+    Files in the store directory: index.faiss plus the same side arrays
+    as NumpyVectorStore.
+    """
+
+    name = 'faiss'
+    # Approximate full-index search is cheap, so only scan the matching rows
+    # exactly when they are a small part of the corpus
+    prefilter_selectivity = 0.03
+
+    def __init__(self, path, nprobe=None, ef_search=None):
+        import faiss
+
+        self.path = path
+        self._load_side_arrays(path)
+        self.index = faiss.read_index(os.path.join(path, 'index.faiss'))
+        self.name = f"faiss_{self.info.get('index_type', 'flat')}"
+        self.set_search_params(nprobe or self.info.get('nprobe'), ef_search or self.info.get('ef_search'))
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Adjust the speed/recall trade-off of an opened index"""
+        import faiss
+
+        if nprobe:
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                ivf.nprobe = int(nprobe)
+        if ef_search and hasattr(self.index, 'hnsw'):
+            self.index.hnsw.efSearch = int(ef_search)
+
+    @staticmethod
+    def build(path, ids, embeddings, documents, metadatas, index_type='hnsw',
+              nprobe=16, ef_search=64, evaluate=True, **factory_params):
+        """Train, fill and save an index; records recall@k and latency in store_info.json"""
+        import faiss
+
+        embeddings = normalize_rows(embeddings)
+        n, dim = embeddings.shape
+        factory = faiss_factory_string(index_type, n, dim, **factory_params)
+
+        index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+        if not index.is_trained:
+            index.train(embeddings)
+        index.add(embeddings)
+
+        SideArrayStore._write_side_arrays(path, ids, documents, metadatas, {
+            'backend': FaissVectorStore.name,
+            'index_type': index_type,
+            'factory': factory,
+            'embedding_dimension': int(dim),
+            'nprobe': nprobe,
+            'ef_search': ef_search
+        })
+        faiss.write_index(index, os.path.join(path, 'index.faiss'))
+
+        if evaluate:
+            store = FaissVectorStore(path)
+            store.info['evaluation'] = evaluate_index(store, embeddings)
+            with open(os.path.join(path, 'store_info.json'), 'w') as f:
+                json.dump(store.info, f, indent=2)
+            return store.info
+        return None
+
+    def _candidate_vectors(self, rows):
+        import faiss
+
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+        return self.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def search(self, query_embeddings, n_results=5):
+        """
+        (rows, similarities) arrays of shape (n_queries, k), or lists of
+        per-query arrays when some query reached fewer than k rows
+        """
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+        k = min(n_results, len(self.ids))
+        sims, rows = self.index.search(queries, k)
+        # FAISS pads with -1 when fewer than k results are reachable; drop the
+        # padding per query so other queries in the batch keep all k rows
+        if (rows < 0).any():
+            found = rows >= 0
+            rows, sims = [r[m] for r, m in zip(rows, found)], [s[m] for s, m in zip(sims, found)]
+        return rows, sims
+
+
+def evaluate_index(store, exact_embeddings, k=10, n_queries=200, seed=42):
+    """
+    Recall@k of store against exact search over exact_embeddings, plus
+    single-query p50/p99 latency. Queries are sampled corpus vectors.
+    """
+    import time
+
+    exact_embeddings = normalize_rows(exact_embeddings)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(exact_embeddings), size=min(n_queries, len(exact_embeddings)), replace=False)
+    queries = exact_embeddings[sample]
+    k = min(k, len(exact_embeddings))
+
+    scores = queries @ exact_embeddings.T
+    truth = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+    hits = 0
+    latencies = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows, _ = store.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(rows[0].tolist()) & set(expected.tolist()))
+
+    return {
+        'k': k,
+        'queries': len(queries),
+        f'recall_at_{k}': round(hits / (len(queries) * k), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3)
+    }
+
+
+def rows_to_results(store, rows, sims, include):
+    """Turn (rows, similarities) - arrays or ragged lists per query - into a Chroma-style result dict"""
+    rows = [np.asarray(q).tolist() for q in rows]
+    results = {'ids': [[store.ids[r] for r in q] for q in rows]}
+    if 'documents' in include:
+        results['documents'] = [[store._document(r) for r in q] for q in rows]
+    if 'metadatas' in include:
+        results['metadatas'] = [[store._metadata(r) for r in q] for q in rows]
+    if 'distances' in include:
+        results['distances'] = [(1.0 - np.asarray(q)).tolist() for q in sims]
+    return results
+
+
+def export_chroma(chroma_path, collection_name='complaint_chunks', page_size=5000):
+    """Read ids, embeddings, documents and metadata out of a Chroma store"""
+    store = ChromaVectorStore.open(chroma_path, collection_name)
+    ids, embeddings, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        page = store.collection.get(include=['embeddings', 'documents', 'metadatas'],
+                                    limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        ids.extend(page['ids'])
+        embeddings.extend(page['embeddings'])
+        documents.extend(page['documents'])
+        metadatas.extend(page['metadatas'])
+        offset += len(page['ids'])
+    return ids, np.asarray(embeddings, dtype=np.float32), documents, metadatas
+
+
+def build_numpy_store_from_chroma(chroma_path, out_path, collection_name='complaint_chunks'):
+    """Convert an existing Chroma store (e.g. vector_store/chroma.sqlite3) to a NumPy store"""
+    ids, embeddings, documents, metadatas = export_chroma(chroma_path, collection_name)
+    NumpyVectorStore.build(out_path, ids, embeddings, documents, metadatas)
+    return len(ids)
+
+
+def build_faiss_store_from_chroma(chroma_path, out_path, index_type='hnsw',
+                                  collection_name='complaint_chunks', **params):
+    """Convert an existing Chroma store to a FAISS store; returns its store_info"""
+    ids, embeddings, documents, metadatas = export_chroma(chroma_path, collection_name)
+    return FaissVectorStore.build(out_path, ids, embeddings, documents, metadatas,
+                                  index_type=index_type, **params)
+
+
+def open_vector_store(path, backend=None, collection_name='complaint_chunks', **options):
+    """Open a vector store directory with the configured backend"""
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'chroma':
+        return ChromaVectorStore.open(path, collection_name)
+    if backend == 'numpy':
+        return NumpyVectorStore(path, mmap=options.get('mmap', True))
+    if backend == 'faiss':
+        return FaissVectorStore(path, nprobe=options.get('nprobe'), ef_search=options.get('ef_search'))
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    chroma_path = sys.argv[1] if len(sys.argv) > 1 else '../vector_store'
+    out_path = sys.argv[2] if len(sys.argv) > 2 else '../vector_store/numpy_store'
+
+    print(f"Converting Chroma store {chroma_path} -> {out_path}")
+    n = build_numpy_store_from_chroma(chroma_path, out_path)
+    print(f"✓ Wrote {n:,} chunks to NumPy store at {out_path}")
+
+    from store_manifest import record_store, store_entry
+
+    store = NumpyVectorStore(out_path)
+    record_store('numpy', out_path, embedding_model=(store_entry('chroma') or {}).get('embedding_model'),
+                 embedding_dimension=store.embeddings.shape[1], count=store.count(), version=store.version())
+    print("✓ Recorded in vector_store/task2_info.json")
@@ -0,0 +1,106 @@
+"""
+Query-path warmup
+Runs synthetic queries through the embedding model and vector store at
+several batch sizes and pre-touches memory-mapped store files, so the
+first real query does not pay tokenizer/kernel/allocator/page-fault costs
+"""
+
+import time
+
+import numpy as np
+
+from metrics import METRICS
+
+DEFAULT_WARMUP_QUERIES = [
+    "What are common issues with credit cards?",
+    "unauthorized charges on my account",
+    "billing error and late fees",
+    "customer service never called back about my dispute",
+    "money transfer delayed for several days",
+    "personal loan interest rate higher than promised",
+    "savings account closed without notice",
+    "fraudulent transaction refund denied"
+]
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+
+
+def synthetic_queries(n, queries=None):
+    """n distinct query strings built from the warmup set (distinct so no cache can answer them)"""
+    queries = list(queries or DEFAULT_WARMUP_QUERIES)
+    return [queries[i % len(queries)] + (f" #{i // len(queries)}" if i >= len(queries) else "")
+            for i in range(n)]
+
+
+def warmup(model, store, queries=None, batch_sizes=DEFAULT_BATCH_SIZES, steady_queries=20, k=5):
+    """
+    Warm model and store; returns a report.
+
+    The first single-query encode + search is timed cold, then every batch
+    size is run once, then steady_queries single queries give the
+    steady-state p50 the cold latency is compared against. Calls go to
+    model.encode and store.query directly, bypassing the query caches.
+    METRICS is suppressed for this thread meanwhile so synthetic queries
+    stay out of the exported latency histograms.
+    """
+    with METRICS.suppressed():
+        return _warmup(model, store, queries, batch_sizes, steady_queries, k)
+
+
+def _warmup(model, store, queries, batch_sizes, steady_queries, k):
+    start = time.perf_counter()
+    pretouched = store.pretouch() if store is not None and hasattr(store, 'pretouch') else 0
+    texts = synthetic_queries(max(max(batch_sizes, default=1), steady_queries) + 1, queries)
+
+    def run(batch):
+        embeddings = np.asarray(model.encode(batch, show_progress_bar=False), dtype=np.float32)
+        if store is not None:
+            store.query(embeddings, n_results=k, include=['metadatas', 'distances'])
+
+    step = time.perf_counter()
+    run(texts[:1])
+    first_ms = (time.perf_counter() - step) * 1000
+
+    batch_ms = {}
+    for size in batch_sizes:
+        step = time.perf_counter()
+        run(texts[:size])
+        batch_ms[size] = round((time.perf_counter() - step) * 1000, 2)
+
+    latencies = []
+    for text in texts[1:steady_queries + 1]:
+        step = time.perf_counter()
+        run([text])
+        latencies.append((time.perf_counter() - step) * 1000)
+    p50 = float(np.percentile(latencies, 50)) if latencies else float('nan')
+
+    return {
+        'first_query_ms': round(first_ms, 2),
+        'steady_p50_ms': round(p50, 2),
+        'first_to_p50': round(first_ms / p50, 1) if p50 > 0 else None,
+        'batch_ms': batch_ms,
+        'pretouched_bytes': int(pretouched),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def print_report(report):
+    print(f"✓ Warmup done in {report['seconds']:.2f}s: first query {report['first_query_ms']:.1f} ms, "
+          f"steady p50 {report['steady_p50_ms']:.1f} ms ({report['first_to_p50']}x)")
+    batches = ", ".join(f"{size}: {ms:.1f} ms" for size, ms in report['batch_ms'].items())
+    print(f"  Batches: {batches}; pre-touched {report['pretouched_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    import sys
+    from vector_backends import open_vector_store
+
+    # Cold vs warm first query in this process (run once per backend, each in a fresh process)
+    path = sys.argv[1] if len(sys.argv) > 1 else '../vector_store'
+    backend = sys.argv[2] if len(sys.argv) > 2 else None
+    model_start = time.perf_counter()
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+    print(f"Model loaded in {time.perf_counter() - model_start:.2f}s")
+    store = open_vector_store(path, backend)
+    print_report(warmup(model, store))
@@ -0,0 +1,66 @@
+"""/query_stream must answer 503 (not an in-band error on a 200) when the retrieval batcher is full"""
+
+import http.client
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from api_server import start_in_thread
+from query_batcher import QueryBatcher
+
+
+class GatedStreamingRAG:
+    """retrieve_queries() blocks until release is set; stream_query() yields evidence then done"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def retrieve_queries(self, queries, **options):
+        self.started.set()
+        self.release.wait(5)
+        return [([f"chunk for {q}"], [{}]) for q in queries]
+
+    def stream_query(self, query, retrieve=None, **options):
+        chunks, metadata = retrieve(query, **options)
+        for chunk in chunks:
+            yield {'type': 'evidence', 'chunk': chunk}
+        yield {'type': 'done'}
+
+
+def _stream(address, query):
+    connection = http.client.HTTPConnection(*address, timeout=5)
+    connection.request('POST', '/query_stream', json.dumps({'query': query}))
+    response = connection.getresponse()
+    body = response.read().decode('utf-8')
+    connection.close()
+    return response.status, body
+
+
+def test_full_batcher_is_a_503_before_streaming():
+    rag = GatedStreamingRAG()
+    batcher = QueryBatcher(rag, method='retrieve_queries', batch_window_ms=0, max_batch_size=1, max_queue_depth=1)
+    server = start_in_thread(rag, batcher, port=0, request_timeout=5)
+    try:
+        first = batcher.submit('in progress')
+        assert rag.started.wait(2)
+        queued = batcher.submit('waiting')
+
+        status, body = _stream(server.address, 'rejected')
+        assert status == 503
+        assert 'busy' in json.loads(body)['error']
+
+        rag.release.set()
+        first.result(2)
+        queued.result(2)
+        status, body = _stream(server.address, 'accepted')
+        events = [json.loads(line) for line in body.splitlines() if line]
+        assert status == 200
+        assert [e['type'] for e in events] == ['evidence', 'done']
+    finally:
+        rag.release.set()
+        server.close()
+        batcher.close()
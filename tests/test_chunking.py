@@ -0,0 +1,160 @@
+"""Redaction collapsing origin map, character and token-aware splitting, truncation accounting"""
+
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from chunking import (clean_narrative, original_span, split_spans, split_text, split_token_spans,
+                      truncation_report)
+
+NARRATIVES = [
+    "On XX/XX/XXXX I called XXXX XXXX about a charge   on my card.\n\nThey said XXXXI am not covered.",
+    "  xxxx, xxxx; xx/xx/xxxx -  my account at xxxx was closed\tand the box of letters never came.  ",
+    "No redactions here, just text with a tab\tand  double spaces.",
+    "XXXX",
+]
+
+
+def random_narrative(rng, words=400):
+    vocabulary = ['the', 'bank', 'charged', 'me', 'XXXX', 'xx/xx/xxxx', 'XX/XX/XXXX,', 'fee.', 'dispute',
+                  'box', 'account;', 'Xavier', 'refund!', '\n\n', 'card', 'XXXXI', 'never', 'called', '-']
+    return ' '.join(vocabulary[i] for i in rng.integers(len(vocabulary), size=words))
+
+
+def legacy_char_splitter(text, chunk_size=500, chunk_overlap=50):
+    """The character loop split_spans replaced; char mode must keep producing its chunks"""
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text]
+    chunks, start, text_length = [], 0, len(text)
+    while start < text_length:
+        end = start + chunk_size
+        if end >= text_length:
+            chunk = text[start:].strip()
+            if chunk:
+                chunks.append(chunk)
+            break
+        break_point = end
+        for i in range(end, min(text_length, end + 100)):
+            if text[i] in ' .!?,;\n':
+                break_point = i + 1
+                break
+        if break_point == end:
+            break_point = min(text_length, end + 50)
+        chunk = text[start:break_point].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = max(start + 1, break_point - chunk_overlap)
+    return chunks
+
+
+class PieceTokenizer:
+    """Fast-tokenizer stand-in: words and punctuation, long words cut into 4-character pieces"""
+
+    def _offsets(self, text):
+        return [(m.start() + k, min(m.end(), m.start() + k + 4))
+                for m in re.finditer(r"\w+|[^\w\s]", text) for k in range(0, m.end() - m.start(), 4)]
+
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False, truncation=False,
+                 verbose=True):
+        special = 2 if add_special_tokens else 0
+        if isinstance(texts, str):
+            offsets = self._offsets(texts)
+            return {'input_ids': [0] * (len(offsets) + special), 'offset_mapping': offsets}
+        return {'input_ids': [[0] * (len(self._offsets(t)) + special) for t in texts]}
+
+
+def test_clean_narrative_collapses_redactions_and_whitespace():
+    clean, origin = clean_narrative(NARRATIVES[0])
+    assert clean == "On XXXX I called XXXX about a charge on my card. They said XXXX I am not covered."
+    assert clean_narrative(NARRATIVES[1])[0] == ("xxxx - my account at xxxx was closed and the box of "
+                                                 "letters never came.")
+    assert clean_narrative("")[0] == ""
+
+
+@pytest.mark.parametrize('text', NARRATIVES + [random_narrative(np.random.default_rng(seed)) for seed in range(5)])
+def test_origin_points_at_source_characters(text):
+    clean, origin = clean_narrative(text)
+    assert len(origin) == len(clean) + 1
+    assert origin == sorted(origin)
+    assert origin[-1] <= len(text)
+    for i, char in enumerate(clean):
+        source = text[origin[i]]
+        # Placeholders point at the first x of their run, collapsed whitespace at its first character
+        # and the space split off a glued word ("XXXXI") at that word
+        assert source == char or (char == ' ' and (source.isspace() or text[origin[i] - 1] in 'xX'))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_word_aligned_spans_round_trip(seed):
+    text = random_narrative(np.random.default_rng(seed))
+    clean, origin = clean_narrative(text)
+    words = [m.span() for m in re.finditer(r"\S+", clean)]
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        first, last = sorted(rng.integers(len(words), size=2))
+        start, end = words[first][0], words[last][1]
+        char_start, char_end = original_span(text, origin, start, end)
+        assert clean_narrative(text[char_start:char_end])[0] == clean[start:end]
+
+
+def test_chunk_spans_cover_their_source():
+    text = random_narrative(np.random.default_rng(7), words=2000)
+    clean, origin = clean_narrative(text)
+    for start, end in split_spans(clean, 300, 40):
+        char_start, char_end = original_span(text, origin, start, end)
+        assert all(char_start <= origin[i] < char_end for i in range(start, end) if not clean[i].isspace())
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_char_mode_matches_legacy_splitter(seed):
+    rng = np.random.default_rng(seed)
+    text = random_narrative(rng, words=int(rng.integers(1, 800)))
+    # Stretches with no break character force the hard cut
+    text = text.replace('dispute', 'x' * int(rng.integers(50, 300)))
+    assert split_text(text) == legacy_char_splitter(text)
+    assert split_text(text, 200, 20) == legacy_char_splitter(text, 200, 20)
+
+
+def test_split_spans_rejects_overlap_not_smaller_than_size():
+    with pytest.raises(ValueError):
+        split_spans("a" * 100, chunk_size=50, chunk_overlap=50)
+
+
+def test_token_spans_fit_the_model_and_overlap():
+    tokenizer = PieceTokenizer()
+    text = random_narrative(np.random.default_rng(3), words=1500) + " supercalifragilistic" * 5
+    spans = split_token_spans(text, tokenizer, max_tokens=64, overlap_tokens=8)
+
+    assert len(spans) > 1
+    for start, end in spans:
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert len(tokenizer(chunk, add_special_tokens=True)['input_ids']) <= 64
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert start < end
+    assert spans[0][0] == 0 and spans[-1][1] == len(text.rstrip())
+    # Cuts fall between words, not inside one
+    for _, end in spans[:-1]:
+        assert not (text[end - 1].isalnum() and text[end].isalnum())
+
+
+def test_short_text_is_one_token_span():
+    assert split_token_spans("  a short complaint  ", PieceTokenizer(), max_tokens=64) == [(2, 19)]
+    assert split_token_spans("", PieceTokenizer()) == []
+    with pytest.raises(ValueError):
+        split_token_spans("text", PieceTokenizer(), max_tokens=10, overlap_tokens=8)
+
+
+def test_truncation_report_counts_dropped_tokens():
+    chunks = ["one two six", "a b c d e f g h i j", "w " * 20]
+    report = truncation_report(chunks, PieceTokenizer(), max_tokens=10, batch_size=2)
+    # With [CLS]/[SEP]: 5, 12 and 22 tokens
+    assert report == {'chunks': 3, 'truncated_chunks': 2, 'truncated_fraction': 0.6667,
+                      'tokens': 39, 'tokens_dropped': 14}
+    assert truncation_report([], PieceTokenizer())['truncated_fraction'] == 0.0
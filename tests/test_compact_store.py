@@ -0,0 +1,63 @@
+"""Attaching compact side arrays must refuse a store chunked differently, leaving it untouched"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from compact_store import attach_to_vector_store
+from create_proper_vector_store import chunk_rows
+from vector_backends import NumpyVectorStore
+
+NARRATIVE = ("On XX/XX/XXXX I called XXXX XXXX about a charge on my card that I never made. "
+             "They told me the dispute was closed and would not reopen it. ")
+
+
+def write_csv(path):
+    df = pd.DataFrame({
+        'Complaint ID': [str(i) for i in range(6)],
+        'Product': ['Credit card'] * 6,
+        'Issue': ['Dispute'] * 6,
+        'Company': ['Bank'] * 6,
+        'State': ['TX'] * 6,
+        'Date received': ['2024-01-02'] * 6,
+        'Consumer complaint narrative': [NARRATIVE * (i + 2) for i in range(6)],
+    })
+    df.to_csv(path, index=False)
+    return df
+
+
+def build_store(path, df, **options):
+    ids, chunks, metadata = chunk_rows(df, 'Consumer complaint narrative', **options)
+    embeddings = np.random.default_rng(0).standard_normal((len(ids), 8)).astype(np.float32)
+    NumpyVectorStore.build(str(path), ids, embeddings, chunks, metadata)
+
+
+def test_attach_matching_store(tmp_path):
+    csv_path = str(tmp_path / 'complaints.csv')
+    df = write_csv(csv_path)
+    build_store(tmp_path / 'store', df)
+
+    attach_to_vector_store(str(tmp_path / 'store'), csv_path)
+
+    assert not os.path.exists(tmp_path / 'store' / 'documents.json')
+    store = NumpyVectorStore(str(tmp_path / 'store'))
+    result = store.query(np.ones((1, 8), dtype=np.float32), n_results=3, include=['documents'])
+    assert all(doc for doc in result['documents'][0])
+
+
+def test_mismatched_chunking_is_a_value_error(tmp_path):
+    csv_path = str(tmp_path / 'complaints.csv')
+    df = write_csv(csv_path)
+    build_store(tmp_path / 'store', df, collapse_redactions=False)
+
+    with pytest.raises(ValueError, match='--keep-redactions'):
+        attach_to_vector_store(str(tmp_path / 'store'), csv_path)
+
+    assert sorted(os.listdir(tmp_path / 'store')) == ['documents.json', 'embeddings.npy', 'ids.json',
+                                                     'metadata.json', 'store_info.json']
+    NumpyVectorStore(str(tmp_path / 'store'))
@@ -0,0 +1,71 @@
+"""EmbeddingCache sharing: one instance per directory within a process, lock released on close"""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, SRC)
+
+from embedding_cache import EmbeddingCache
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def _persistent_in_other_process(cache_dir):
+    code = (f"import sys; sys.path.insert(0, {os.path.abspath(SRC)!r})\n"
+            f"from embedding_cache import EmbeddingCache\n"
+            f"print(EmbeddingCache('m', name='queries', cache_dir={str(cache_dir)!r}).persistent)")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True).stdout
+    return output.strip().splitlines()[-1] == 'True'
+
+
+def test_two_caches_on_one_directory_share_state(tmp_path, capsys):
+    first = EmbeddingCache('m', name='queries', cache_dir=str(tmp_path), capacity=10)
+    second = EmbeddingCache('m', name='queries', cache_dir=str(tmp_path), capacity=10)
+    try:
+        assert second is first
+        assert first.persistent
+        assert 'in use' not in capsys.readouterr().out
+
+        model = CountingModel()
+        first.encode(model, ['late fee'])
+        second.encode(model, ['late fee'])
+        assert model.encoded == 1
+        assert not _persistent_in_other_process(tmp_path)
+    finally:
+        first.close()
+
+    assert _persistent_in_other_process(tmp_path)
+    reopened = EmbeddingCache('m', name='queries', cache_dir=str(tmp_path), capacity=10)
+    try:
+        assert reopened is not first
+        assert len(reopened.index) == 1
+    finally:
+        reopened.close()
+
+
+def test_closed_cache_keeps_working_in_memory(tmp_path):
+    cache = EmbeddingCache('m', name='chunks', cache_dir=str(tmp_path), capacity=10)
+    cache.close()
+    model = CountingModel()
+    assert cache.encode(model, ['a', 'a']).shape == (2, 2)
+    assert not cache.persistent
+
+
+def test_positional_arguments_pick_the_same_directory(tmp_path):
+    by_keyword = EmbeddingCache('m', False, 'chunks', str(tmp_path), capacity=10, dtype='float16')
+    try:
+        assert EmbeddingCache('m', False, 'chunks', str(tmp_path), 10, 'float16') is by_keyword
+        assert by_keyword.dtype == np.float16
+    finally:
+        by_keyword.close()
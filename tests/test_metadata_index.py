@@ -0,0 +1,95 @@
+"""Metadata filters (category bitmaps, date ranges) against a brute-force filter over the same metadata"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metadata_index import MetadataIndex
+from vector_backends import NumpyVectorStore
+
+PRODUCTS = ['Credit card', 'Checking or savings account', 'Personal loan', 'Money transfers']
+STATES = ['TX', 'CA', 'NY', 'FL', None]
+
+
+def make_metadatas(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    metadatas = []
+    for i in range(n):
+        meta = {'complaint_id': str(i // 3),
+                'product': PRODUCTS[rng.integers(len(PRODUCTS))],
+                'date_received': f"2024-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}"}
+        state = STATES[rng.integers(len(STATES))]
+        if state is not None:
+            meta['state'] = state
+        metadatas.append(meta)
+    return metadatas
+
+
+def brute_force(metadatas, filters):
+    """Rows matching filters the way MetadataIndex defines it: exact value, else substring, case-insensitive"""
+    keep = []
+    for row, meta in enumerate(metadatas):
+        ok = True
+        for field, wanted in filters.items():
+            if field == 'date_from':
+                ok &= meta.get('date_received', '') >= wanted
+            elif field == 'date_to':
+                ok &= '' < meta.get('date_received', '') <= wanted
+            else:
+                wanted = wanted if isinstance(wanted, list) else [wanted]
+                stored = {str(m.get(field, '')).lower() for m in metadatas if m.get(field)}
+                value = str(meta.get(field, '')).lower()
+                ok &= bool(value) and any(
+                    value == w.lower() if w.lower() in stored else w.lower() in value for w in wanted)
+        if ok:
+            keep.append(row)
+    return keep
+
+
+FILTERS = [
+    {'product': 'Credit card'},
+    {'product': ['Personal loan', 'Money transfers'], 'state': 'TX'},
+    {'product': 'account'},
+    {'date_from': '2024-03-01', 'date_to': '2024-06-30'},
+    {'state': ['CA', 'NY'], 'date_from': '2024-10-01'},
+    {'product': 'Credit card', 'state': 'FL', 'date_to': '2024-02-15'},
+]
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_mask_matches_brute_force(filters):
+    metadatas = make_metadatas()
+    mask = MetadataIndex.from_metadatas(metadatas).mask(filters)
+    assert np.flatnonzero(mask).tolist() == brute_force(metadatas, filters)
+
+
+def test_field_missing_from_first_rows_is_indexed():
+    metadatas = [{'product': 'Credit card'} for _ in range(150)] + [{'product': 'Credit card', 'state': 'TX'}]
+    index = MetadataIndex.from_metadatas(metadatas)
+    assert np.flatnonzero(index.mask({'state': 'TX'})).tolist() == [150]
+
+
+@pytest.mark.parametrize('prefilter_selectivity', [0.0, 1.0])
+@pytest.mark.parametrize('filters', FILTERS)
+def test_filtered_query_matches_brute_force(tmp_path, filters, prefilter_selectivity):
+    metadatas = make_metadatas()
+    rng = np.random.default_rng(1)
+    embeddings = rng.standard_normal((len(metadatas), 16)).astype(np.float32)
+    ids = [str(i) for i in range(len(metadatas))]
+    NumpyVectorStore.build(str(tmp_path), ids, embeddings, ['doc'] * len(ids), metadatas)
+    store = NumpyVectorStore(str(tmp_path))
+    store.prefilter_selectivity = prefilter_selectivity
+    queries = rng.standard_normal((4, 16)).astype(np.float32)
+
+    result = store.query(queries, n_results=5, include=['metadatas'], filters=filters)
+
+    allowed = brute_force(metadatas, filters)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    for query, found in zip(queries, result['ids']):
+        scores = normalized[allowed] @ (query / np.linalg.norm(query))
+        expected = [ids[allowed[j]] for j in np.argsort(-scores)[:5]]
+        assert found == expected
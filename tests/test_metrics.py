@@ -0,0 +1,47 @@
+"""Warmup suppression is per thread: other threads keep recording"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from metrics import MetricsRegistry
+
+
+def test_suppressed_only_affects_current_thread():
+    registry = MetricsRegistry(enabled=True)
+    inside = threading.Event()
+    done = threading.Event()
+
+    def warmup_thread():
+        with registry.suppressed():
+            inside.set()
+            with registry.span('search'):
+                pass
+            registry.inc('queries')
+            done.wait(2)
+
+    thread = threading.Thread(target=warmup_thread)
+    thread.start()
+    assert inside.wait(2)
+    with registry.span('search'):
+        pass
+    registry.inc('queries')
+    done.set()
+    thread.join()
+
+    snapshot = registry.snapshot()
+    assert snapshot['stages']['search']['count'] == 1
+    assert snapshot['counters']['queries'] == 1
+    assert registry.enabled
+
+
+def test_overlapping_suppression_restores_recording():
+    registry = MetricsRegistry(enabled=True)
+    with registry.suppressed():
+        with registry.suppressed():
+            registry.inc('queries')
+        registry.inc('queries')
+    registry.inc('queries')
+    assert registry.snapshot()['counters']['queries'] == 1
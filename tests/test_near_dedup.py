@@ -0,0 +1,115 @@
+"""NearDuplicateIndex: link vs drop filtering, and LSH decisions against exact shingle Jaccard"""
+
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from near_dedup import NearDuplicateIndex, lsh_bands
+
+VOCABULARY = [f"w{i}" for i in range(3000)]
+
+
+def random_text(rng, words=200):
+    return ' '.join(VOCABULARY[i] for i in rng.integers(len(VOCABULARY), size=words))
+
+
+def edit(rng, text, changes):
+    words = text.split()
+    for position in rng.choice(len(words), size=changes, replace=False):
+        words[position] = VOCABULARY[rng.integers(len(VOCABULARY))]
+    return ' '.join(words)
+
+
+def jaccard(a, b, shingle_size=3):
+    def shingles(text):
+        words = re.findall(r"\w+", text.lower())
+        return {tuple(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def batch():
+    rng = np.random.default_rng(0)
+    first, second = random_text(rng), random_text(rng)
+    texts = [first, edit(rng, first, 1), second, first, random_text(rng)]
+    ids = ['a', 'a_near', 'b', 'a_copy', 'c']
+    return ids, texts, [{'complaint_id': cid} for cid in ids]
+
+
+def test_link_keeps_canonicals_with_duplicate_counts():
+    index = NearDuplicateIndex(0.85)
+    ids, chunks, metadata = index.filter(*batch(), mode='link')
+
+    assert ids == ['a', 'b', 'c']
+    assert chunks[0] == batch()[1][0]
+    assert [m['duplicate_count'] for m in metadata] == [2, 0, 0]
+    assert index.duplicates == {'a': ['a_near', 'a_copy']}
+    assert (index.exact_duplicates, index.near_duplicates) == (1, 1)
+
+
+def test_drop_removes_the_same_chunks_without_linking():
+    linked = NearDuplicateIndex(0.85).filter(*batch(), mode='link')
+    index = NearDuplicateIndex(0.85)
+    ids, chunks, metadata = index.filter(*batch(), mode='drop')
+
+    assert ids == linked[0] and chunks == linked[1]
+    assert all('duplicate_count' not in m for m in metadata)
+    assert index.report()['removed_fraction'] == 0.4
+
+
+def test_counts_grow_across_batches_and_bad_mode_is_rejected():
+    index = NearDuplicateIndex(0.85)
+    ids, texts, metadata = batch()
+    index.filter(ids, texts, metadata, mode='link')
+    later = index.filter(['b_copy'], [texts[2]], [{}], mode='link')
+
+    assert later == ([], [], [])
+    assert index.duplicate_counts() == {'a': 2, 'b': 1}
+    with pytest.raises(ValueError):
+        index.filter(ids, texts, metadata, mode='merge')
+
+
+def test_lsh_agrees_with_exact_jaccard_away_from_the_threshold():
+    rng = np.random.default_rng(1)
+    threshold = 0.85
+    index = NearDuplicateIndex(threshold)
+    canonical = [random_text(rng) for _ in range(40)]
+    for j, text in enumerate(canonical):
+        assert index.check(f"c{j}", text) is None
+
+    decided = 0
+    for changes in (1, 2, 3, 10, 25, 60, 120):
+        for j in rng.choice(len(canonical), size=5, replace=False):
+            variant = edit(rng, canonical[j], changes)
+            similarity = jaccard(canonical[j], variant)
+            found = index.check(f"v{changes}_{j}", variant)
+            # MinHash with 128 permutations estimates Jaccard to about +-0.05 near the threshold
+            if similarity >= threshold + 0.07:
+                assert found == f"c{j}"
+                decided += 1
+            elif similarity <= threshold - 0.15:
+                assert found is None
+                decided += 1
+    assert decided >= 25
+
+
+def test_signature_estimates_jaccard():
+    rng = np.random.default_rng(2)
+    index = NearDuplicateIndex(0.85, num_perm=256)
+    text = random_text(rng, words=300)
+    for changes in (5, 30, 90):
+        variant = edit(rng, text, changes)
+        estimate = np.mean(index.signature(text) == index.signature(variant))
+        assert abs(estimate - jaccard(text, variant)) < 0.1
+
+
+def test_bands_cover_every_permutation():
+    for threshold in (0.5, 0.85, 0.95):
+        bands, rows = lsh_bands(threshold, 128)
+        assert bands * rows == 128
+    assert lsh_bands(0.95, 128)[1] > lsh_bands(0.5, 128)[1]
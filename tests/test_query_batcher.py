@@ -0,0 +1,111 @@
+"""Regression tests: cancelled or timed-out queries must not kill QueryBatcher workers"""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from query_batcher import QueryBatcher
+
+
+class GatedRAG:
+    """process_queries() blocks until release is set, so tests control when a batch finishes"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.seen = []
+
+    def process_queries(self, queries, k=3):
+        self.started.set()
+        self.release.wait(5)
+        self.seen.extend(queries)
+        return [f"answer:{q}" for q in queries]
+
+
+def test_cancelled_request_is_skipped_and_worker_survives():
+    rag = GatedRAG()
+    with QueryBatcher(rag, batch_window_ms=0) as batcher:
+        first = batcher.submit('first')
+        assert rag.started.wait(2)
+        cancelled = batcher.submit('cancelled')
+        assert cancelled.cancel()
+        rag.release.set()
+
+        assert first.result(2) == 'answer:first'
+        assert batcher.process_query('after', timeout=2) == 'answer:after'
+        assert all(t.is_alive() for t in batcher._threads)
+        assert 'cancelled' not in rag.seen
+
+
+def test_timed_out_request_does_not_break_later_queries():
+    rag = GatedRAG()
+
+    async def timed_out_query():
+        # What ApiServer does: asyncio.wait_for cancels the wrapped future on timeout
+        await asyncio.wait_for(asyncio.wrap_future(batcher.submit('slow')), 0.05)
+
+    with QueryBatcher(rag, batch_window_ms=0) as batcher:
+        busy = batcher.submit('busy')
+        assert rag.started.wait(2)
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(timed_out_query())
+        with pytest.raises(FutureTimeoutError):
+            batcher.process_query('blocked', timeout=0.05)
+        rag.release.set()
+
+        assert busy.result(2) == 'answer:busy'
+        assert batcher.process_query('after', timeout=2) == 'answer:after'
+        assert all(t.is_alive() for t in batcher._threads)
+        assert 'slow' not in rag.seen
+
+
+def test_exception_for_cancelled_request_does_not_kill_worker():
+    class FailingRAG(GatedRAG):
+        def process_queries(self, queries, k=3):
+            super().process_queries(queries, k)
+            if 'fail' in queries:
+                raise ValueError('boom')
+            return [f"answer:{q}" for q in queries]
+
+    rag = FailingRAG()
+    with QueryBatcher(rag, batch_window_ms=0) as batcher:
+        doomed = batcher.submit('fail')
+        assert rag.started.wait(2)
+        doomed.cancel()  # already running, so this is refused and the exception is delivered
+        rag.release.set()
+        with pytest.raises(ValueError):
+            doomed.result(2)
+        assert batcher.process_query('after', timeout=2) == 'answer:after'
+        assert all(t.is_alive() for t in batcher._threads)
+
+
+def test_short_result_list_fails_unmatched_requests():
+    class ShortRAG:
+        def process_queries(self, queries, k=3):
+            return [f"answer:{q}" for q in queries[:1]]
+
+    with QueryBatcher(ShortRAG(), batch_window_ms=200) as batcher:
+        futures = [batcher.submit(q) for q in ('a', 'b', 'c')]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result(2)
+        assert all(t.is_alive() for t in batcher._threads)
+
+
+def test_stats_history_is_bounded():
+    class EchoRAG:
+        def process_queries(self, queries, k=3):
+            return list(queries)
+
+    with QueryBatcher(EchoRAG(), batch_window_ms=0, stats_window=5) as batcher:
+        for i in range(20):
+            batcher.process_query(str(i), timeout=2)
+        stats = batcher.stats()
+    assert len(batcher._latencies) == 5
+    assert stats['queries'] == 20
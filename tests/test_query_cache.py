@@ -0,0 +1,107 @@
+"""QueryCache: both levels are dropped when the vector store version changes, and only then"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from query_cache import QueryCache
+from vector_backends import NumpyVectorStore
+
+
+class VersionedStore:
+    def __init__(self):
+        self.current = 'v1'
+        self.checks = 0
+
+    def version(self):
+        self.checks += 1
+        return self.current
+
+
+def encoder(calls):
+    def encode(queries):
+        calls.append(list(queries))
+        return np.array([[len(q), 1.0, 0.0] for q in queries], dtype=np.float32)
+    return encode
+
+
+def warm(cache):
+    calls = []
+    embeddings = cache.embed(encoder(calls), ['late fee', 'late fee', 'wire transfer'])
+    cache.store(embeddings[0], 'late fee results', key=3, compute_seconds=0.5)
+    return calls
+
+
+def test_version_change_clears_both_levels():
+    store = VersionedStore()
+    cache = QueryCache(version_check_interval=0)
+    cache.check_version(store)
+    warm(cache)
+    cache.check_version(store)
+    assert cache.lookup(np.array([8.0, 1.0, 0.0]), key=3) == 'late fee results'
+    assert cache.invalidations == 0
+
+    store.current = 'v2'
+    cache.check_version(store)
+
+    assert cache.invalidations == 1
+    assert cache.lookup(np.array([8.0, 1.0, 0.0]), key=3) is None
+    assert cache.stats()['cached_embeddings'] == 0
+    assert warm(cache) == [['late fee', 'wire transfer']]
+    assert cache.stats()['store_version'] == 'v2'
+
+
+def test_version_is_polled_at_most_once_per_interval():
+    store = VersionedStore()
+    cache = QueryCache(version_check_interval=3600)
+    cache.check_version(store)
+    warm(cache)
+    store.current = 'v2'
+    cache.check_version(store)
+
+    assert store.checks == 1
+    assert cache.invalidations == 0
+    assert cache.lookup(np.array([8.0, 1.0, 0.0]), key=3) == 'late fee results'
+
+
+def test_rebuilt_numpy_store_invalidates(tmp_path):
+    rng = np.random.default_rng(0)
+
+    def build(n):
+        ids = [str(i) for i in range(n)]
+        NumpyVectorStore.build(str(tmp_path), ids, rng.standard_normal((n, 3)).astype(np.float32),
+                               ['doc'] * n, [{} for _ in ids])
+        return NumpyVectorStore(str(tmp_path))
+
+    cache = QueryCache(version_check_interval=0)
+    cache.check_version(build(10))
+    warm(cache)
+    store = build(12)
+    cache.check_version(store)
+
+    assert cache.invalidations == 1
+    assert cache.stats()['store_version'] == store.version()
+
+
+def test_embed_encodes_each_missing_string_once():
+    cache = QueryCache()
+    calls = warm(cache)
+    embeddings = cache.embed(encoder(calls), ['wire transfer', 'overdraft'])
+
+    assert calls == [['late fee', 'wire transfer'], ['overdraft']]
+    assert embeddings.tolist() == [[13.0, 1.0, 0.0], [9.0, 1.0, 0.0]]
+    stats = cache.stats()
+    assert (stats['embedding_hits'], stats['embedding_misses']) == (1, 3)
+
+
+def test_result_lookup_needs_similarity_and_the_same_key():
+    cache = QueryCache(similarity_threshold=0.95)
+    warm(cache)
+
+    assert cache.lookup(np.array([8.0, 1.1, 0.0]), key=3) == 'late fee results'
+    assert cache.lookup(np.array([8.0, 1.0, 0.0]), key=5) is None
+    assert cache.lookup(np.array([1.0, 8.0, 0.0]), key=3) is None
+    assert cache.stats()['seconds_saved'] == 0.5
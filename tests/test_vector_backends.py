@@ -0,0 +1,98 @@
+"""Regression test: FAISS -1 padding for one query must not truncate the rest of the batch"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+faiss = pytest.importorskip('faiss')
+
+from vector_backends import FaissVectorStore
+
+
+def test_padding_is_dropped_per_query(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32))
+    # One tiny cluster: with nprobe=1 its queries reach only 3 rows
+    sizes = [3] + [200] * 19
+    embeddings = np.concatenate([c + 0.05 * rng.standard_normal((n, 32)) for c, n in zip(centers, sizes)])
+    embeddings = embeddings.astype(np.float32)
+    ids = [str(i) for i in range(len(embeddings))]
+    FaissVectorStore.build(str(tmp_path), ids, embeddings, ['doc'] * len(ids), [{} for _ in ids],
+                           index_type='ivf_flat', nprobe=1, evaluate=False)
+    store = FaissVectorStore(str(tmp_path), nprobe=1)
+
+    alone = store.query(embeddings[100:101], n_results=10)
+    batched = store.query(embeddings[[0, 100]], n_results=10)
+
+    assert len(batched['ids'][0]) == 3
+    assert batched['ids'][1] == alone['ids'][0]
+    assert len(batched['ids'][1]) == 10
+
+
+class FakeChromaCollection:
+    """Exact-search stand-in for a Chroma collection: query() with `where`, paged get()"""
+
+    name = 'complaint_chunks'
+
+    def __init__(self, embeddings, metadatas):
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.metadatas = metadatas
+        self.fetches = []
+
+    def _matches(self, meta, where):
+        if not where:
+            return True
+        if '$and' in where:
+            return all(self._matches(meta, w) for w in where['$and'])
+        if '$or' in where:
+            return any(self._matches(meta, w) for w in where['$or'])
+        (field, value), = where.items()
+        return meta.get(field) == value
+
+    def count(self):
+        return len(self.metadatas)
+
+    def get(self, include=None, limit=None, offset=0, where=None):
+        rows = range(offset, min(len(self.metadatas), offset + (limit or len(self.metadatas))))
+        return {'ids': [str(r) for r in rows], 'metadatas': [self.metadatas[r] for r in rows]}
+
+    def query(self, query_embeddings, n_results, where=None, include=()):
+        self.fetches.append(n_results)
+        allowed = np.array([r for r, m in enumerate(self.metadatas) if self._matches(m, where)])
+        results = {'ids': [], 'metadatas': [], 'distances': []}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            scores = self.embeddings[allowed] @ (query / np.linalg.norm(query))
+            top = allowed[np.argsort(-scores)[:n_results]]
+            results['ids'].append([str(r) for r in top])
+            results['metadatas'].append([self.metadatas[r] for r in top])
+            results['distances'].append([float(1 - self.embeddings[r] @ query) for r in top])
+        return results
+
+
+def test_chroma_date_postfilter_refetches_until_full():
+    from vector_backends import ChromaVectorStore
+
+    rng = np.random.default_rng(0)
+    n = 400
+    embeddings = rng.standard_normal((n, 16)).astype(np.float32)
+    query = rng.standard_normal(16).astype(np.float32)
+    # The chunks closest to the query are all outside the date range
+    order = np.argsort(-(embeddings @ query) / np.linalg.norm(embeddings, axis=1))
+    dates = np.where(np.arange(n) < 300, '2023-06-01', '2024-06-01')
+    metadatas = [{'product': 'Credit card', 'date_received': str(dates[rank])}
+                 for rank in np.argsort(order)]
+    collection = FakeChromaCollection(embeddings, metadatas)
+    store = ChromaVectorStore(collection)
+
+    result = store.query(query[None, :], n_results=10, include=['metadatas'],
+                         filters={'product': 'Credit card', 'date_from': '2024-01-01'})
+
+    assert len(result['ids'][0]) == 10
+    assert all(m['date_received'] >= '2024-01-01' for m in result['metadatas'][0])
+    expected = [str(r) for r in order if metadatas[r]['date_received'] >= '2024-01-01'][:10]
+    assert result['ids'][0] == expected
+    assert len(collection.fetches) > 1